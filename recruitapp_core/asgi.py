@@ -3,6 +3,13 @@ ASGI config for recruitapp_core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async agent endpoint (agent/ask/async/, enabled with AGENT_ASYNC_ENABLED=True)
+only pays off when this entry point is served by an ASGI server, e.g.:
+
+    gunicorn recruitapp_core.asgi:application -k uvicorn.workers.UvicornWorker
+
+Under WSGI the same view still works, but each request holds a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -1,6 +1,7 @@
 import os
 import sys
 from celery import Celery
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 # Ensure the .env file is loaded for the standalone celery command
@@ -31,5 +32,30 @@ if sys.platform == 'win32':
     # app.conf.worker_pool = 'gevent'
     # app.conf.worker_concurrency = 10
 
+# Periodic jobs (run with: python -m celery -A recruitapp_core beat)
+app.conf.beat_schedule = {
+    # Full recount of UserAnalytics; signal handlers only apply increments.
+    'reconcile-user-analytics': {
+        'task': 'recruiting.tasks.reconcile_analytics_task',
+        'schedule': crontab(hour=3, minute=15),
+    },
+    # Write-behind analytics buffer (a no-op unless ANALYTICS_WRITE_BEHIND=True).
+    'flush-analytics-buffer': {
+        'task': 'recruiting.tasks.flush_analytics_buffer_task',
+        'schedule': float(os.environ.get('ANALYTICS_FLUSH_INTERVAL_SECONDS', 30)),
+    },
+    # Percentile index: rewrite the cohorts queued by profile changes, plus a
+    # nightly full rebuild in case a dirty mark was lost.
+    'rebuild-percentile-index': {
+        'task': 'recruiting.tasks.rebuild_percentile_index_task',
+        'schedule': float(os.environ.get('PERCENTILE_INDEX_INTERVAL_SECONDS', 900)),
+    },
+    'full-rebuild-percentile-index': {
+        'task': 'recruiting.tasks.rebuild_percentile_index_task',
+        'schedule': crontab(hour=3, minute=45),
+        'kwargs': {'full': True},
+    },
+}
+
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
\ No newline at end of file
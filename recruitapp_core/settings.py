@@ -150,4 +150,104 @@ CELERY_RESULT_BACKEND = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = 'UTC'
\ No newline at end of file
+CELERY_TIMEZONE = 'UTC'
+# =============================================================================
+# REDIS & AGENT STREAMING
+# =============================================================================
+
+# Redis used directly by the app (response streams, shared caches). Defaults to
+# the Celery broker so a single Redis instance serves both.
+REDIS_URL = os.environ.get("REDIS_URL", CELERY_BROKER_URL)
+
+# Shared cache for compiled artifacts (system prompt, reference data). Build
+# steps and tests run without Redis, so they get a process-local cache.
+if IS_BUILD_PROCESS:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+
+# Stream agent replies token-by-token over Server-Sent Events. When disabled
+# (or when the browser lacks EventSource) the client polls task status instead.
+# An open stream holds its worker for up to AGENT_STREAM_IDLE_TIMEOUT_SECONDS,
+# so only enable this behind async workers (see render.yaml), never sync ones.
+AGENT_STREAMING_ENABLED = os.environ.get('AGENT_STREAMING_ENABLED', 'False') == 'True'
+AGENT_STREAM_TTL_SECONDS = int(os.environ.get('AGENT_STREAM_TTL_SECONDS', 3600))
+AGENT_STREAM_BLOCK_MS = int(os.environ.get('AGENT_STREAM_BLOCK_MS', 15000))
+AGENT_STREAM_IDLE_TIMEOUT_SECONDS = int(os.environ.get('AGENT_STREAM_IDLE_TIMEOUT_SECONDS', 120))
+
+# Local development: replace Vertex AI with a fake model that streams canned
+# chunks on a fixed schedule, so the streaming path works without credentials.
+AGENT_FAKE_MODEL = os.environ.get('AGENT_FAKE_MODEL') == 'True'
+AGENT_FAKE_MODEL_CHUNK_INTERVAL = float(os.environ.get('AGENT_FAKE_MODEL_CHUNK_INTERVAL', 0.05))
+
+# Maximum GenerativeModel instances kept per worker process (LRU beyond that).
+MODEL_REGISTRY_MAX_SIZE = int(os.environ.get('MODEL_REGISTRY_MAX_SIZE', 32))
+
+# Tool calls requested in one agent round run concurrently on this many threads,
+# each bounded by the timeout below, counted from when the call starts (not
+# from the start of the round).
+AGENT_TOOL_MAX_WORKERS = int(os.environ.get('AGENT_TOOL_MAX_WORKERS', 4))
+AGENT_TOOL_TIMEOUT_SECONDS = float(os.environ.get('AGENT_TOOL_TIMEOUT_SECONDS', 8))
+
+# google_search result cache: per-process TTL/LRU tier plus shared Redis tier.
+SEARCH_CACHE_LOCAL_TTL = int(os.environ.get('SEARCH_CACHE_LOCAL_TTL', 600))
+SEARCH_CACHE_SHARED_TTL = int(os.environ.get('SEARCH_CACHE_SHARED_TTL', 6 * 3600))
+SEARCH_CACHE_MAXSIZE = int(os.environ.get('SEARCH_CACHE_MAXSIZE', 512))
+SEARCH_CACHE_LOCK_TIMEOUT = int(os.environ.get('SEARCH_CACHE_LOCK_TIMEOUT', 10))
+
+# Outbound HTTP (agent tools): pooled keep-alive session with retry/backoff.
+OUTBOUND_HTTP_POOL_SIZE = int(os.environ.get('OUTBOUND_HTTP_POOL_SIZE', AGENT_TOOL_MAX_WORKERS))
+OUTBOUND_HTTP_CONNECT_TIMEOUT = float(os.environ.get('OUTBOUND_HTTP_CONNECT_TIMEOUT', 3.05))
+OUTBOUND_HTTP_READ_TIMEOUT = float(os.environ.get('OUTBOUND_HTTP_READ_TIMEOUT', 5))
+OUTBOUND_HTTP_RETRIES = int(os.environ.get('OUTBOUND_HTTP_RETRIES', 2))
+OUTBOUND_HTTP_BACKOFF_FACTOR = float(os.environ.get('OUTBOUND_HTTP_BACKOFF_FACTOR', 0.3))
+OUTBOUND_HTTP_BACKOFF_JITTER = float(os.environ.get('OUTBOUND_HTTP_BACKOFF_JITTER', 0.2))
+
+# Agent history window: most recent turns that fit the token budget.
+AGENT_HISTORY_TOKEN_BUDGET = int(os.environ.get('AGENT_HISTORY_TOKEN_BUDGET', 6000))
+AGENT_HISTORY_MAX_TURNS = int(os.environ.get('AGENT_HISTORY_MAX_TURNS', 20))
+# Past replies longer than this are truncated before counting; 0 disables.
+AGENT_HISTORY_MAX_RESPONSE_TOKENS = int(os.environ.get('AGENT_HISTORY_MAX_RESPONSE_TOKENS', 1500))
+
+# Async agent mode (ASGI only): replies are generated on the event loop.
+AGENT_ASYNC_ENABLED = os.environ.get('AGENT_ASYNC_ENABLED', 'False') == 'True'
+AGENT_ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get('AGENT_ASYNC_HTTP_MAX_CONNECTIONS', 50))
+
+# Write-behind analytics: signals buffer counter deltas in Redis and Celery beat
+# flushes them every ANALYTICS_FLUSH_INTERVAL_SECONDS (read in celery.py).
+ANALYTICS_WRITE_BEHIND = os.environ.get('ANALYTICS_WRITE_BEHIND', 'False') == 'True'
+ANALYTICS_FLUSH_BATCH_SIZE = int(os.environ.get('ANALYTICS_FLUSH_BATCH_SIZE', 500))
+ANALYTICS_FLUSH_LOCK_SECONDS = int(os.environ.get('ANALYTICS_FLUSH_LOCK_SECONDS', 300))
+# Buffering stops (deltas are written through) when no flush has run for this
+# long, so a missing beat scheduler can't strand counters in Redis.
+ANALYTICS_FLUSH_HEARTBEAT_SECONDS = int(os.environ.get('ANALYTICS_FLUSH_HEARTBEAT_SECONDS', 300))
+
+# Ledger and Game Plan boards (own plus family-shared rows) are cached per
+# viewer until a family member writes; this bounds staleness from bulk updates.
+FAMILY_FEED_CACHE_TTL = int(os.environ.get('FAMILY_FEED_CACHE_TTL', 300))
+
+# Sport / Position / MetricDefinition catalog: each process compares its copy
+# with the shared version at most this often.
+CATALOG_VERSION_CHECK_SECONDS = float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', 5))
+
+# Cohort percentile index: published to Redis in generations; each host keeps
+# a local copy of the current one here as memory-mapped .npy files. Needs no
+# disk shared between the worker and web services.
+PERCENTILE_INDEX_DIR = os.environ.get('PERCENTILE_INDEX_DIR', str(BASE_DIR / 'var' / 'percentile_index'))
+PERCENTILE_INDEX_LOCK_SECONDS = int(os.environ.get('PERCENTILE_INDEX_LOCK_SECONDS', 600))
+
+# Bulk performance imports (import_performances command and upload endpoint):
+# rows validated and written per transaction.
+PERFORMANCE_IMPORT_BATCH_SIZE = int(os.environ.get('PERFORMANCE_IMPORT_BATCH_SIZE', 500))
+
+# Athlete search facet counts are cached per sport until a profile in it
+# changes; this bounds staleness from bulk updates that bypass signals.
+ATHLETE_SEARCH_FACET_TTL = int(os.environ.get('ATHLETE_SEARCH_FACET_TTL', 600))
+
+# Ledger retrieval: the insights most relevant to each prompt are added to the
+# system prompt, within this token budget. Per-user / per-family vector
+# indexes are updated in place on writes; the TTL bounds staleness from bulk updates.
+LEDGER_CONTEXT_TOKEN_BUDGET = int(os.environ.get('LEDGER_CONTEXT_TOKEN_BUDGET', 600))
+LEDGER_CONTEXT_TOP_K = int(os.environ.get('LEDGER_CONTEXT_TOP_K', 3))
+LEDGER_CONTEXT_MIN_SCORE = float(os.environ.get('LEDGER_CONTEXT_MIN_SCORE', 0.1))
+LEDGER_RETRIEVAL_CACHE_TTL = int(os.environ.get('LEDGER_RETRIEVAL_CACHE_TTL', 3600))
@@ -6,14 +6,33 @@ from django.utils.safestring import mark_safe
 from .models import (
     PromptComponent, Conversation, ChatSession, Sport, SportProfile,
     UserProfile, LedgerEntry, ActionItem, AdminSettings, UserAnalytics,
-    Position, MetricDefinition, PositionProfile, PerformanceEntry, CompetitionResult
+    Position, MetricDefinition, PositionProfile, PerformanceEntry, CompetitionResult, MetricTrendSummary,
+    MetricValue,
 )
+from . import family_feed, text_search
+from .analytics import reconcile_user_analytics
+from .catalog import get_catalog, sport_name
 
 
 # ============================================================================
 # ENHANCED ADMIN CLASSES WITH ANALYTICS (Milestone 3)
 # ============================================================================
 
+class FullTextSearchMixin:
+    """
+    Searches the model's full-text index (see text_search) instead of
+    search_fields ILIKE scans over the text columns; search_fields is kept for
+    the small lookups (usernames) and both are OR'd.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset_by_fields, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if not text_search.terms(search_term):
+            return queryset_by_fields, may_have_duplicates
+        matches = queryset.filter(text_search.match_condition(queryset.model, search_term, queryset.db))
+        return queryset_by_fields | matches, may_have_duplicates
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     """
@@ -36,32 +55,28 @@ class ChatSessionAdmin(admin.ModelAdmin):
     """
     Enhanced admin for ChatSessions with message count and date filters.
     """
-    list_display = ['title', 'user', 'message_count', 'created_at', 'updated_at']
+    list_display = ['title', 'user', 'message_count', 'last_message_at', 'created_at', 'updated_at']
     list_filter = ['created_at', 'updated_at']
     search_fields = ['title', 'user__username', 'summary']
-    readonly_fields = ['id', 'created_at', 'updated_at', 'message_count']
+    readonly_fields = [
+        'id', 'created_at', 'updated_at', 'message_count', 'last_message_at', 'total_prompt_chars', 'total_response_chars',
+    ]
     date_hierarchy = 'created_at'
 
-    def message_count(self, obj):
-        """Display count of messages in this session"""
-        count = obj.messages.count()
-        return format_html('<strong>{}</strong> messages', count)
-    message_count.short_description = 'Messages'
-
     def get_queryset(self, request):
-        """Optimize query with prefetch"""
+        """Message stats are stored on the session, so only the user is joined."""
         qs = super().get_queryset(request)
-        return qs.select_related('user').prefetch_related('messages')
+        return qs.select_related('user')
 
 
 @admin.register(Conversation)
-class ConversationAdmin(admin.ModelAdmin):
+class ConversationAdmin(FullTextSearchMixin, admin.ModelAdmin):
     """
     Enhanced admin for individual conversations with length tracking.
     """
     list_display = ['session_title', 'user', 'prompt_preview', 'response_preview', 'timestamp']
     list_filter = ['timestamp']
-    search_fields = ['prompt_text', 'response_text', 'user__username']
+    search_fields = ['user__username']  # prompt and response text through the full-text index
     readonly_fields = ['id', 'timestamp', 'prompt_length', 'response_length']
     date_hierarchy = 'timestamp'
 
@@ -87,16 +102,20 @@ class ConversationAdmin(admin.ModelAdmin):
 
 
 @admin.register(LedgerEntry)
-class LedgerEntryAdmin(admin.ModelAdmin):
+class LedgerEntryAdmin(FullTextSearchMixin, admin.ModelAdmin):
     """
     Enhanced admin for Ledger entries with title and content display.
     """
-    list_display = ['title', 'user', 'content_preview', 'created_at']
-    list_filter = ['created_at']
-    search_fields = ['user__username', 'title', 'content']
+    list_display = ['title', 'user', 'content_preview', 'is_deleted', 'created_at']
+    list_filter = ['is_deleted', 'created_at']
+    search_fields = ['user__username']  # title and content through the full-text index
     readonly_fields = ['created_at']
     date_hierarchy = 'created_at'
 
+    def get_queryset(self, request):
+        """Include soft-deleted entries, which the default manager hides."""
+        return LedgerEntry.all_objects.select_related('user')
+
     def content_preview(self, obj):
         return obj.content[:80] + '...' if len(obj.content) > 80 else obj.content
     content_preview.short_description = 'Content'
@@ -108,12 +127,16 @@ class ActionItemAdmin(admin.ModelAdmin):
     Enhanced admin for Action Items with completion tracking and bulk actions.
     """
     list_display = ['description_preview', 'user', 'priority_badge', 'is_complete', 'due_date', 'created_at']
-    list_filter = ['is_complete', 'priority', 'created_at', 'due_date']
+    list_filter = ['is_complete', 'is_deleted', 'priority', 'created_at', 'due_date']
     search_fields = ['user__username', 'description']
     readonly_fields = ['created_at']
     date_hierarchy = 'created_at'
     actions = ['mark_complete', 'mark_incomplete', 'set_high_priority']
 
+    def get_queryset(self, request):
+        """Include soft-deleted items, which the default manager hides."""
+        return ActionItem.all_objects.select_related('user')
+
     def description_preview(self, obj):
         return obj.description[:50] + '...' if len(obj.description) > 50 else obj.description
     description_preview.short_description = 'Description'
@@ -128,19 +151,33 @@ class ActionItemAdmin(admin.ModelAdmin):
         )
     priority_badge.short_description = 'Priority'
 
+    def _bulk_update(self, queryset, **values):
+        """
+        queryset.update() bypasses signals: expire the affected family boards
+        and return the affected user ids along with the row count.
+        """
+        owners = set(queryset.values_list('user_id', 'family_account_id').distinct())
+        updated = queryset.update(**values)
+        for user_id, family_id in owners:
+            family_feed.invalidate(user_id, family_id)
+        return updated, {user_id for user_id, _ in owners}
+
     @admin.action(description='Mark selected items as complete')
     def mark_complete(self, request, queryset):
-        updated = queryset.update(is_complete=True)
+        updated, user_ids = self._bulk_update(queryset, is_complete=True)
+        # Bulk updates bypass the analytics signals; recount the affected users.
+        reconcile_user_analytics(user_ids=user_ids)
         self.message_user(request, f'{updated} action items marked as complete.')
 
     @admin.action(description='Mark selected items as incomplete')
     def mark_incomplete(self, request, queryset):
-        updated = queryset.update(is_complete=False)
+        updated, user_ids = self._bulk_update(queryset, is_complete=False)
+        reconcile_user_analytics(user_ids=user_ids)
         self.message_user(request, f'{updated} action items marked as incomplete.')
 
     @admin.action(description='Set priority to HIGH')
     def set_high_priority(self, request, queryset):
-        updated = queryset.update(priority=1)
+        updated, _ = self._bulk_update(queryset, priority=1)
         self.message_user(request, f'{updated} action items set to HIGH priority.')
 
 
@@ -257,7 +294,7 @@ class SportAdmin(admin.ModelAdmin):
     )
 
     def position_count(self, obj):
-        count = obj.positions.count()
+        count = len(get_catalog().positions_for(obj.id))
         return format_html('<strong>{}</strong> positions/events', count)
     position_count.short_description = 'Positions'
 
@@ -458,7 +495,7 @@ class PositionProfileAdmin(admin.ModelAdmin):
     athlete_display.short_description = 'Athlete'
 
     def sport(self, obj):
-        return obj.sport_profile.sport.name if obj.sport_profile else 'N/A'
+        return sport_name(obj.sport_profile.sport_id) if obj.sport_profile else 'N/A'
     sport.short_description = 'Sport'
 
     def primary_badge(self, obj):
@@ -501,7 +538,7 @@ class PositionProfileAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('sport_profile__user_profile__user', 'sport_profile__sport', 'position')
+        return qs.select_related('sport_profile__user_profile__user', 'position')
 
 
 @admin.register(PerformanceEntry)
@@ -553,7 +590,7 @@ class PerformanceEntryAdmin(admin.ModelAdmin):
     athlete_display.short_description = 'Athlete'
 
     def sport(self, obj):
-        return obj.sport_profile.sport.name if obj.sport_profile else 'N/A'
+        return sport_name(obj.sport_profile.sport_id) if obj.sport_profile else 'N/A'
     sport.short_description = 'Sport'
 
     def event_name_display(self, obj):
@@ -591,7 +628,7 @@ class PerformanceEntryAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('sport_profile__user_profile__user', 'sport_profile__sport', 'position_profile__position')
+        return qs.select_related('sport_profile__user_profile__user', 'position_profile__position')
 
 
 @admin.register(CompetitionResult)
@@ -641,7 +678,7 @@ class CompetitionResultAdmin(admin.ModelAdmin):
     athlete_display.short_description = 'Athlete'
 
     def sport(self, obj):
-        return obj.sport_profile.sport.name if obj.sport_profile else 'N/A'
+        return sport_name(obj.sport_profile.sport_id) if obj.sport_profile else 'N/A'
     sport.short_description = 'Sport'
 
     def result_type_badge(self, obj):
@@ -662,7 +699,38 @@ class CompetitionResultAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('sport_profile__user_profile__user', 'sport_profile__sport')
+        return qs.select_related('sport_profile__user_profile__user')
+
+
+@admin.register(MetricTrendSummary)
+class MetricTrendSummaryAdmin(admin.ModelAdmin):
+    """Read-only view of the trend summaries maintained from performance entries"""
+    list_display = [
+        'sport_profile', 'metric_code', 'entry_count', 'best_value', 'best_date', 'rolling_average', 'updated_at'
+    ]
+    search_fields = ['metric_code', 'sport_profile__user_profile__user__username']
+    list_select_related = ['sport_profile__user_profile__user', 'sport_profile__sport']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(MetricValue)
+class MetricValueAdmin(admin.ModelAdmin):
+    """Read-only view of the typed metric values mirrored from the metrics JSON"""
+    list_display = ['sport_profile', 'metric_definition', 'raw_value', 'canonical_value', 'recorded_at']
+    list_filter = ['metric_definition__sport']
+    search_fields = ['metric_definition__code', 'sport_profile__user_profile__user__username']
+    list_select_related = ['sport_profile__user_profile__user', 'metric_definition']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 # Basic registrations for simple models
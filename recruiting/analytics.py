@@ -0,0 +1,152 @@
+"""
+Counter maintenance for UserAnalytics.
+
+Signal handlers apply deltas with a single UPDATE of F() expressions, so
+concurrent writers never lose increments and the cost of a save does not grow
+with the user's history. Anything that cannot be maintained incrementally (the
+rolling 7-day session count) or that bypasses signals (queryset.update) is
+corrected by reconcile_user_analytics, which recounts from the source tables.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Length, NullIf
+from django.utils import timezone
+
+from .models import ActionItem, ChatSession, Conversation, LedgerEntry, UserAnalytics
+
+# Fields recounted by reconciliation.
+RECONCILED_FIELDS = (
+    'total_messages_sent', 'total_agent_responses', 'total_message_chars', 'avg_message_length',
+    'total_sessions', 'session_count_last_7_days', 'ledger_entries_count',
+    'action_items_created', 'action_items_completed',
+)
+
+
+def adjusted(field, delta):
+    # Counters never go below zero; drift from missed increments is fixed by reconciliation.
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def average_length(deltas):
+    """
+    avg_message_length after applying deltas. Every column on the right-hand
+    side of an UPDATE reads the row's old value, so the average is computed
+    from the new sum and count in the same statement.
+    """
+    chars = F('total_message_chars') + deltas.get('total_message_chars', 0)
+    sent = F('total_messages_sent') + deltas.get('total_messages_sent', 0)
+    return Coalesce(chars / NullIf(sent, Value(0)), Value(0), output_field=IntegerField())
+
+
+def _update_values(deltas, touch_last_active):
+    now = timezone.now()
+    values = {field: adjusted(field, delta) for field, delta in deltas.items() if delta}
+    if 'total_messages_sent' in values or 'total_message_chars' in values:
+        values['avg_message_length'] = average_length(deltas)
+    if touch_last_active:
+        values['last_active'] = now
+    values['updated_at'] = now
+    return values
+
+
+def apply_deltas(user_id, deltas, touch_last_active=False):
+    """
+    Add `deltas` ({field: amount}) to the user's UserAnalytics row in one
+    UPDATE, creating the row first if the user has none yet. Pure decrements
+    never create a row (they also fire while a user is being deleted).
+    """
+    if not user_id:
+        return
+    values = _update_values(deltas, touch_last_active)
+    if UserAnalytics.objects.filter(user_id=user_id).update(**values):
+        return
+    if not any(delta > 0 for delta in deltas.values()):
+        return
+    UserAnalytics.objects.get_or_create(user_id=user_id)
+    UserAnalytics.objects.filter(user_id=user_id).update(**values)
+
+
+def record_deltas(user_id, deltas, touch_last_active=False):
+    """
+    Entry point for signal handlers: buffered in Redis when ANALYTICS_WRITE_BEHIND
+    is on (see analytics_buffer), applied to the database immediately otherwise.
+    Buffered deltas go out only once the triggering write commits, so a
+    rolled-back save leaves nothing behind in Redis.
+    """
+    if settings.ANALYTICS_WRITE_BEHIND:
+        deltas = dict(deltas)
+        transaction.on_commit(lambda: _buffer_or_apply(user_id, deltas, touch_last_active))
+        return
+    apply_deltas(user_id, deltas, touch_last_active)
+
+
+def _buffer_or_apply(user_id, deltas, touch_last_active):
+    from .analytics_buffer import buffer_deltas
+    if not buffer_deltas(user_id, deltas, touch_last_active):
+        apply_deltas(user_id, deltas, touch_last_active)
+
+
+def _counts_by_user(queryset, user_ids, **aggregates):
+    rows = queryset.filter(user_id__in=user_ids).values('user_id').annotate(**aggregates)
+    return {row.pop('user_id'): row for row in rows}
+
+
+def reconcile_user_analytics(user_ids=None, batch_size=500):
+    """
+    Recount every RECONCILED_FIELDS value from the source tables and save the
+    rows that drifted. Returns the number of rows corrected.
+    """
+    queryset = UserAnalytics.objects.order_by('pk')
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+
+    cutoff = timezone.now() - timedelta(days=7)
+    corrected = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return corrected
+        last_pk = batch[-1].pk
+        ids = [row.user_id for row in batch]
+
+        messages = _counts_by_user(Conversation.objects, ids, n=Count('id'), chars=Sum(Length('prompt_text')))
+        sessions = _counts_by_user(
+            ChatSession.objects, ids, n=Count('id'), recent=Count('id', filter=Q(created_at__gte=cutoff))
+        )
+        ledger = _counts_by_user(LedgerEntry.all_objects, ids, n=Count('id'))
+        actions = _counts_by_user(
+            ActionItem.all_objects, ids, n=Count('id'), done=Count('id', filter=Q(is_complete=True))
+        )
+
+        changed = []
+        for row in batch:
+            message_counts = messages.get(row.user_id, {})
+            session_counts = sessions.get(row.user_id, {})
+            action_counts = actions.get(row.user_id, {})
+            sent = message_counts.get('n', 0)
+            chars = message_counts.get('chars') or 0
+            expected = {
+                'total_messages_sent': sent,
+                'total_agent_responses': sent,
+                'total_message_chars': chars,
+                'avg_message_length': chars // sent if sent else 0,
+                'total_sessions': session_counts.get('n', 0),
+                'session_count_last_7_days': session_counts.get('recent', 0),
+                'ledger_entries_count': ledger.get(row.user_id, {}).get('n', 0),
+                'action_items_created': action_counts.get('n', 0),
+                'action_items_completed': action_counts.get('done', 0),
+            }
+            if any(getattr(row, field) != value for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(row, field, value)
+                changed.append(row)
+
+        if changed:
+            UserAnalytics.objects.bulk_update(changed, RECONCILED_FIELDS)
+            corrected += len(changed)
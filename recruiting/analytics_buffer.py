@@ -0,0 +1,206 @@
+"""
+Write-behind buffer for UserAnalytics counters (ANALYTICS_WRITE_BEHIND=True).
+
+Once the triggering write commits, signal handlers add their deltas to a
+per-user Redis hash and mark the user dirty, so a save never touches the
+UserAnalytics row. A periodic Celery task
+flushes the aggregated deltas with one CASE-based UPDATE per chunk of users.
+
+Flushing is crash-safe:
+  1. The dirty set and every dirty user's hash are renamed under a fresh batch
+     id in one MULTI, so new deltas keep accumulating in fresh keys.
+  2. The batch is applied in one database transaction that also inserts an
+     AnalyticsFlushBatch row; its unique batch_id makes re-applying a no-op.
+  3. Only after commit are the batch keys deleted. Batches left behind by a
+     crash stay in the pending set and are retried first on the next flush.
+
+Every flush run refreshes a heartbeat key. If it lapses (no beat scheduler
+running the flush), deltas are written straight to the database instead of
+piling up in Redis unflushed.
+"""
+import logging
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from . import redis_client
+from .analytics import adjusted, average_length
+from .models import AnalyticsFlushBatch, UserAnalytics
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'analytics:dirty'
+DELTAS_KEY = 'analytics:deltas:{user_id}'
+LAST_ACTIVE_KEY = 'analytics:last-active'
+PENDING_KEY = 'analytics:flush:pending'
+FLUSH_LOCK_KEY = 'analytics:flush:lock'
+BATCH_USERS_KEY = 'analytics:flush:{batch_id}:users'
+BATCH_DELTAS_KEY = 'analytics:flush:{batch_id}:deltas:{user_id}'
+BATCH_LAST_ACTIVE_KEY = 'analytics:flush:{batch_id}:last-active'
+HEARTBEAT_KEY = 'analytics:flush:heartbeat'
+
+
+def buffer_deltas(user_id, deltas, touch_last_active=False):
+    """
+    Add deltas to the user's buffer. Returns False if Redis is unavailable so
+    the caller can fall back to a direct database update.
+    """
+    if not user_id:
+        return True
+    try:
+        conn = redis_client.get_redis()
+        if not conn.exists(HEARTBEAT_KEY):
+            logger.warning("Analytics buffer is not being flushed (is celery beat running?); writing through.")
+            return False
+        pipe = conn.pipeline(transaction=True)
+        for field, delta in deltas.items():
+            if delta:
+                pipe.hincrby(DELTAS_KEY.format(user_id=user_id), field, delta)
+        if touch_last_active:
+            pipe.hset(LAST_ACTIVE_KEY, user_id, timezone.now().timestamp())
+        pipe.sadd(DIRTY_KEY, user_id)
+        pipe.execute()
+        return True
+    except redis.RedisError as e:
+        logger.warning(f"Analytics buffer unavailable, writing through: {e}")
+        return False
+
+
+def _snapshot(conn):
+    """Move the current dirty users and their deltas under a new batch id."""
+    # Sortable by creation time, so left-over batches are retried oldest first.
+    batch_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    with conn.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                pipe.watch(DIRTY_KEY)
+                user_ids = pipe.smembers(DIRTY_KEY)
+                if not user_ids:
+                    pipe.unwatch()
+                    return None
+                pipe.multi()
+                pipe.sadd(PENDING_KEY, batch_id)
+                pipe.rename(DIRTY_KEY, BATCH_USERS_KEY.format(batch_id=batch_id))
+                for user_id in user_ids:
+                    pipe.rename(
+                        DELTAS_KEY.format(user_id=user_id),
+                        BATCH_DELTAS_KEY.format(batch_id=batch_id, user_id=user_id),
+                    )
+                pipe.rename(LAST_ACTIVE_KEY, BATCH_LAST_ACTIVE_KEY.format(batch_id=batch_id))
+                # A user whose only change was last_active has no hash, and the
+                # last-active hash may be absent; those RENAMEs fail harmlessly.
+                pipe.execute(raise_on_error=False)
+                return batch_id
+            except redis.WatchError:
+                continue
+
+
+def _read_batch(conn, batch_id):
+    user_ids = sorted(int(user_id) for user_id in conn.smembers(BATCH_USERS_KEY.format(batch_id=batch_id)))
+    pipe = conn.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.hgetall(BATCH_DELTAS_KEY.format(batch_id=batch_id, user_id=user_id))
+    hashes = pipe.execute()
+    rows = {
+        user_id: {field: int(delta) for field, delta in raw.items() if int(delta)}
+        for user_id, raw in zip(user_ids, hashes)
+    }
+    last_active = {
+        int(user_id): datetime.fromtimestamp(float(ts), tz=dt_timezone.utc)
+        for user_id, ts in conn.hgetall(BATCH_LAST_ACTIVE_KEY.format(batch_id=batch_id)).items()
+    }
+    return rows, last_active
+
+
+def _apply_rows(rows, last_active):
+    """One UPDATE for a chunk of users, each column a CASE over user_id."""
+    user_ids = list(rows)
+    existing = set(UserAnalytics.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    missing = [
+        user_id for user_id, deltas in rows.items()
+        if user_id not in existing and any(delta > 0 for delta in deltas.values())
+    ]
+    if missing:
+        live = User.objects.filter(id__in=missing).values_list('id', flat=True)
+        UserAnalytics.objects.bulk_create([UserAnalytics(user_id=user_id) for user_id in live], ignore_conflicts=True)
+
+    values = {}
+    fields = sorted({field for deltas in rows.values() for field in deltas})
+    for field in fields:
+        whens = [
+            When(user_id=user_id, then=adjusted(field, deltas[field]))
+            for user_id, deltas in rows.items() if field in deltas
+        ]
+        values[field] = Case(*whens, default=F(field), output_field=IntegerField())
+
+    averaged = [
+        When(user_id=user_id, then=average_length(deltas))
+        for user_id, deltas in rows.items()
+        if 'total_messages_sent' in deltas or 'total_message_chars' in deltas
+    ]
+    if averaged:
+        values['avg_message_length'] = Case(*averaged, default=F('avg_message_length'), output_field=IntegerField())
+
+    active = [When(user_id=user_id, then=Value(ts)) for user_id, ts in last_active.items() if user_id in rows]
+    if active:
+        values['last_active'] = Case(*active, default=F('last_active'))
+    values['updated_at'] = timezone.now()
+
+    UserAnalytics.objects.filter(user_id__in=user_ids).update(**values)
+
+
+def _discard_batch(conn, batch_id, user_ids):
+    keys = [BATCH_USERS_KEY.format(batch_id=batch_id), BATCH_LAST_ACTIVE_KEY.format(batch_id=batch_id)]
+    keys += [BATCH_DELTAS_KEY.format(batch_id=batch_id, user_id=user_id) for user_id in user_ids]
+    pipe = conn.pipeline(transaction=True)
+    pipe.delete(*keys)
+    pipe.srem(PENDING_KEY, batch_id)
+    pipe.execute()
+
+
+def _flush_batch(conn, batch_id, chunk_size):
+    rows, last_active = _read_batch(conn, batch_id)
+    for user_id in last_active:
+        rows.setdefault(user_id, {})
+    user_ids = list(rows)
+    if AnalyticsFlushBatch.objects.filter(batch_id=batch_id).exists():
+        # Already committed by an earlier flush that died before cleaning up.
+        logger.info(f"Analytics flush batch {batch_id} was already applied; discarding.")
+    else:
+        # Any error rolls the marker back and leaves the batch pending for a retry.
+        with transaction.atomic():
+            AnalyticsFlushBatch.objects.create(batch_id=batch_id, users=len(user_ids))
+            for start in range(0, len(user_ids), chunk_size):
+                chunk = {user_id: rows[user_id] for user_id in user_ids[start:start + chunk_size]}
+                _apply_rows(chunk, last_active)
+    _discard_batch(conn, batch_id, user_ids)
+    return len(user_ids)
+
+
+def flush_analytics_buffer(chunk_size=None):
+    """
+    Apply all buffered deltas to UserAnalytics. Returns the number of users
+    flushed; 0 if another flush holds the lock.
+    """
+    chunk_size = chunk_size or settings.ANALYTICS_FLUSH_BATCH_SIZE
+    conn = redis_client.get_redis()
+    conn.set(HEARTBEAT_KEY, 1, ex=settings.ANALYTICS_FLUSH_HEARTBEAT_SECONDS)
+    if not conn.set(FLUSH_LOCK_KEY, 1, nx=True, ex=settings.ANALYTICS_FLUSH_LOCK_SECONDS):
+        return 0
+    try:
+        flushed = 0
+        for batch_id in sorted(conn.smembers(PENDING_KEY)):
+            flushed += _flush_batch(conn, batch_id, chunk_size)
+        batch_id = _snapshot(conn)
+        if batch_id:
+            flushed += _flush_batch(conn, batch_id, chunk_size)
+        return flushed
+    finally:
+        conn.delete(FLUSH_LOCK_KEY)
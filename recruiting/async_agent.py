@@ -0,0 +1,171 @@
+"""
+Asyncio agent pipeline for the ASGI entry point.
+
+The Celery path parks one prefork worker process on every blocking Vertex call.
+Here the model turns (generate_content_async) and the tool calls (httpx) are
+coroutines, so a single ASGI process can keep many I/O-bound conversations in
+flight. The tool loop, prompts, search formatting and search cache are the same
+ones the Celery task uses; Celery remains the path for background tasks.
+"""
+import asyncio
+import logging
+import random
+
+import httpx
+from django.conf import settings
+from vertexai.generative_models import Content, Part
+
+from . import streaming
+from .http_client import RETRY_STATUSES
+from .model_registry import get_model
+from .models import AdminSettings, Conversation
+from .prompts import content_hash
+from .tasks import (
+    CUSTOM_SEARCH_ENGINE_ID, GOOGLE_API_KEY, MODEL_NAME, SEARCH_API_URL, TOOL_CONFIG_AUTO,
+    UNTETHERED_PROMPT, extract_response_text, format_search_results, google_search, search_tool,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_FUNCTION_ROUNDS = 5
+
+# One AsyncClient per event loop; connections are pooled and kept alive.
+_client = None
+_client_loop = None
+
+
+def get_async_client():
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.AGENT_ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AGENT_ASYNC_HTTP_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(
+                settings.OUTBOUND_HTTP_READ_TIMEOUT,
+                connect=settings.OUTBOUND_HTTP_CONNECT_TIMEOUT,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def async_get(url, params=None):
+    """GET with the same jittered retry policy as http_client, without blocking the loop."""
+    client = get_async_client()
+    attempts = settings.OUTBOUND_HTTP_RETRIES + 1
+    for attempt in range(attempts):
+        try:
+            response = await client.get(url, params=params)
+        except httpx.ConnectError:
+            if attempt == attempts - 1:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                return response
+        delay = settings.OUTBOUND_HTTP_BACKOFF_FACTOR * (2 ** attempt)
+        await asyncio.sleep(delay + random.uniform(0, settings.OUTBOUND_HTTP_BACKOFF_JITTER))
+
+
+async def _fetch_search(query):
+    if not GOOGLE_API_KEY or not CUSTOM_SEARCH_ENGINE_ID:
+        return {"error": "CRITICAL CREDENTIAL ERROR: Search API keys are missing or invalid."}
+
+    params = {'key': GOOGLE_API_KEY, 'cx': CUSTOM_SEARCH_ENGINE_ID, 'q': query, 'num': 5}
+    try:
+        response = await async_get(SEARCH_API_URL, params=params)
+        response.raise_for_status()
+        return format_search_results(response.json())
+    except httpx.HTTPError as e:
+        logger.error(f"Async Google Search request failed: {e}")
+        return {"error": f"Search Service Unavailable. HTTP Request Failed: {e}"}
+
+
+async def async_google_search(query):
+    """google_search for the event loop; shares its result cache with the Celery tool."""
+    return await google_search.cache.aget_or_fetch(query, lambda: _fetch_search(query))
+
+
+ASYNC_TOOLS = {
+    "google_search": async_google_search,
+}
+
+
+async def _invoke_tool(name, args):
+    tool = ASYNC_TOOLS.get(name)
+    if tool is None:
+        return {"error": f"Unknown tool '{name}'."}
+    try:
+        return await asyncio.wait_for(tool(**args), timeout=settings.AGENT_TOOL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"error": f"The {name} tool timed out after {settings.AGENT_TOOL_TIMEOUT_SECONDS:g}s."}
+    except Exception as e:
+        logger.error(f"Tool '{name}' raised: {e}")
+        return {"error": f"The {name} tool failed: {e}"}
+
+
+async def _run_tool_calls(function_call_content):
+    calls = [
+        (part.function_call.name, dict(part.function_call.args))
+        for part in function_call_content.parts
+        if part.function_call
+    ]
+    outputs = await asyncio.gather(*(_invoke_tool(name, args) for name, args in calls))
+    return [
+        Part.from_function_response(name=name, response=output)
+        for (name, _), output in zip(calls, outputs)
+    ]
+
+
+async def generate_reply(model, user_prompt, history_dicts, call_context=''):
+    """Runs the model and tool loop as coroutines and returns the reply text."""
+    history = [
+        Content(role=item['role'], parts=[Part.from_text(p['text']) for p in item['parts']])
+        for item in history_dicts
+    ]
+    prompt_parts = [Part.from_text(call_context)] if call_context else []
+    messages_for_api = history + [Content(role="user", parts=prompt_parts + [Part.from_text(user_prompt)])]
+
+    response = await model.generate_content_async(messages_for_api, tool_config=TOOL_CONFIG_AUTO)
+
+    for _ in range(MAX_FUNCTION_ROUNDS):
+        if not (response.candidates and response.candidates[0].function_calls):
+            break
+        model_function_call_content = response.candidates[0].content
+        messages_for_api.append(model_function_call_content)
+        tool_responses = await _run_tool_calls(model_function_call_content)
+        if not tool_responses:
+            break
+        messages_for_api.append(Content(role="tool", parts=tool_responses))
+        response = await model.generate_content_async(messages_for_api, tool_config=TOOL_CONFIG_AUTO)
+    else:
+        logger.warning(f"Async agent reached maximum function calling rounds ({MAX_FUNCTION_ROUNDS}).")
+
+    return extract_response_text(response)
+
+
+async def respond(user, chat_session, user_prompt, core_prompt, history_dicts, prompt_hash='', call_context=''):
+    """
+    Async equivalent of the get_ai_response task: honours untethered mode,
+    generates the reply and stores it as a Conversation, which is returned.
+    """
+    if await AdminSettings.objects.filter(user=user, untethered_mode_enabled=True).aexists():
+        core_prompt = UNTETHERED_PROMPT
+        prompt_hash = content_hash(UNTETHERED_PROMPT)
+        call_context = ''
+
+    if settings.AGENT_FAKE_MODEL:
+        model = streaming.FakeStreamingModel()
+    else:
+        model = get_model(MODEL_NAME, core_prompt, (search_tool,))
+
+    reply = await generate_reply(model, user_prompt, history_dicts, call_context)
+    return await Conversation.objects.acreate(
+        session=chat_session,
+        user=user,
+        prompt_text=user_prompt,
+        response_text=reply,
+        prompt_hash=prompt_hash,
+    )
@@ -0,0 +1,286 @@
+"""
+Athlete search for coach and recruiter views.
+
+Filters on sport, position, graduation year, GPA range, state and metric
+thresholds compile into one SportProfile query. The structured filters are
+served by composite indexes (sport, graduation year, GPA on active profiles;
+upper-cased state on UserProfile; position on PositionProfile); position and metric
+thresholds are a correlated EXISTS on the athlete's PositionProfile and its
+typed MetricValues (see metric_store), so an athlete appears once however
+many positions they play. A code with no MetricDefinition has no stored
+values, so its threshold falls back to casting numeric-looking values of the
+profile's metrics JSON in SQL. Pages are keyset on the profile id.
+
+Facet counts (per graduation year, state and position for the current
+filters) are cached per sport under a version counter. A change to a profile
+bumps only its sport's counter, so the facets of every other sport stay
+cached and only the affected sport is recounted on its next search.
+"""
+import dataclasses
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, Exists, F, FloatField, OuterRef, Q, When
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, Upper
+
+from .catalog import get_catalog
+from .metric_store import to_canonical
+from .models import FamilyMember, MetricValue, PositionProfile, SportProfile
+from .pagination import decode_pk_cursor, encode_pk_cursor
+
+VERSION_KEY = 'athlete-search:version:{scope}'
+FACET_KEY = 'athlete-search:facets:{scope}:{version}:{digest}'
+ALL_SPORTS = '*'
+
+METRIC_OPERATORS = ('gte', 'lte')
+# Undefined metrics are free-form JSON; only numeric-looking ones are cast.
+NUMERIC_PATTERN = r'^\s*-?[0-9]+(\.[0-9]+)?\s*$'
+CODE_PATTERN = re.compile(r'^[A-Za-z0-9_]+$')
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class MetricThreshold:
+    code: str
+    op: str
+    value: float
+
+
+@dataclass(frozen=True, slots=True)
+class SearchFilters:
+    sport: str = None
+    position: str = None
+    grad_year: int = None
+    gpa_min: Decimal = None
+    gpa_max: Decimal = None
+    state: str = None
+    metrics: tuple = ()
+
+    @classmethod
+    def from_query(cls, params):
+        """
+        Parse request.GET: sport, position, grad_year, gpa_min, gpa_max, state
+        and repeated metric=code:gte|lte:value. Raises InvalidSearch.
+        """
+        try:
+            grad_year = int(params['grad_year']) if params.get('grad_year') else None
+            gpa_min = Decimal(params['gpa_min']) if params.get('gpa_min') else None
+            gpa_max = Decimal(params['gpa_max']) if params.get('gpa_max') else None
+        except (ValueError, InvalidOperation):
+            raise InvalidSearch('grad_year, gpa_min and gpa_max must be numbers.')
+        metrics = []
+        for raw in params.getlist('metric'):
+            code, _, rest = raw.partition(':')
+            op, _, value = rest.partition(':')
+            try:
+                value = float(value)
+            except ValueError:
+                raise InvalidSearch(f'Invalid metric filter {raw!r}; expected code:gte|lte:value.')
+            if op not in METRIC_OPERATORS or not CODE_PATTERN.match(code):
+                raise InvalidSearch(f'Invalid metric filter {raw!r}; expected code:gte|lte:value.')
+            metrics.append(MetricThreshold(code, op, value))
+        return cls(
+            sport=(params.get('sport') or '').strip().upper() or None,
+            position=(params.get('position') or '').strip().upper() or None,
+            grad_year=grad_year,
+            gpa_min=gpa_min,
+            gpa_max=gpa_max,
+            state=(params.get('state') or '').strip().upper() or None,
+            metrics=tuple(sorted(metrics, key=lambda m: (m.code, m.op))),
+        )
+
+    def without(self, **changes):
+        return dataclasses.replace(self, **changes)
+
+    def digest(self):
+        return hashlib.sha256(repr(self).encode('utf-8')).hexdigest()[:32]
+
+
+def can_search_athletes(user):
+    """Staff and family members invited as coaches."""
+    return user.is_staff or FamilyMember.objects.filter(user_id=user.id, role='coach').exists()
+
+
+def _metric_condition(threshold, sport_id):
+    """Q over MetricValue for a threshold given in each definition's own unit, or None if no definition."""
+    condition = None
+    for definition in get_catalog().metrics_with_code(threshold.code, sport_id):
+        q = Q(metric_definition_id=definition.id, **{
+            f'canonical_value__{threshold.op}': to_canonical(threshold.value, definition.unit)
+        })
+        condition = q if condition is None else condition | q
+    return condition
+
+
+def _metric_value(code):
+    text = KeyTextTransform(code, 'metrics')
+    return Case(
+        When(**{f'metrics__{code}__regex': NUMERIC_PATTERN}, then=Cast(text, FloatField())),
+        default=None,
+        output_field=FloatField(),
+    )
+
+
+def compile_filters(filters):
+    """The active SportProfiles matching filters, as one queryset."""
+    catalog = get_catalog()
+    queryset = SportProfile.objects.filter(is_active=True)
+    sport = None
+    if filters.sport:
+        sport = catalog.sport_by_code(filters.sport)
+        if sport is None:
+            return queryset.none()
+        queryset = queryset.filter(sport_id=sport.id)
+    if filters.grad_year is not None:
+        queryset = queryset.filter(graduation_year=filters.grad_year)
+    if filters.gpa_min is not None:
+        queryset = queryset.filter(gpa__gte=filters.gpa_min)
+    if filters.gpa_max is not None:
+        queryset = queryset.filter(gpa__lte=filters.gpa_max)
+    if filters.state:
+        queryset = queryset.filter(user_profile__state__iexact=filters.state)
+
+    if filters.position or filters.metrics:
+        positions = PositionProfile.objects.filter(sport_profile_id=OuterRef('pk'))
+        if filters.position:
+            if sport is None:
+                raise InvalidSearch('A position filter needs a sport.')
+            position = catalog.position_by_code(sport.code, filters.position)
+            if position is None:
+                return queryset.none()
+            positions = positions.filter(position_id=position.id)
+        for i, threshold in enumerate(filters.metrics):
+            condition = _metric_condition(threshold, sport.id if sport else None)
+            if condition is None:
+                alias = f'metric_{i}'
+                positions = positions.alias(**{alias: _metric_value(threshold.code)}).filter(
+                    **{f'{alias}__{threshold.op}': threshold.value}
+                )
+                continue
+            positions = positions.filter(
+                Exists(MetricValue.objects.filter(condition, position_profile_id=OuterRef('pk')))
+            )
+        queryset = queryset.filter(Exists(positions))
+    return queryset
+
+
+RESULT_FIELDS = (
+    'pk', 'sport_id', 'graduation_year', 'gpa', 'current_team', 'team_level',
+    'user_profile__user__username', 'user_profile__user__first_name', 'user_profile__user__last_name',
+    'user_profile__high_school', 'user_profile__city', 'user_profile__state',
+)
+
+
+def search(filters, cursor=None, limit=20):
+    """(results, next cursor or None) for one page: two queries."""
+    queryset = compile_filters(filters)
+    if cursor:
+        queryset = queryset.filter(pk__gt=decode_pk_cursor(cursor))
+    rows = list(queryset.order_by('pk').values(*RESULT_FIELDS)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    catalog = get_catalog()
+    positions = {}
+    position_rows = PositionProfile.objects.filter(sport_profile_id__in=[row['pk'] for row in rows]).order_by(
+        '-is_primary', 'pk'
+    ).values_list('sport_profile_id', 'position_id')
+    for sport_profile_id, position_id in position_rows:
+        position = catalog.position(position_id)
+        if position is not None:
+            positions.setdefault(sport_profile_id, []).append(position.code)
+
+    results = []
+    for row in rows:
+        sport = catalog.sport(row['sport_id'])
+        full_name = f"{row['user_profile__user__first_name']} {row['user_profile__user__last_name']}".strip()
+        results.append({
+            'sport_profile_id': row['pk'],
+            'name': full_name or row['user_profile__user__username'],
+            'sport': sport.code if sport else None,
+            'positions': positions.get(row['pk'], []),
+            'graduation_year': row['graduation_year'],
+            'gpa': str(row['gpa']) if row['gpa'] is not None else None,
+            'team': row['current_team'],
+            'team_level': row['team_level'],
+            'high_school': row['user_profile__high_school'],
+            'city': row['user_profile__city'],
+            'state': row['user_profile__state'],
+        })
+    next_cursor = encode_pk_cursor(rows[-1]['pk']) if has_more else None
+    return results, next_cursor
+
+
+# ---------------------------------------------------------------------------
+# Facets
+# ---------------------------------------------------------------------------
+
+def current_version(scope):
+    version = cache.get(VERSION_KEY.format(scope=scope))
+    if version is None:
+        cache.add(VERSION_KEY.format(scope=scope), time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY.format(scope=scope))
+    return version
+
+
+def _count_by(queryset, expression):
+    rows = queryset.order_by().values(key=expression).annotate(n=Count('pk')).values_list('key', 'n')
+    return {value: n for value, n in rows if value not in (None, '')}
+
+
+def _compute_facets(filters):
+    facets = {
+        'total': compile_filters(filters).count(),
+        'graduation_year': _count_by(compile_filters(filters.without(grad_year=None)), F('graduation_year')),
+        'state': _count_by(compile_filters(filters.without(state=None)), Upper('user_profile__state')),
+    }
+    if filters.sport:
+        catalog = get_catalog()
+        athletes = compile_filters(filters.without(position=None))
+        rows = (
+            PositionProfile.objects.filter(sport_profile__in=athletes).order_by()
+            .values('position_id').annotate(n=Count('pk')).values_list('position_id', 'n')
+        )
+        facets['position'] = {
+            catalog.position(position_id).code: n for position_id, n in rows if catalog.position(position_id)
+        }
+    return facets
+
+
+def facet_counts(filters):
+    """
+    Counts per graduation year, state and (within a sport) position, each
+    under every other active filter, e.g. how many 2026 QBs there are per
+    state. Cached until a profile in the sport changes.
+    """
+    sport = get_catalog().sport_by_code(filters.sport) if filters.sport else None
+    scope = sport.id if sport else ALL_SPORTS
+    key = FACET_KEY.format(scope=scope, version=current_version(scope), digest=filters.digest())
+    facets = cache.get(key)
+    if facets is None:
+        facets = _compute_facets(filters)
+        cache.set(key, facets, settings.ATHLETE_SEARCH_FACET_TTL)
+    return facets
+
+
+def _bump(scope):
+    try:
+        cache.incr(VERSION_KEY.format(scope=scope))
+    except ValueError:
+        cache.set(VERSION_KEY.format(scope=scope), time.time_ns(), timeout=None)
+
+
+def invalidate_facets(sport_ids):
+    """An athlete in these sports changed: expire their facets and the all-sports ones."""
+    for sport_id in set(sport_ids):
+        _bump(sport_id)
+    _bump(ALL_SPORTS)
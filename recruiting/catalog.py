@@ -0,0 +1,218 @@
+"""
+Process-local catalog of the sport reference tables.
+
+Sport, Position and MetricDefinition are small and change only when an admin
+edits them or seed_sports runs, yet nearly every profile, admin row and
+context builder reads through them. The catalog loads all three tables once
+per process into frozen, slotted records indexed by id, code and
+(sport, position), so those reads never touch the database.
+
+Saving or deleting any of the three models bumps a shared version counter
+(same scheme as prompts); each process checks it at most every
+CATALOG_VERSION_CHECK_SECONDS and reloads on its next lookup after a change.
+"""
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import MetricDefinition, Position, Sport
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+@dataclass(frozen=True, slots=True)
+class SportRecord:
+    id: int
+    code: str
+    name: str
+    is_active: bool
+    has_positions: bool
+    has_events: bool
+    has_weight_classes: bool
+
+
+@dataclass(frozen=True, slots=True)
+class PositionRecord:
+    id: int
+    sport_id: int
+    code: str
+    name: str
+    abbreviation: str
+    category: str
+    display_order: int
+
+
+@dataclass(frozen=True, slots=True)
+class MetricRecord:
+    id: int
+    sport_id: int
+    position_id: int
+    code: str
+    name: str
+    metric_type: str
+    unit: str
+    is_required: bool
+    is_common: bool
+    min_value: Decimal
+    max_value: Decimal
+    display_order: int
+
+
+class Catalog:
+    """An immutable snapshot of the reference tables with lookup indexes."""
+    __slots__ = (
+        'version', '_sports', '_sports_by_code', '_positions', '_positions_by_code',
+        '_positions_by_sport', '_metrics', '_metrics_by_scope', '_metrics_by_code', '_metrics_with_code',
+    )
+
+    def __init__(self, version, sports, positions, metrics):
+        self.version = version
+        self._sports = {sport.id: sport for sport in sports}
+        self._sports_by_code = {sport.code: sport for sport in sports}
+        self._positions = {position.id: position for position in positions}
+        self._positions_by_code = {}
+        by_sport = {}
+        for position in sorted(positions, key=lambda p: (p.display_order, p.name)):
+            self._positions_by_code[(position.sport_id, position.code)] = position
+            by_sport.setdefault(position.sport_id, []).append(position)
+        self._positions_by_sport = {sport_id: tuple(rows) for sport_id, rows in by_sport.items()}
+        self._metrics = {metric.id: metric for metric in metrics}
+        by_scope = {}
+        for metric in sorted(metrics, key=lambda m: (m.display_order, m.name)):
+            by_scope.setdefault((metric.sport_id, metric.position_id), []).append(metric)
+        self._metrics_by_scope = {scope: tuple(rows) for scope, rows in by_scope.items()}
+        self._metrics_by_code = {}
+        self._metrics_with_code = {}
+        for metric in sorted(metrics, key=lambda m: m.position_id is not None):
+            self._metrics_by_code.setdefault((metric.sport_id, metric.code), metric)
+            self._metrics_with_code.setdefault(metric.code, []).append(metric)
+
+    def sports(self):
+        return tuple(sorted(self._sports.values(), key=lambda sport: sport.name))
+
+    def sport(self, sport_id):
+        return self._sports.get(sport_id)
+
+    def sport_by_code(self, code):
+        return self._sports_by_code.get(code)
+
+    def position(self, position_id):
+        return self._positions.get(position_id)
+
+    def position_by_code(self, sport_code, position_code):
+        sport = self._sports_by_code.get(sport_code)
+        return self._positions_by_code.get((sport.id, position_code)) if sport else None
+
+    def positions_for(self, sport_id):
+        return self._positions_by_sport.get(sport_id, ())
+
+    def metric(self, metric_id):
+        return self._metrics.get(metric_id)
+
+    def metric_by_code(self, sport_id, code):
+        """A sport's metric by code, preferring the all-position definition."""
+        return self._metrics_by_code.get((sport_id, code))
+
+    def metrics_with_code(self, code, sport_id=None):
+        """Every definition using code (all positions), optionally within one sport."""
+        return tuple(
+            metric for metric in self._metrics_with_code.get(code, ())
+            if sport_id is None or metric.sport_id == sport_id
+        )
+
+    def metrics_for(self, sport_code, position_code=None):
+        """
+        Metrics recorded for a sport: the ones that apply to every position
+        (position=None) followed by the position's own, each in display order.
+        Unknown codes give an empty tuple.
+        """
+        sport = self._sports_by_code.get(sport_code)
+        if sport is None:
+            return ()
+        if position_code is None:
+            return self.metrics_in_scope(sport.id)
+        position = self._positions_by_code.get((sport.id, position_code))
+        if position is None:
+            return ()
+        return self.metrics_in_scope(sport.id, position.id)
+
+    def metrics_in_scope(self, sport_id, position_id=None):
+        """metrics_for by ids."""
+        common = self._metrics_by_scope.get((sport_id, None), ())
+        if position_id is None:
+            return common
+        return common + self._metrics_by_scope.get((sport_id, position_id), ())
+
+
+def load_catalog(version):
+    sports = [
+        SportRecord(*row) for row in Sport.objects.values_list(
+            'id', 'code', 'name', 'is_active', 'has_positions', 'has_events', 'has_weight_classes'
+        )
+    ]
+    positions = [
+        PositionRecord(*row) for row in Position.objects.values_list(
+            'id', 'sport_id', 'code', 'name', 'abbreviation', 'category', 'display_order'
+        )
+    ]
+    metrics = [
+        MetricRecord(*row) for row in MetricDefinition.objects.values_list(
+            'id', 'sport_id', 'position_id', 'code', 'name', 'metric_type', 'unit',
+            'is_required', 'is_common', 'min_value', 'max_value', 'display_order',
+        )
+    ]
+    return Catalog(version, sports, positions, metrics)
+
+
+# Per-process catalog and when its version was last compared with the shared one.
+_catalog = None
+_checked_at = 0.0
+
+
+def current_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def get_catalog(fresh=False):
+    """
+    Return the process's Catalog, loading it on first use. Costs nothing
+    between version checks and one shared-cache read per check; fresh=True
+    checks the shared version now (for work queued by a catalog change).
+    """
+    global _catalog, _checked_at
+    now = time.monotonic()
+    if not fresh and _catalog is not None and now - _checked_at < settings.CATALOG_VERSION_CHECK_SECONDS:
+        return _catalog
+    version = current_version()
+    if _catalog is None or _catalog.version != version:
+        _catalog = load_catalog(version)
+    _checked_at = now
+    return _catalog
+
+
+def invalidate_catalog():
+    """Move every process to a new catalog version; this process reloads on its next lookup."""
+    global _catalog
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, (_catalog.version + 1) if _catalog else 2, timeout=None)
+    _catalog = None
+
+
+def sport_name(sport_id):
+    """Name from the catalog; None for rows it does not hold yet (e.g. uncommitted)."""
+    sport = get_catalog().sport(sport_id)
+    return sport.name if sport else None
+
+
+def position_name(position_id):
+    position = get_catalog().position(position_id)
+    return position.name if position else None
@@ -0,0 +1,151 @@
+"""
+Family-shared views of the Ledger, Game Plan and sport profiles.
+
+A member sees their own rows plus the rows shared with their family
+(family_account set), subject to their FamilyMember permissions:
+can_manage_ledger for Ledger entries, can_manage_actions for Action Items.
+Both halves are one OR'd filter, so each board is a single query served by
+the per-user and per-family partial indexes.
+
+Board pages are cached under a version counter per family (or per user, for
+users without one). Every write by a member, or to a row shared with the
+family, bumps it once committed, so members polling the same boards are
+answered from the cache until something on them actually changes.
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import ActionItem, FamilyMember, LedgerEntry, SportProfile
+
+MEMBERSHIP_KEY = 'family-feed:member:{user_id}'
+VERSION_KEY = 'family-feed:version:{scope}'
+PAGE_KEY = 'family-feed:page:{scope}:{version}:{user_id}:{params}'
+
+
+@dataclass(frozen=True)
+class Membership:
+    family_id: int = None
+    can_manage_ledger: bool = False
+    can_manage_actions: bool = False
+    can_edit_profile: bool = False
+
+
+def _membership(user_id):
+    key = MEMBERSHIP_KEY.format(user_id=user_id)
+    membership = cache.get(key)
+    if membership is None:
+        row = (
+            FamilyMember.objects.filter(user_id=user_id)
+            .values_list('family_account_id', 'can_manage_ledger', 'can_manage_actions', 'can_edit_profile')
+            .first()
+        )
+        membership = Membership(*row) if row else Membership()
+        cache.set(key, membership, settings.FAMILY_FEED_CACHE_TTL)
+    return membership
+
+
+def membership_for(user):
+    """The user's family and sharing permissions; cached, and memoised on the user for the request."""
+    if not hasattr(user, '_family_membership'):
+        user._family_membership = _membership(user.id)
+    return user._family_membership
+
+
+def _visible(user, family_id, shared):
+    q = Q(user_id=user.id)
+    if family_id and shared:
+        q |= Q(family_account_id=family_id)
+    return q
+
+
+def ledger_entries(user, manager=None):
+    manager = manager or LedgerEntry.objects
+    membership = membership_for(user)
+    return manager.filter(_visible(user, membership.family_id, membership.can_manage_ledger))
+
+
+def action_items(user, manager=None):
+    manager = manager or ActionItem.objects
+    membership = membership_for(user)
+    return manager.filter(_visible(user, membership.family_id, membership.can_manage_actions))
+
+
+def sport_profiles(user):
+    """The user's own sport profiles first, then the ones shared with their family."""
+    membership = membership_for(user)
+    q = Q(user_profile__user_id=user.id)
+    if membership.family_id:
+        q |= Q(family_account_id=membership.family_id)
+    own_first = Case(When(user_profile__user_id=user.id, then=Value(0)), default=Value(1), output_field=IntegerField())
+    return SportProfile.objects.filter(q).order_by(own_first, '-is_primary_sport', 'sport__name')
+
+
+def editable_sport_profiles(user):
+    """The sport profiles the user may write to: their own, plus the family's with can_edit_profile."""
+    membership = membership_for(user)
+    q = Q(user_profile__user_id=user.id)
+    if membership.family_id and membership.can_edit_profile:
+        q |= Q(family_account_id=membership.family_id)
+    return SportProfile.objects.filter(q)
+
+
+def _scope(user_id, family_id):
+    return f'family:{family_id}' if family_id else f'user:{user_id}'
+
+
+def current_version(scope):
+    version = cache.get(VERSION_KEY.format(scope=scope))
+    if version is None:
+        # A fresh starting value, so pages cached before the key was evicted
+        # can never be mistaken for current ones.
+        cache.add(VERSION_KEY.format(scope=scope), time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY.format(scope=scope))
+    return version
+
+
+def cached_page(user, board, params, compute):
+    """
+    compute() for this user's board, cached until the user's family (or the
+    user, outside a family) next writes. params identify the page requested.
+    """
+    scope = _scope(user.id, membership_for(user).family_id)
+    digest = hashlib.sha256(repr((board, params)).encode('utf-8')).hexdigest()[:32]
+    key = PAGE_KEY.format(scope=scope, version=current_version(scope), user_id=user.id, params=digest)
+    page = cache.get(key)
+    if page is None:
+        page = compute()
+        cache.set(key, page, settings.FAMILY_FEED_CACHE_TTL)
+    return page
+
+
+def _bump(scope):
+    try:
+        cache.incr(VERSION_KEY.format(scope=scope))
+    except ValueError:
+        cache.set(VERSION_KEY.format(scope=scope), time.time_ns(), timeout=None)
+
+
+def invalidate(user_id, family_id=None):
+    """Expire the boards a write by user_id (to a row shared with family_id) shows up on."""
+    scopes = {_scope(user_id, _membership(user_id).family_id)}
+    if family_id:
+        scopes.add(_scope(user_id, family_id))
+    for scope in scopes:
+        _bump(scope)
+
+
+def invalidate_membership(user_id, family_id):
+    """A member joined, left or changed permissions: refresh their membership and both families' boards."""
+    key = MEMBERSHIP_KEY.format(user_id=user_id)
+    previous = cache.get(key)
+    cache.delete(key)
+    scopes = {_scope(user_id, None), _scope(user_id, family_id)}
+    if previous is not None:
+        scopes.add(_scope(user_id, previous.family_id))
+    for scope in scopes:
+        _bump(scope)
@@ -0,0 +1,73 @@
+"""
+Token-budgeted conversation history for agent calls.
+
+Walks a session's messages newest first and keeps whole turns until the next
+one would exceed the token budget, then returns them oldest first, the order
+the model expects. Very long past replies can be cut down first so that one
+essay-length answer does not crowd out the rest of the conversation.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+
+# Rough characters-per-token ratio for English text with Gemini tokenizers.
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_MARKER = "\n\n[... earlier reply truncated ...]"
+
+
+def estimate_tokens(text):
+    """Cheap local token estimate; no tokenizer round-trip."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_text(text, max_tokens):
+    """Cut text to roughly max_tokens, keeping the beginning. 0 disables truncation."""
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return text, False
+    return text[:max_tokens * CHARS_PER_TOKEN].rstrip() + TRUNCATION_MARKER, True
+
+
+@dataclass(frozen=True)
+class HistoryWindow:
+    contents: list
+    turns: int
+    tokens: int
+    truncated: int
+
+
+def build_history(chat_session, token_budget=None, max_turns=None, max_response_tokens=None):
+    """
+    Return a HistoryWindow of the most recent turns of chat_session that fit in
+    token_budget, as Vertex Content dicts in chronological order.
+    """
+    token_budget = settings.AGENT_HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+    max_turns = settings.AGENT_HISTORY_MAX_TURNS if max_turns is None else max_turns
+    if max_response_tokens is None:
+        max_response_tokens = settings.AGENT_HISTORY_MAX_RESPONSE_TOKENS
+
+    recent = (
+        chat_session.messages
+        .order_by('-timestamp', '-id')
+        .values_list('prompt_text', 'response_text')[:max_turns]
+    )
+
+    selected = []
+    tokens = 0
+    truncated = 0
+    for prompt_text, response_text in recent:
+        response_text, was_truncated = truncate_text(response_text, max_response_tokens)
+        turn_tokens = estimate_tokens(prompt_text) + estimate_tokens(response_text)
+        if tokens + turn_tokens > token_budget:
+            break
+        selected.append((prompt_text, response_text))
+        tokens += turn_tokens
+        truncated += was_truncated
+
+    contents = []
+    for prompt_text, response_text in reversed(selected):
+        contents.append({"role": "user", "parts": [{"text": prompt_text}]})
+        contents.append({"role": "model", "parts": [{"text": response_text}]})
+    return HistoryWindow(contents=contents, turns=len(selected), tokens=tokens, truncated=truncated)
@@ -0,0 +1,85 @@
+"""
+Process-wide outbound HTTP client for agent tools.
+
+One requests.Session per process keeps connections to the search API alive
+between tool calls, so repeat searches skip the TCP and TLS handshake. The pool
+is sized to the tool executor's concurrency, idempotent requests are retried
+with jittered backoff on 429 and 5xx responses, and connect and read timeouts
+are set separately.
+"""
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session():
+    retry = Retry(
+        total=settings.OUTBOUND_HTTP_RETRIES,
+        connect=settings.OUTBOUND_HTTP_RETRIES,
+        read=0,
+        status=settings.OUTBOUND_HTTP_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        backoff_factor=settings.OUTBOUND_HTTP_BACKOFF_FACTOR,
+        backoff_jitter=settings.OUTBOUND_HTTP_BACKOFF_JITTER,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=settings.OUTBOUND_HTTP_POOL_SIZE,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Return this process's shared Session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def reset():
+    """Drop the shared Session; the next call builds a new one."""
+    global _session, _session_lock
+    session, _session = _session, None
+    _session_lock = threading.Lock()
+    if session is not None:
+        session.close()
+
+
+def get(url, params=None, read_timeout=None):
+    """GET through the shared pool with (connect, read) timeouts from settings."""
+    timeout = (
+        settings.OUTBOUND_HTTP_CONNECT_TIMEOUT,
+        settings.OUTBOUND_HTTP_READ_TIMEOUT if read_timeout is None else read_timeout,
+    )
+    return get_session().get(url, params=params, timeout=timeout)
+
+
+def _reset_in_child():
+    # Sockets inherited across fork (Celery prefork) must not be shared with the parent.
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_in_child)
@@ -0,0 +1,206 @@
+"""
+Retrieval of relevant Ledger entries for prompt context and "related insights".
+
+Each entry's title and content become a hashed bag of words and word bigrams
+(sublinear term counts in DIMENSIONS buckets, L2-normalized), held as one
+NumPy matrix per scope: a user's private entries, or the entries shared with
+a family. A query is vectorized the same way, its terms weighted by inverse
+document frequency over the scopes searched, and scored against every row with
+one matrix-vector product; top-k is an argpartition. No vocabulary is kept, so
+rows never need recomputing when other entries change.
+
+Scopes are cached (Django cache, so shared across processes) under a version
+counter per scope, as in family_feed. A committed save or delete bumps the
+counter of the scopes the entry belongs to, and the scope is rebuilt from the
+database on its next query. Workers never read-modify-write a shared index,
+so concurrent saves can't drop each other's changes, and a build that raced a
+save lands under the old version and is never read.
+"""
+import re
+import time
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from . import family_feed
+from .history import CHARS_PER_TOKEN, estimate_tokens
+from .models import LedgerEntry
+
+VERSION_KEY = 'ledger-retrieval:version:{scope}'
+INDEX_KEY = 'ledger-retrieval:v2:{scope}:{version}'
+DIMENSIONS = 1024
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9']*")
+STOPWORDS = frozenset("""
+    a about after all also am an and any are as at be been before being but by can could did do does for from
+    get had has have he her here him his how i if in into is it its just me more most my no not of on or our out
+    should so some than that the their them then there these they this to up us was we were what when where which
+    who will with would you your
+""".split())
+
+
+def _features(text):
+    words = [w for w in TOKEN_PATTERN.findall((text or '').lower()) if w not in STOPWORDS]
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+def term_vector(text):
+    """Sublinear hashed term counts of text (unnormalized)."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for feature in _features(text):
+        vector[zlib.crc32(feature.encode('utf-8')) % DIMENSIONS] += 1
+    np.log1p(vector, out=vector)
+    return vector
+
+
+def entry_vector(title, content):
+    vector = term_vector(f'{title}\n{content}')
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass(frozen=True)
+class ScopeIndex:
+    """Rows of one scope: entry ids, their authors, and unit vectors."""
+    ids: np.ndarray
+    user_ids: np.ndarray
+    vectors: np.ndarray
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros((0, DIMENSIONS), np.float32))
+
+
+def _scope(user_id, family_id):
+    return f'f{family_id}' if family_id else f'u{user_id}'
+
+
+def _build(scope):
+    if scope.startswith('f'):
+        entries = LedgerEntry.objects.filter(family_account_id=int(scope[1:]))
+    else:
+        entries = LedgerEntry.objects.filter(user_id=int(scope[1:]), family_account__isnull=True)
+    rows = list(entries.order_by('pk').values_list('pk', 'user_id', 'title', 'content'))
+    if not rows:
+        return ScopeIndex.empty()
+    return ScopeIndex(
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[1] for row in rows], dtype=np.int64),
+        np.vstack([entry_vector(title, content) for _, _, title, content in rows]),
+    )
+
+
+def _current_version(scope):
+    version = cache.get(VERSION_KEY.format(scope=scope))
+    if version is None:
+        # A fresh starting value, so indexes cached before the key was evicted
+        # can never be mistaken for current ones.
+        cache.add(VERSION_KEY.format(scope=scope), time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY.format(scope=scope))
+    return version
+
+
+def get_scope(scope):
+    key = INDEX_KEY.format(scope=scope, version=_current_version(scope))
+    index = cache.get(key)
+    if index is None:
+        index = _build(scope)
+        cache.set(key, index, settings.LEDGER_RETRIEVAL_CACHE_TTL)
+    return index
+
+
+def _bump(scope):
+    try:
+        cache.incr(VERSION_KEY.format(scope=scope))
+    except ValueError:
+        cache.set(VERSION_KEY.format(scope=scope), time.time_ns(), timeout=None)
+
+
+def entry_changed(user_id, family_id):
+    """Expire the scopes an entry saved or deleted by user_id can be in. Call once the change has committed."""
+    # A shared entry may have just moved out of its author's private scope.
+    _bump(_scope(user_id, None))
+    if family_id:
+        _bump(_scope(user_id, family_id))
+
+
+# ---------------------------------------------------------------------------
+# Retrieval
+# ---------------------------------------------------------------------------
+
+def _visible_rows(user):
+    """(ids, vectors) of every live entry the user can see; the same rows as family_feed.ledger_entries."""
+    membership = family_feed.membership_for(user)
+    parts = [get_scope(_scope(user.id, None))]
+    if membership.family_id:
+        shared = get_scope(_scope(None, membership.family_id))
+        if not membership.can_manage_ledger:
+            keep = shared.user_ids == user.id
+            shared = ScopeIndex(shared.ids[keep], shared.user_ids[keep], shared.vectors[keep])
+        parts.append(shared)
+    if len(parts) == 1:
+        return parts[0].ids, parts[0].vectors
+    return np.concatenate([p.ids for p in parts]), np.vstack([p.vectors for p in parts])
+
+
+def _top(ids, scores, k, min_score):
+    if len(ids) > k:
+        candidates = np.argpartition(-scores, k)[:k]
+    else:
+        candidates = np.arange(len(ids))
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+    # Entries sharing no term with the query score 0 and are never returned.
+    return [(int(ids[i]), float(scores[i])) for i in candidates if scores[i] > 0 and scores[i] >= min_score]
+
+
+def top_k(user, text, k=5, min_score=0.0, exclude=()):
+    """[(entry id, cosine score)] of the user's visible entries most similar to text, best first."""
+    ids, vectors = _visible_rows(user)
+    query = term_vector(text)
+    if not len(ids) or not query.any():
+        return []
+    # Terms found in fewer of the entries searched count for more.
+    document_frequency = np.count_nonzero(vectors, axis=0)
+    query *= np.log((1 + len(ids)) / (1 + document_frequency)) + 1
+    query /= np.linalg.norm(query)
+    scores = vectors @ query
+    if exclude:
+        scores[np.isin(ids, list(exclude))] = -1.0
+    return _top(ids, scores, k, min_score)
+
+
+def related_entries(user, entry, k=5):
+    """Entries the user can see that are most similar to entry (excluding it), best first."""
+    return top_k(user, f'{entry.title}\n{entry.content}', k, settings.LEDGER_CONTEXT_MIN_SCORE, exclude=(entry.pk,))
+
+
+def ledger_context(user, text, token_budget=None, k=None):
+    """
+    Up to k of the user's Ledger insights most relevant to text, as prompt
+    lines that fit token_budget, best first. Long insights are cut to share
+    the budget fairly.
+    """
+    token_budget = settings.LEDGER_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    k = settings.LEDGER_CONTEXT_TOP_K if k is None else k
+    matches = top_k(user, text, k, settings.LEDGER_CONTEXT_MIN_SCORE)
+    if not matches or token_budget <= 0:
+        return []
+    entries = LedgerEntry.objects.in_bulk([entry_id for entry_id, _ in matches])
+    line_chars = token_budget // len(matches) * CHARS_PER_TOKEN
+    lines, tokens = [], 0
+    for entry_id, _ in matches:
+        entry = entries.get(entry_id)
+        if entry is None:
+            continue
+        line = f'"{entry.title}": ' + ' '.join(entry.content.split())
+        if len(line) > line_chars:
+            line = line[:max(0, line_chars - 3)].rstrip() + '...'
+        line_tokens = estimate_tokens(line)
+        if tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        tokens += line_tokens
+    return lines
@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the typed MetricValue rows from the metrics JSON
+on PositionProfile and PerformanceEntry. Needed once after the table is added,
+after bulk edits that bypass model signals, and after a MetricDefinition's
+unit or code changes.
+Run with: python manage.py backfill_metric_values [--model position|performance] [--batch-size N]
+"""
+from django.core.management.base import BaseCommand
+
+from recruiting.metric_store import BACKFILL_SOURCES, backfill
+
+
+class Command(BaseCommand):
+    help = 'Rewrites unit-normalized MetricValue rows from the metrics JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=tuple(BACKFILL_SOURCES), action='append', dest='models',
+                            help='Only this source (repeatable); default both')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Source rows per transaction')
+
+    def handle(self, *args, **options):
+        for source in options['models'] or BACKFILL_SOURCES:
+            rows, values = backfill(source, batch_size=max(1, options['batch_size']))
+            self.stdout.write(self.style.SUCCESS(
+                f'Backfilled {source} metric values: {values} value(s) from {rows} row(s).'
+            ))
@@ -0,0 +1,30 @@
+"""
+Management command to recount the denormalized message stats on ChatSession
+(message_count, last_message_at, prompt/response character totals).
+Needed once after the fields are added, and after bulk Conversation changes.
+Run with: python manage.py backfill_session_stats [--user USERNAME]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recruiting.models import ChatSession
+from recruiting.session_stats import backfill_session_stats
+
+
+class Command(BaseCommand):
+    help = 'Recounts per-session message stats from the Conversation table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help="Only this user's sessions (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions per recount batch')
+
+    def handle(self, *args, **options):
+        session_ids = None
+        if options['usernames']:
+            session_ids = list(
+                ChatSession.objects.filter(user__username__in=options['usernames']).values_list('id', flat=True)
+            )
+            if not session_ids:
+                raise CommandError('No sessions for those users.')
+
+        corrected = backfill_session_stats(session_ids=session_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Backfilled session stats: {corrected} session(s) updated.'))
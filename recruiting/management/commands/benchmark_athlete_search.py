@@ -0,0 +1,126 @@
+"""
+Management command to benchmark athlete search and facet counts on a
+generated dataset.
+Run with: python manage.py benchmark_athlete_search --athletes 100000
+
+All generated data is written inside a transaction that is rolled back at the
+end, so the command is safe to run against a development database.
+"""
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+from django.utils import timezone
+
+from recruiting import athlete_search
+from recruiting.catalog import invalidate_catalog
+from recruiting.metric_store import build_values
+from recruiting.models import (
+    MetricDefinition, MetricValue, Position, PositionProfile, Sport, SportProfile, UserProfile,
+)
+
+STATES = ('TX', 'CA', 'FL', 'GA', 'OH', 'PA', 'NY', 'IL', 'NC', 'AL', 'LA', 'MI', 'VA', 'NJ', 'AZ')
+POSITIONS = ('QB', 'RB', 'WR', 'TE', 'OL', 'DL', 'LB', 'CB', 'S', 'K')
+
+
+class _Rollback(Exception):
+    """Raised to discard the benchmark data once measurements are taken."""
+
+
+class Command(BaseCommand):
+    help = 'Times athlete search pages and facet counts over a generated athlete table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--athletes', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            invalidate_catalog()
+            self.stdout.write(self.style.SUCCESS('Benchmark data rolled back.'))
+
+    def _run(self, options):
+        code = f'BENCH{uuid.uuid4().hex[:8].upper()}'
+        sport = Sport.objects.create(name=f'Bench {code}', code=code)
+        positions = Position.objects.bulk_create([
+            Position(sport=sport, name=name, code=name, abbreviation=name) for name in POSITIONS
+        ])
+        MetricDefinition.objects.bulk_create([
+            MetricDefinition(sport=sport, name='Forty', code='forty', metric_type='TIME', unit='SECONDS'),
+            MetricDefinition(sport=sport, name='Vertical', code='vertical', metric_type='DISTANCE', unit='INCHES'),
+        ])
+        invalidate_catalog()
+
+        start = time.perf_counter()
+        self._generate(sport, positions, options['athletes'], options['batch_size'])
+        self.stdout.write(f"Generated {options['athletes']} athletes in {time.perf_counter() - start:.1f}s")
+
+        queries = {
+            'sport': f'sport={code}',
+            'sport+year+state': f'sport={code}&grad_year=2026&state=TX',
+            'sport+position+year': f'sport={code}&position=QB&grad_year=2026',
+            'all structured': f'sport={code}&position=QB&grad_year=2026&state=TX&gpa_min=3.5',
+            'with metric': f'sport={code}&position=WR&grad_year=2027&metric=forty:lte:4.5',
+        }
+        self.stdout.write(f"{'query':>22} {'page (ms)':>10} {'facets cold (ms)':>17} {'facets warm (ms)':>17} {'total':>8}")
+        for label, query in queries.items():
+            filters = athlete_search.SearchFilters.from_query(QueryDict(query))
+            page_ms = self._time(lambda: athlete_search.search(filters), options['repeat'])
+            cache.clear()
+            start = time.perf_counter()
+            facets = athlete_search.facet_counts(filters)
+            cold_ms = (time.perf_counter() - start) * 1000
+            warm_ms = self._time(lambda: athlete_search.facet_counts(filters), options['repeat'])
+            self.stdout.write(f'{label:>22} {page_ms:>10.2f} {cold_ms:>17.2f} {warm_ms:>17.3f} {facets["total"]:>8}')
+
+    def _time(self, fn, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def _generate(self, sport, positions, athletes, batch_size):
+        prefix = uuid.uuid4().hex[:8]
+        for offset in range(0, athletes, batch_size):
+            size = min(batch_size, athletes - offset)
+            users = User.objects.bulk_create([
+                User(username=f'bench-{prefix}-{offset + i}') for i in range(size)
+            ])
+            profiles = UserProfile.objects.bulk_create([
+                UserProfile(user=user, state=random.choice(STATES)) for user in users
+            ])
+            sport_profiles = SportProfile.objects.bulk_create([
+                SportProfile(
+                    user_profile=profile, sport=sport, graduation_year=random.randint(2025, 2029),
+                    gpa=Decimal(random.randint(200, 400)) / 100,
+                )
+                for profile in profiles
+            ])
+            position_profiles = PositionProfile.objects.bulk_create([
+                PositionProfile(
+                    sport_profile=sport_profile, position=random.choice(positions),
+                    metrics={'forty': str(round(random.uniform(4.3, 5.4), 2)), 'vertical': random.randint(22, 40)},
+                )
+                for sport_profile in sport_profiles
+            ])
+            # bulk_create skips the signal that mirrors metrics into MetricValue.
+            now = timezone.now()
+            MetricValue.objects.bulk_create([
+                value
+                for profile in position_profiles
+                for value in build_values(
+                    profile.sport_profile_id, sport.id, profile.position_id, profile.metrics, now,
+                    position_profile_id=profile.pk,
+                )
+            ])
@@ -0,0 +1,89 @@
+"""
+Management command to measure import_performances throughput in rows per second.
+Run with: python manage.py benchmark_import_performances --rows 50000 [--batch-sizes 100,500,2000]
+
+Synthetic CSV rows are generated on the fly and imported at each batch size,
+next to the one-save-per-row baseline on a sample. All generated data is
+written inside a transaction that is rolled back at the end, so the command
+is safe to run against a development database.
+"""
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recruiting.catalog import invalidate_catalog
+from recruiting.models import MetricDefinition, PerformanceEntry, Sport, SportProfile, UserProfile
+from recruiting.performance_import import PerformanceImporter
+
+METRICS = ('points', 'rebounds', 'assists', 'minutes')
+
+
+class _Rollback(Exception):
+    """Raised to discard the benchmark data once measurements are taken."""
+
+
+def _csv_lines(rows):
+    yield 'date,season,opponent,' + ','.join(f'{code}[COUNT]' for code in METRICS) + '\n'
+    start = date(2020, 1, 1)
+    for i in range(rows):
+        day = start + timedelta(days=i % 2000)
+        values = ','.join(str(random.randint(0, 40)) for _ in METRICS)
+        yield f'{day.isoformat()},{day.year} Season,Opponent {i % 37},{values}\n'
+
+
+class Command(BaseCommand):
+    help = 'Times bulk performance imports (rows/s) against per-row saves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000, help='Rows imported per batch size')
+        parser.add_argument('--batch-sizes', default='100,500,2000')
+        parser.add_argument('--baseline-rows', type=int, default=1000, help='Rows saved one at a time')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            invalidate_catalog()
+            self.stdout.write(self.style.SUCCESS('Benchmark data rolled back.'))
+
+    def _run(self, options):
+        sport = Sport.objects.create(name=f'Bench {uuid.uuid4().hex[:8]}', code=f'BENCH_{uuid.uuid4().hex[:8]}')
+        MetricDefinition.objects.bulk_create([
+            MetricDefinition(sport=sport, name=code.title(), code=code, metric_type='COUNT', unit='COUNT',
+                             min_value=0, max_value=100)
+            for code in METRICS
+        ])
+        invalidate_catalog()
+
+        self.stdout.write(f"{'method':>22} {'rows':>10} {'seconds':>10} {'rows/s':>12}")
+        baseline = options['baseline_rows']
+        if baseline:
+            sport_profile = self._athlete(sport)
+            start = time.perf_counter()
+            for i in range(baseline):
+                PerformanceEntry.objects.create(
+                    sport_profile=sport_profile, date=date(2020, 1, 1) + timedelta(days=i % 2000),
+                    season='Baseline', metrics={code: random.randint(0, 40) for code in METRICS},
+                )
+            seconds = time.perf_counter() - start
+            self.stdout.write(f"{'per-row save':>22} {baseline:>10} {seconds:>10.2f} {baseline / seconds:>12,.0f}")
+
+        for batch_size in (int(size) for size in options['batch_sizes'].split(',') if size.strip()):
+            # A fresh athlete per run, so the trend rebuild at the end sees only this run's rows.
+            importer = PerformanceImporter(default_sport_profile_id=self._athlete(sport).id, batch_size=batch_size)
+            result = importer.run(_csv_lines(options['rows']))
+            label = f'bulk, batch {batch_size}'
+            self.stdout.write(
+                f'{label:>22} {result.created:>10} {result.seconds:>10.2f} {result.rows_per_second:>12,.0f}'
+            )
+
+    def _athlete(self, sport):
+        user = User.objects.create(username=f'bench-{uuid.uuid4().hex[:12]}')
+        return SportProfile.objects.create(user_profile=UserProfile.objects.create(user=user), sport=sport)
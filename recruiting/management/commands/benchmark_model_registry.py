@@ -0,0 +1,85 @@
+"""
+Management command to micro-benchmark per-task model construction against the
+per-process ModelRegistry. Uses a stub model class that does the same local
+set-up work as GenerativeModel, so no credentials or network are needed.
+Run with: python manage.py benchmark_model_registry --iterations 2000
+"""
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from vertexai.generative_models import Content, Part
+
+from recruiting.model_registry import ModelRegistry
+from recruiting.tasks import ACTION_ITEMS_SYSTEM_PROMPT, MODEL_NAME, TITLE_SUMMARY_SYSTEM_PROMPT, search_tool
+
+
+class StubGenerativeModel:
+    """
+    Mirrors GenerativeModel's constructor work (system-instruction Content and
+    tool declaration conversion) without creating a prediction client.
+    """
+
+    def __init__(self, model_name, system_instruction=None, tools=None):
+        self._model_name = model_name
+        self._system_instruction = Content(
+            role='system',
+            parts=[Part.from_text(text) for text in (system_instruction or [])],
+        )
+        self._tools = [tool.to_dict() for tool in (tools or [])]
+
+
+def _stub_factory(model_name, system_instruction, tools):
+    return StubGenerativeModel(
+        model_name,
+        system_instruction=[system_instruction] if system_instruction else None,
+        tools=list(tools) if tools else None,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compares fresh per-task model construction with ModelRegistry reuse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Simulated task runs per strategy')
+        parser.add_argument('--max-size', type=int, default=32, help='Registry LRU size')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        agent_prompt = "You are Coach Alex, a recruiting advisor. " * 400
+        # The same mix of model specs our three tasks request.
+        specs = [
+            (MODEL_NAME, agent_prompt, (search_tool,)),
+            (MODEL_NAME, ACTION_ITEMS_SYSTEM_PROMPT, ()),
+            (MODEL_NAME, TITLE_SUMMARY_SYSTEM_PROMPT, ()),
+        ]
+
+        def fresh(i):
+            model_name, instruction, tools = specs[i % len(specs)]
+            return _stub_factory(model_name, instruction, tools)
+
+        registry = ModelRegistry(factory=_stub_factory, max_size=options['max_size'])
+
+        def pooled(i):
+            model_name, instruction, tools = specs[i % len(specs)]
+            return registry.get(model_name, instruction, tools)
+
+        fresh_us, fresh_kib = self._measure(fresh, iterations)
+        pooled_us, pooled_kib = self._measure(pooled, iterations)
+
+        self.stdout.write(f"{'strategy':<12} {'per task (us)':>14} {'peak alloc (KiB)':>16}")
+        self.stdout.write(f"{'fresh':<12} {fresh_us:>14.1f} {fresh_kib:>16.1f}")
+        self.stdout.write(f"{'registry':<12} {pooled_us:>14.1f} {pooled_kib:>16.1f}")
+        self.stdout.write(f"Registry stats: {registry.stats()}")
+        if pooled_us:
+            self.stdout.write(self.style.SUCCESS(f'Speed-up: {fresh_us / pooled_us:.1f}x'))
+
+    def _measure(self, build, iterations):
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(iterations):
+            build(i)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed / iterations * 1_000_000, peak / 1024
@@ -0,0 +1,92 @@
+"""
+Management command to benchmark the task-status message lookup at scale.
+Run with: python manage.py benchmark_task_status --rows 1000000 [--legacy]
+
+All generated data is written inside a transaction that is rolled back at the
+end, so the command is safe to run against a development database.
+"""
+import random
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recruiting.models import ChatSession, Conversation
+
+
+class _Rollback(Exception):
+    """Raised to discard the benchmark data once measurements are taken."""
+
+
+class Command(BaseCommand):
+    help = 'Times get_task_status message lookups as the Conversation table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Total conversations to generate')
+        parser.add_argument('--checkpoints', type=int, default=4, help='Number of table sizes to measure at')
+        parser.add_argument('--lookups', type=int, default=500, help='Lookups timed per checkpoint')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--legacy', action='store_true',
+                            help='Also time the old response_text equality scan (slow at large sizes)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        checkpoints = max(1, options['checkpoints'])
+        step = max(1, rows // checkpoints)
+
+        try:
+            with transaction.atomic():
+                self._run(rows, step, options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS('Benchmark data rolled back.'))
+
+    def _run(self, rows, step, options):
+        user = User.objects.create(username=f'bench-{uuid.uuid4().hex[:12]}')
+        session = ChatSession.objects.create(user=user, title='Benchmark')
+        task_ids = []
+        created = 0
+
+        self.stdout.write(f"{'rows':>12} {'task_id lookup (us)':>22} {'legacy scan (us)':>18}")
+        while created < rows:
+            target = min(rows, created + step)
+            while created < target:
+                size = min(options['batch_size'], target - created)
+                batch = []
+                for _ in range(size):
+                    task_id = str(uuid.uuid4())
+                    task_ids.append(task_id)
+                    batch.append(Conversation(
+                        session=session,
+                        user=user,
+                        prompt_text='How do I contact college coaches?',
+                        response_text=f'Benchmark response {created} ' + 'x' * 2000,
+                        task_id=task_id,
+                    ))
+                    created += 1
+                Conversation.objects.bulk_create(batch, batch_size=options['batch_size'])
+
+            indexed_us = self._time_indexed(user, task_ids, options['lookups'])
+            legacy_us = self._time_legacy(created, options) if options['legacy'] else None
+            legacy_col = f'{legacy_us:>18.1f}' if legacy_us is not None else f"{'-':>18}"
+            self.stdout.write(f'{created:>12} {indexed_us:>22.1f} {legacy_col}')
+
+    def _time_indexed(self, user, task_ids, lookups):
+        sample = random.sample(task_ids, min(lookups, len(task_ids)))
+        start = time.perf_counter()
+        for task_id in sample:
+            Conversation.objects.select_related('session').filter(task_id=task_id, user=user).first()
+        return (time.perf_counter() - start) / len(sample) * 1_000_000
+
+    def _time_legacy(self, created, options):
+        # The legacy lookup is a sequential scan, so a handful of probes is enough.
+        probes = 5
+        start = time.perf_counter()
+        for _ in range(probes):
+            n = random.randrange(created)
+            Conversation.objects.filter(
+                response_text=f'Benchmark response {n} ' + 'x' * 2000
+            ).order_by('-timestamp').first()
+        return (time.perf_counter() - start) / probes * 1_000_000
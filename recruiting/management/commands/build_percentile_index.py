@@ -0,0 +1,23 @@
+"""
+Management command to build and publish the cohort percentile index.
+Celery beat runs incremental builds; run this to create the first generation,
+or with --full after bulk edits that bypass model signals.
+Run with: python manage.py build_percentile_index [--full]
+"""
+from django.core.management.base import BaseCommand
+
+from recruiting.percentiles import build_index
+
+
+class Command(BaseCommand):
+    help = 'Builds the sport/position/graduation-year percentile index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every cohort, not only the queued ones')
+
+    def handle(self, *args, **options):
+        written = build_index(full=options['full'])
+        if written is None:
+            self.stdout.write('Nothing to rebuild, or another build is running.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Published percentile index: {written} cohort(s) written.'))
@@ -0,0 +1,68 @@
+"""
+Management command to bulk import PerformanceEntry or CompetitionResult rows
+from a CSV or JSONL file (see recruiting/performance_import.py for the layout).
+Valid rows are written in transactional batches; invalid ones are skipped and
+listed, or written to --error-report as CSV. After an interruption, rerun with
+the --start-line printed by the last run.
+Run with: python manage.py import_performances FILE [--model performance|competition]
+          [--sport-profile ID] [--batch-size N] [--dry-run] [--error-report PATH] [--start-line N]
+"""
+import csv
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recruiting.performance_import import COMPETITION, FORMATS, PERFORMANCE, PerformanceImporter
+
+
+class Command(BaseCommand):
+    help = 'Streams performance entries or competition results from CSV/JSONL into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file; '-' reads standard input")
+        parser.add_argument('--model', choices=(PERFORMANCE, COMPETITION), default=PERFORMANCE)
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--sport-profile', type=int, help='Sport profile id for rows without one')
+        parser.add_argument('--batch-size', type=int, default=settings.PERFORMANCE_IMPORT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing')
+        parser.add_argument('--error-report', help='Write skipped rows (line, field, message) to this CSV')
+        parser.add_argument('--start-line', type=int, default=0, help='Skip input up to and including this line')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if Path(path).suffix in ('.jsonl', '.ndjson') else 'csv')
+        importer = PerformanceImporter(
+            model=options['model'],
+            default_sport_profile_id=options['sport_profile'],
+            batch_size=max(1, options['batch_size']),
+            dry_run=options['dry_run'],
+        )
+        try:
+            if path == '-':
+                result = importer.run(self.stdin, fmt, start_line=options['start_line'])
+            else:
+                with open(path, newline='', encoding='utf-8-sig') as stream:
+                    result = importer.run(stream, fmt, start_line=options['start_line'])
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        except Exception:
+            self.stderr.write(f'Import stopped; rows through line {importer.last_committed_line} are committed.')
+            raise
+
+        if options['error_report']:
+            with open(options['error_report'], 'w', newline='', encoding='utf-8') as report:
+                writer = csv.writer(report)
+                writer.writerow(['line', 'field', 'message'])
+                writer.writerows((error.line, error.field, error.message) for error in result.errors)
+        else:
+            for error in result.errors[:50]:
+                self.stdout.write(f'  line {error.line} {error.field}: {error.message}')
+            if len(result.errors) > 50:
+                self.stdout.write(f'  ... {len(result.errors) - 50} more (use --error-report)')
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.created} row(s), skipped {result.skipped}, through line {result.last_line} '
+            f'({result.rows_read} rows in {result.seconds:.2f}s, {result.rows_per_second:,.0f} rows/s).'
+        ))
@@ -0,0 +1,30 @@
+"""
+Management command to rebuild MetricTrendSummary rows from PerformanceEntry history.
+New entries are folded in as they are saved; run this once to backfill, or
+after bulk edits that bypass model signals.
+Run with: python manage.py rebuild_metric_trends [--sport-profile ID]
+"""
+from django.core.management.base import BaseCommand
+
+from recruiting.models import PerformanceEntry
+from recruiting.trends import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recomputes per-metric trend summaries from performance entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sport-profile', type=int, action='append', dest='profile_ids',
+                            help='Only this sport profile id (repeatable)')
+
+    def handle(self, *args, **options):
+        profile_ids = options['profile_ids'] or (
+            PerformanceEntry.objects.order_by().values_list('sport_profile_id', flat=True).distinct()
+        )
+        profiles = summaries = 0
+        for profile_id in profile_ids:
+            summaries += rebuild_summaries(profile_id)
+            profiles += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt metric trends: {summaries} summary row(s) across {profiles} sport profile(s).'
+        ))
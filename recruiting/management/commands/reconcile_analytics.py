@@ -0,0 +1,28 @@
+"""
+Management command to recount UserAnalytics from the source tables.
+Signal handlers only apply increments, so this is the way to correct drift
+(e.g. after bulk updates) outside the nightly Celery beat job.
+Run with: python manage.py reconcile_analytics [--user USERNAME]
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from recruiting.analytics import reconcile_user_analytics
+
+
+class Command(BaseCommand):
+    help = 'Recounts UserAnalytics counters from conversations, sessions, ledger entries and action items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help='Only reconcile this user (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Analytics rows per recount batch')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(User.objects.filter(username__in=options['usernames']).values_list('id', flat=True))
+            if not user_ids:
+                raise CommandError('No matching users.')
+
+        corrected = reconcile_user_analytics(user_ids=user_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled analytics: {corrected} row(s) corrected.'))
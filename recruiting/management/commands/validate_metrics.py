@@ -0,0 +1,48 @@
+"""
+Management command to check PositionProfile and PerformanceEntry metrics JSON
+against the MetricDefinition bounds of each row's sport and position.
+Reports out-of-range, non-numeric, unknown-code and missing-required metrics;
+rows are streamed in chunks, so it is safe to run on the full tables.
+Run with: python manage.py validate_metrics [--model position|performance] [--chunk-size N]
+"""
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from recruiting.metric_validation import iter_violations
+from recruiting.models import PerformanceEntry, PositionProfile
+
+MODELS = {
+    'position': PositionProfile,
+    'performance': PerformanceEntry,
+}
+
+
+class Command(BaseCommand):
+    help = 'Validates stored athlete metrics against MetricDefinition bounds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append', help='Only this table (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows read and validated per batch')
+        parser.add_argument(
+            '--show', type=int, default=50, help='Violations listed per table (totals are always complete)'
+        )
+
+    def handle(self, *args, **options):
+        found = 0
+        for name in options['model'] or sorted(MODELS):
+            model = MODELS[name]
+            counts = Counter()
+            for violation in iter_violations(model.objects.all(), chunk_size=options['chunk_size']):
+                counts[violation.kind] += 1
+                if sum(counts.values()) <= options['show']:
+                    self.stdout.write(
+                        f'  {model.__name__} #{violation.object_id} {violation.code} '
+                        f'[{violation.kind}] {violation.value!r}: {violation.detail}'
+                    )
+            found += sum(counts.values())
+            summary = ', '.join(f'{kind}={n}' for kind, n in sorted(counts.items())) or 'no violations'
+            self.stdout.write(f'{model.__name__}: {summary}')
+
+        style = self.style.WARNING if found else self.style.SUCCESS
+        self.stdout.write(style(f'Metric validation finished: {found} violation(s).'))
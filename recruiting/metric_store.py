@@ -0,0 +1,227 @@
+"""
+Typed, unit-normalized copy of the metrics JSON in MetricValue rows.
+
+PositionProfile.metrics and PerformanceEntry.metrics stay the source of truth.
+Every numeric value with a MetricDefinition in the row's sport and position is
+mirrored as a MetricValue in the definition's SI unit (seconds, meters,
+kilograms; counts, points and percentages unchanged), rewritten whenever the
+row is saved and removed with it. Range filters and rankings then read the
+(metric_definition, canonical_value) index instead of parsing JSON.
+
+Thresholds and displayed values are in the definition's own unit; use
+to_canonical / from_canonical at the boundary.
+
+Creating, deleting or re-scoping a definition (its code, unit, sport or
+position) queues a resync of every row in its sport carrying that code, so
+the store follows the catalog without a manual backfill.
+"""
+from datetime import datetime, time, timezone as dt_timezone
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import get_catalog
+from .metric_validation import as_number
+from .models import MetricValue, PerformanceEntry, PositionProfile
+
+logger = logging.getLogger(__name__)
+
+# Definition unit -> (SI unit, multiplier into it).
+CANONICAL_UNITS = {
+    'SECONDS': ('s', 1.0),
+    'MINUTES': ('s', 60.0),
+    'INCHES': ('m', 0.0254),
+    'FEET': ('m', 0.3048),
+    'YARDS': ('m', 0.9144),
+    'METERS': ('m', 1.0),
+    'POUNDS': ('kg', 0.45359237),
+    'PERCENT': ('%', 1.0),
+    'COUNT': ('count', 1.0),
+    'POINTS': ('points', 1.0),
+    'NONE': ('', 1.0),
+}
+
+
+def to_canonical(value, unit):
+    return value * CANONICAL_UNITS.get(unit, ('', 1.0))[1]
+
+
+def from_canonical(value, unit):
+    return value / CANONICAL_UNITS.get(unit, ('', 1.0))[1]
+
+
+def build_values(sport_profile_id, sport_id, position_id, metrics, recorded_at,
+                 position_profile_id=None, performance_entry_id=None):
+    """Unsaved MetricValues for one metrics dict; codes without a definition and non-numbers are skipped."""
+    # The position's own definition wins over an all-position one with the same code.
+    definitions = {metric.code: metric for metric in get_catalog().metrics_in_scope(sport_id, position_id)}
+    values = []
+    for code, value in (metrics or {}).items():
+        definition = definitions.get(code)
+        number = as_number(value)
+        if definition is None or number is None:
+            continue
+        values.append(MetricValue(
+            sport_profile_id=sport_profile_id,
+            position_profile_id=position_profile_id,
+            performance_entry_id=performance_entry_id,
+            metric_definition_id=definition.id,
+            canonical_value=to_canonical(number, definition.unit),
+            raw_value=str(value)[:50],
+            recorded_at=recorded_at,
+        ))
+    return values
+
+
+def _entry_time(entry_date):
+    entry_date = PerformanceEntry._meta.get_field('date').to_python(entry_date)
+    return datetime.combine(entry_date, time.min, tzinfo=dt_timezone.utc)
+
+
+def _replace(source_field, source_id, values, created):
+    if created:
+        MetricValue.objects.bulk_create(values)
+        return
+    with transaction.atomic():
+        MetricValue.objects.filter(**{source_field: source_id}).delete()
+        MetricValue.objects.bulk_create(values)
+
+
+def sync_position_profile(profile, created=False):
+    values = build_values(
+        profile.sport_profile_id, profile.sport_profile.sport_id, profile.position_id, profile.metrics,
+        profile.updated_at or timezone.now(), position_profile_id=profile.pk,
+    )
+    _replace('position_profile_id', profile.pk, values, created)
+
+
+def sync_entry(entry, created=False):
+    position_id = None
+    if entry.position_profile_id:
+        position_id = PositionProfile.objects.filter(pk=entry.position_profile_id).values_list(
+            'position_id', flat=True
+        ).first()
+    values = build_values(
+        entry.sport_profile_id, entry.sport_profile.sport_id, position_id, entry.metrics,
+        _entry_time(entry.date), performance_entry_id=entry.pk,
+    )
+    _replace('performance_entry_id', entry.pk, values, created)
+
+
+def store_entries(scoped_entries):
+    """Values for freshly bulk-created entries: [(entry, sport_id, position_id)], one INSERT."""
+    values = []
+    for entry, sport_id, position_id in scoped_entries:
+        values.extend(build_values(
+            entry.sport_profile_id, sport_id, position_id, entry.metrics, _entry_time(entry.date),
+            performance_entry_id=entry.pk,
+        ))
+    MetricValue.objects.bulk_create(values, batch_size=1000)
+    return len(values)
+
+
+# Per source model: the values_list giving
+# (pk, sport_profile_id, sport_id, position_id, metrics, recorded_at) and the MetricValue source field.
+BACKFILL_SOURCES = {
+    'position': (
+        PositionProfile,
+        ('pk', 'sport_profile_id', 'sport_profile__sport_id', 'position_id', 'metrics', 'updated_at'),
+        'position_profile_id',
+    ),
+    'performance': (
+        PerformanceEntry,
+        ('pk', 'sport_profile_id', 'sport_profile__sport_id', 'position_profile__position_id', 'metrics', 'date'),
+        'performance_entry_id',
+    ),
+}
+
+
+def backfill(source, batch_size=1000, **filters):
+    """Rewrite the MetricValues of every row (matching filters) of a source model, batch_size rows per transaction."""
+    model, fields, source_field = BACKFILL_SOURCES[source]
+    rows_done = values_written = 0
+    now = timezone.now()
+    chunk = []
+    rows = model.objects.filter(**filters).order_by('pk').values_list(*fields).iterator(chunk_size=batch_size)
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch_size:
+            values_written += _backfill_chunk(chunk, source, source_field, now)
+            rows_done += len(chunk)
+            chunk = []
+    if chunk:
+        values_written += _backfill_chunk(chunk, source, source_field, now)
+        rows_done += len(chunk)
+    return rows_done, values_written
+
+
+def _backfill_chunk(chunk, source, source_field, now):
+    values = []
+    for pk, sport_profile_id, sport_id, position_id, metrics, recorded in chunk:
+        recorded_at = _entry_time(recorded) if source == 'performance' else (recorded or now)
+        values.extend(build_values(
+            sport_profile_id, sport_id, position_id, metrics, recorded_at, **{source_field: pk}
+        ))
+    with transaction.atomic():
+        MetricValue.objects.filter(**{f'{source_field}__in': [row[0] for row in chunk]}).delete()
+        MetricValue.objects.bulk_create(values)
+    return len(values)
+
+
+def resync_code(sport_id, code, batch_size=1000):
+    """Rewrite the MetricValues of every profile and entry in a sport whose metrics carry code."""
+    get_catalog(fresh=True)
+    values_written = 0
+    for source in BACKFILL_SOURCES:
+        values_written += backfill(
+            source, batch_size, sport_profile__sport_id=sport_id, metrics__has_key=code
+        )[1]
+    return values_written
+
+
+def queue_resync(scopes):
+    """Resync each (sport_id, code) in the background; call once the definition change has committed."""
+    from .tasks import resync_metric_values_task
+    for sport_id, code in set(scopes):
+        try:
+            resync_metric_values_task.delay(sport_id, code)
+        except Exception as e:
+            logger.warning(f"Could not queue a MetricValue resync for {code} in sport {sport_id}: {e}")
+
+
+def ranking(sport_code, metric_code, position_code=None, limit=10):
+    """
+    The best profile values of a metric within a sport (and position), best
+    first: one ordered scan of the (metric_definition, canonical_value) index.
+    Values are returned in the definition's unit.
+    """
+    catalog = get_catalog()
+    sport = catalog.sport_by_code(sport_code)
+    if sport is None:
+        return []
+    definitions = catalog.metrics_with_code(metric_code, sport.id)
+    queryset = MetricValue.objects.filter(
+        metric_definition_id__in=[definition.id for definition in definitions], position_profile__isnull=False
+    )
+    if position_code:
+        position = catalog.position_by_code(sport_code, position_code)
+        if position is None:
+            return []
+        definitions = [d for d in definitions if d.position_id in (None, position.id)]
+        queryset = queryset.filter(
+            metric_definition_id__in=[d.id for d in definitions], position_profile__position_id=position.id
+        )
+    if not definitions:
+        return []
+    units = {definition.id: definition.unit for definition in definitions}
+    lower_better = definitions[0].metric_type == 'TIME'
+    order = 'canonical_value' if lower_better else '-canonical_value'
+    rows = queryset.order_by(order, 'pk').values_list(
+        'sport_profile_id', 'metric_definition_id', 'canonical_value'
+    )[:limit]
+    return [
+        (sport_profile_id, from_canonical(value, units[definition_id]))
+        for sport_profile_id, definition_id, value in rows
+    ]
@@ -0,0 +1,164 @@
+"""
+Validation of the free-form metrics JSON on PositionProfile and PerformanceEntry
+against the MetricDefinitions of the row's sport and position.
+
+The definitions for each (sport, position) scope are compiled once per catalog
+version into NumPy arrays of lower/upper bounds and a required mask. A batch of
+rows from the same scope becomes one value matrix, so the bound and
+missing-required checks are a handful of array comparisons however many rows
+or metrics there are. Saving a single profile goes through the same compiled
+bounds (see the models' clean()).
+
+A scope with no definitions at all has nothing to check against, so its
+metrics pass as they are. Required metrics apply to PositionProfile only;
+a single game's PerformanceEntry may carry a partial stat line.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .catalog import get_catalog
+
+OUT_OF_RANGE = 'out_of_range'
+UNKNOWN_CODE = 'unknown_code'
+MISSING_REQUIRED = 'missing_required'
+NOT_NUMERIC = 'not_numeric'
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledBounds:
+    codes: tuple
+    index: dict
+    lower: np.ndarray
+    upper: np.ndarray
+    required: np.ndarray
+
+
+@dataclass(frozen=True, slots=True)
+class Violation:
+    object_id: int
+    code: str
+    kind: str
+    value: object = None
+    detail: str = ''
+
+
+# (sport_id, position_id) -> CompiledBounds, for the catalog version below.
+_compiled = {}
+_compiled_version = None
+
+
+def compile_bounds(sport_id, position_id=None):
+    """The compiled definitions for a scope, rebuilt when the catalog changes."""
+    global _compiled_version
+    catalog = get_catalog()
+    if catalog.version != _compiled_version:
+        _compiled.clear()
+        _compiled_version = catalog.version
+    key = (sport_id, position_id)
+    bounds = _compiled.get(key)
+    if bounds is None:
+        metrics = catalog.metrics_in_scope(sport_id, position_id)
+        codes = tuple(metric.code for metric in metrics)
+        bounds = CompiledBounds(
+            codes=codes,
+            index={code: i for i, code in enumerate(codes)},
+            lower=np.array([-np.inf if m.min_value is None else float(m.min_value) for m in metrics]),
+            upper=np.array([np.inf if m.max_value is None else float(m.max_value) for m in metrics]),
+            required=np.array([m.is_required for m in metrics], dtype=bool),
+        )
+        _compiled[key] = bounds
+    return bounds
+
+
+def as_number(value):
+    """float(value) for numeric JSON values and numeric strings, else None."""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if np.isfinite(number) else None
+
+
+def _validate_scope(bounds, rows, check_required=True):
+    """rows: [(object_id, metrics dict)] sharing one scope."""
+    if not bounds.codes:
+        return []
+    violations = []
+    values = np.full((len(rows), len(bounds.codes)), np.nan)
+    present = np.zeros(values.shape, dtype=bool)
+
+    for r, (object_id, metrics) in enumerate(rows):
+        for code, value in (metrics or {}).items():
+            i = bounds.index.get(code)
+            if i is None:
+                violations.append(
+                    Violation(object_id, code, UNKNOWN_CODE, value, 'No MetricDefinition for this sport/position.')
+                )
+                continue
+            present[r, i] = True
+            number = as_number(value)
+            if number is None:
+                violations.append(Violation(object_id, code, NOT_NUMERIC, value, 'Value is not a number.'))
+            else:
+                values[r, i] = number
+
+    # NaN compares False, so missing and non-numeric cells never count as out of range.
+    out_of_range = (values < bounds.lower) | (values > bounds.upper)
+    missing = bounds.required & ~present if check_required else np.zeros(values.shape, dtype=bool)
+    for r, i in zip(*np.nonzero(out_of_range)):
+        lower, upper = bounds.lower[i], bounds.upper[i]
+        violations.append(Violation(
+            rows[r][0], bounds.codes[i], OUT_OF_RANGE, rows[r][1][bounds.codes[i]],
+            f'Expected between {lower:g} and {upper:g}.',
+        ))
+    for r, i in zip(*np.nonzero(missing)):
+        violations.append(
+            Violation(rows[r][0], bounds.codes[i], MISSING_REQUIRED, detail='Required metric is missing.')
+        )
+    return violations
+
+
+def validate_batch(rows, check_required=True):
+    """
+    Validate [(object_id, sport_id, position_id, metrics)] and return the list
+    of Violations. Rows are grouped by scope and each scope checked as a block.
+    """
+    scopes = {}
+    for object_id, sport_id, position_id, metrics in rows:
+        scopes.setdefault((sport_id, position_id), []).append((object_id, metrics))
+    violations = []
+    for (sport_id, position_id), scope_rows in scopes.items():
+        violations.extend(_validate_scope(compile_bounds(sport_id, position_id), scope_rows, check_required))
+    return violations
+
+
+def validate_metrics(sport_id, position_id, metrics, object_id=None, check_required=True):
+    """Single-row fast path: the Violations for one metrics dict."""
+    return _validate_scope(compile_bounds(sport_id, position_id), [(object_id, metrics)], check_required)
+
+
+# Per model: values_list fields giving (pk, sport_id, position_id, metrics).
+SCOPE_FIELDS = {
+    'PositionProfile': ('pk', 'sport_profile__sport_id', 'position_id', 'metrics'),
+    'PerformanceEntry': ('pk', 'sport_profile__sport_id', 'position_profile__position_id', 'metrics'),
+}
+
+
+def iter_violations(queryset, chunk_size=2000):
+    """
+    Stream a PositionProfile or PerformanceEntry queryset in chunks and yield
+    the Violations of each chunk; memory stays bounded by chunk_size rows.
+    """
+    fields = SCOPE_FIELDS[queryset.model.__name__]
+    check_required = queryset.model.__name__ == 'PositionProfile'
+    chunk = []
+    for row in queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from validate_batch(chunk, check_required)
+            chunk = []
+    if chunk:
+        yield from validate_batch(chunk, check_required)
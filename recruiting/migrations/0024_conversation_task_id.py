@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0023_ledgerentry_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='task_id',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+    ]
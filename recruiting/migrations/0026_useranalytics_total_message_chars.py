@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:42
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def seed_total_message_chars(apps, schema_editor):
+    # Best estimate until the next reconciliation recounts from Conversation.
+    UserAnalytics = apps.get_model('recruiting', 'UserAnalytics')
+    UserAnalytics.objects.update(total_message_chars=F('avg_message_length') * F('total_messages_sent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0025_conversation_prompt_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useranalytics',
+            name='total_message_chars',
+            field=models.BigIntegerField(default=0, help_text='Running sum behind avg_message_length'),
+        ),
+        migrations.RunPython(seed_total_message_chars, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0026_useranalytics_total_message_chars'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsFlushBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=64, unique=True)),
+                ('users', models.IntegerField(default=0)),
+                ('flushed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
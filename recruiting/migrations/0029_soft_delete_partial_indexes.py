@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0028_chatsession_user_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='actionitem',
+            name='recruiting__family__2ee0de_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ledgerentry',
+            name='recruiting__family__2bf054_idx',
+        ),
+        migrations.AddIndex(
+            model_name='actionitem',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'is_complete', '-created_at'], name='action_user_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actionitem',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['family_account', 'is_complete', '-created_at'], name='action_family_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actionitem',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['user', '-created_at'], name='action_user_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', '-created_at'], name='ledger_user_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['family_account', '-created_at'], name='ledger_family_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['user', '-created_at'], name='ledger_user_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0030_chat_session_message_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricTrendSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric_code', models.CharField(max_length=50)),
+                ('lower_is_better', models.BooleanField(default=False, help_text='True for time-based metrics')),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('best_value', models.FloatField(blank=True, null=True)),
+                ('best_date', models.DateField(blank=True, null=True)),
+                ('latest_value', models.FloatField(blank=True, null=True)),
+                ('latest_date', models.DateField(blank=True, null=True)),
+                ('recent_values', models.JSONField(blank=True, default=list)),
+                ('rolling_average', models.FloatField(blank=True, null=True)),
+                ('season_sums', models.JSONField(blank=True, default=dict)),
+                ('season_rates', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sport_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_trends', to='recruiting.sportprofile')),
+            ],
+            options={
+                'unique_together': {('sport_profile', 'metric_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:15
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0031_metric_trend_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='positionprofile',
+            index=models.Index(fields=['position', 'sport_profile'], name='positionprofile_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sportprofile',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['sport', 'graduation_year', 'gpa'], name='sportprofile_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(django.db.models.functions.text.Upper('state'), name='userprofile_state_upper_idx'),
+        ),
+    ]
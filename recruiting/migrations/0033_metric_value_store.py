@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0032_athlete_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canonical_value', models.FloatField()),
+                ('raw_value', models.CharField(help_text='Value as stored in the metrics JSON', max_length=50)),
+                ('recorded_at', models.DateTimeField(help_text="Entry date, or when the profile's metrics were last saved")),
+                ('metric_definition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='recruiting.metricdefinition')),
+                ('performance_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='metric_values', to='recruiting.performanceentry')),
+                ('position_profile', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='metric_values', to='recruiting.positionprofile')),
+                ('sport_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_values', to='recruiting.sportprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric_definition', 'canonical_value'], name='metricvalue_rank_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('position_profile__isnull', True), ('performance_entry__isnull', True), _connector='XOR'), name='metricvalue_one_source'), models.UniqueConstraint(condition=models.Q(('position_profile__isnull', False)), fields=('position_profile', 'metric_definition'), name='metricvalue_position_unique'), models.UniqueConstraint(condition=models.Q(('performance_entry__isnull', False)), fields=('performance_entry', 'metric_definition'), name='metricvalue_entry_unique')],
+            },
+        ),
+    ]
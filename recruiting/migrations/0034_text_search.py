@@ -0,0 +1,79 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:02
+
+from django.db import migrations
+
+# Frozen copy of text_search.INDEXED_TABLES: (table, primary column, secondary column).
+INDEXED_TABLES = (
+    ('recruiting_conversation', 'prompt_text', 'response_text'),
+    ('recruiting_ledgerentry', 'title', 'content'),
+)
+
+
+def postgresql_statements(table, primary, secondary):
+    return [
+        f"""ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce("{primary}", '')), 'A') ||
+            setweight(to_tsvector('english', coalesce("{secondary}", '')), 'B')
+        ) STORED""",
+        f'CREATE INDEX IF NOT EXISTS "{table}_search_idx" ON "{table}" USING GIN (search_vector)',
+    ]
+
+
+def sqlite_statements(table, primary, secondary):
+    fts = f'{table}_fts'
+    columns = f'"{primary}", "{secondary}"'
+    new_values = f'new.id, new."{primary}", new."{secondary}"'
+    old_values = f"'delete', old.id, old.\"{primary}\", old.\"{secondary}\""
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" USING fts5(
+            {columns}, content='{table}', content_rowid='id', tokenize='porter unicode61'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS "{fts}_ai" AFTER INSERT ON "{table}" BEGIN
+            INSERT INTO "{fts}"(rowid, {columns}) VALUES ({new_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS "{fts}_ad" AFTER DELETE ON "{table}" BEGIN
+            INSERT INTO "{fts}"("{fts}", rowid, {columns}) VALUES ({old_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS "{fts}_au" AFTER UPDATE OF {columns} ON "{table}" BEGIN
+            INSERT INTO "{fts}"("{fts}", rowid, {columns}) VALUES ({old_values});
+            INSERT INTO "{fts}"(rowid, {columns}) VALUES ({new_values});
+        END""",
+        f"""INSERT INTO "{fts}"("{fts}") VALUES ('rebuild')""",
+    ]
+
+
+def install_text_search(apps, schema_editor):
+    # tsvector column and GIN index on PostgreSQL, FTS5 tables and triggers on SQLite.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = postgresql_statements
+    elif vendor == 'sqlite':
+        statements = sqlite_statements
+    else:
+        return
+    for table in INDEXED_TABLES:
+        for sql in statements(*table):
+            schema_editor.execute(sql)
+
+
+def uninstall_text_search(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, _, _ in INDEXED_TABLES:
+        if vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{table}_search_idx"')
+            schema_editor.execute(f'ALTER TABLE "{table}" DROP COLUMN IF EXISTS search_vector')
+        elif vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS "{table}_fts_{suffix}"')
+            schema_editor.execute(f'DROP TABLE IF EXISTS "{table}_fts"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0033_metric_value_store'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_text_search, uninstall_text_search),
+    ]
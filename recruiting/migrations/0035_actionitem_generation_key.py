@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0034_text_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actionitem',
+            name='generation_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='actionitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('generation_key', ''), _negated=True), fields=('source_ledger_entry', 'generation_key', 'description'), name='action_generated_unique'),
+        ),
+    ]
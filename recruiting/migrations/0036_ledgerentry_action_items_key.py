@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:21
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Adding a column rebuilds the table on SQLite, which drops its full-text
+# triggers; reinstalling them (idempotent) keeps search working both ways.
+install_text_search = import_module('recruiting.migrations.0034_text_search').install_text_search
+
+
+def record_existing_generations(apps, schema_editor):
+    """Entries that already have generated items keep their latest run's key."""
+    ActionItem = apps.get_model('recruiting', 'ActionItem')
+    LedgerEntry = apps.get_model('recruiting', 'LedgerEntry')
+    generated = ActionItem.objects.exclude(generation_key='').order_by('source_ledger_entry_id', 'id')
+    keys = dict(generated.values_list('source_ledger_entry_id', 'generation_key'))
+    for entry_id, key in keys.items():
+        LedgerEntry.objects.filter(pk=entry_id).update(action_items_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruiting', '0035_actionitem_generation_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, install_text_search),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='action_items_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(install_text_search, migrations.RunPython.noop),
+        migrations.RunPython(record_existing_generations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,113 @@
+"""
+Per-process registry of reusable GenerativeModel instances.
+
+Building a GenerativeModel converts the system instruction and tool
+declarations into request protos every time. Tasks that run with the same
+model name, system instruction and tool set can share one instance, so the
+registry keeps a bounded LRU of them per worker process.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from vertexai.generative_models import GenerativeModel
+
+
+# id(tool) -> (tool, declared function names). Tools are module-level constants,
+# so converting each one to a dict once is enough; the tool is kept alive here
+# so its id cannot be reused.
+_tool_name_cache = {}
+
+
+def _tool_names(tools):
+    names = []
+    for tool in tools or ():
+        cached = _tool_name_cache.get(id(tool))
+        if cached is None:
+            declared = tuple(
+                declaration['name']
+                for declaration in tool.to_dict().get('function_declarations', [])
+            )
+            cached = _tool_name_cache[id(tool)] = (tool, declared)
+        names.extend(cached[1])
+    return tuple(sorted(names))
+
+
+def build_generative_model(model_name, system_instruction, tools):
+    return GenerativeModel(
+        model_name,
+        system_instruction=[system_instruction] if system_instruction else None,
+        tools=list(tools) if tools else None,
+    )
+
+
+class ModelRegistry:
+    """
+    Bounded LRU of model instances keyed by (model name, system-instruction
+    hash, tool names), with hit/miss/eviction counters.
+    """
+
+    def __init__(self, factory=build_generative_model, max_size=32):
+        self._factory = factory
+        self._max_size = max_size
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(model_name, system_instruction, tools):
+        instruction_hash = hashlib.sha256((system_instruction or '').encode('utf-8')).hexdigest()
+        return (model_name, instruction_hash, _tool_names(tools))
+
+    def get(self, model_name, system_instruction=None, tools=None):
+        key = self.key_for(model_name, system_instruction, tools)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+            self.misses += 1
+
+        model = self._factory(model_name, system_instruction, tools)
+
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self._max_size:
+                self._models.popitem(last=False)
+                self.evictions += 1
+        return model
+
+    def warm(self, specs):
+        """Pre-build models for (model_name, system_instruction, tools) specs."""
+        for model_name, system_instruction, tools in specs:
+            self.get(model_name, system_instruction, tools)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._models),
+                'max_size': self._max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+registry = ModelRegistry(max_size=settings.MODEL_REGISTRY_MAX_SIZE)
+
+
+def get_model(model_name, system_instruction=None, tools=None):
+    """Return a shared model instance for this process."""
+    return registry.get(model_name, system_instruction, tools)
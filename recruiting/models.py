@@ -1,7 +1,21 @@
 import uuid
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
 
+
+class LiveManager(models.Manager):
+    """
+    Default manager for soft-deletable models: hides rows with is_deleted=True.
+    Use the model's `all_objects` manager to reach deleted rows.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class UserProfile(models.Model):
 # ... (UserProfile definition remains unchanged)
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -13,6 +27,19 @@ class UserProfile(models.Model):
     has_seen_welcome = models.BooleanField(default=False)
     onboarding_complete = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Athlete search matches state case-insensitively.
+            models.Index(Upper('state'), name='userprofile_state_upper_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # State as loaded; athlete search facets only need refreshing when it changes.
+        instance._loaded_state = instance.state if 'state' in field_names else None
+        return instance
+
     def __str__(self):
         return self.user.username
 
@@ -69,7 +96,8 @@ class Position(models.Model):
         ordering = ['sport', 'display_order', 'name']
 
     def __str__(self):
-        return f"{self.sport.name} - {self.name}"
+        from .catalog import sport_name
+        return f"{sport_name(self.sport_id) or self.sport.name} - {self.name}"
 
 
 class MetricDefinition(models.Model):
@@ -126,9 +154,31 @@ class MetricDefinition(models.Model):
         unique_together = ('sport', 'position', 'code')
         ordering = ['sport', 'display_order', 'name']
 
+    # Fields that decide which MetricValues a definition produces, as loaded,
+    # so the signal can tell a relabel from a change that needs a resync.
+    STORE_FIELDS = ('sport_id', 'position_id', 'code', 'unit')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_store_fields = tuple(getattr(instance, name, None) for name in cls.STORE_FIELDS)
+        return instance
+
     def __str__(self):
-        pos_str = f" ({self.position.name})" if self.position else " (All Positions)"
-        return f"{self.sport.name}{pos_str} - {self.name}"
+        from .catalog import position_name, sport_name
+        if self.position_id:
+            pos_str = f" ({position_name(self.position_id) or self.position.name})"
+        else:
+            pos_str = " (All Positions)"
+        return f"{sport_name(self.sport_id) or self.sport.name}{pos_str} - {self.name}"
+
+
+def raise_metric_violations(sport_id, position_id, metrics, check_required=True):
+    """Reject metrics outside their MetricDefinition bounds, unknown or (check_required) missing when required."""
+    from .metric_validation import validate_metrics
+    violations = validate_metrics(sport_id, position_id, metrics, check_required=check_required)
+    if violations:
+        raise ValidationError([f"{v.code}: {v.detail}" for v in violations])
 
 
 class SportProfile(models.Model):
@@ -176,11 +226,28 @@ class SportProfile(models.Model):
     class Meta:
         unique_together = ('user_profile', 'sport')
         ordering = ['-is_primary_sport', 'sport__name']
+        indexes = [
+            # Athlete search: sport, class and GPA range over active profiles.
+            models.Index(
+                fields=['sport', 'graduation_year', 'gpa'], condition=Q(is_active=True), name='sportprofile_search_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Percentile cohort as loaded, so a graduation-year change can requeue
+        # the cohort the profile's metrics are leaving.
+        instance._loaded_graduation_year = (
+            instance.graduation_year if 'graduation_year' in field_names else None
+        )
+        return instance
 
     def __str__(self):
         primary = " [PRIMARY]" if self.is_primary_sport else ""
         username = self.user_profile.user.username if self.user_profile else "Unknown User"
-        return f"{username} - {self.sport.name}{primary}"
+        from .catalog import sport_name
+        return f"{username} - {sport_name(self.sport_id) or self.sport.name}{primary}"
 
 
 class PositionProfile(models.Model):
@@ -210,11 +277,20 @@ class PositionProfile(models.Model):
     class Meta:
         unique_together = ('sport_profile', 'position')
         ordering = ['-is_primary', 'position__display_order']
+        indexes = [
+            models.Index(fields=['position', 'sport_profile'], name='positionprofile_position_idx'),
+        ]
+
+    def clean(self):
+        super().clean()
+        if self.sport_profile_id and self.position_id:
+            raise_metric_violations(self.sport_profile.sport_id, self.position_id, self.metrics)
 
     def __str__(self):
         primary = " [PRIMARY]" if self.is_primary else ""
         username = self.sport_profile.user_profile.user.username if self.sport_profile.user_profile else "Unknown User"
-        return f"{username} - {self.position.name}{primary}"
+        from .catalog import position_name
+        return f"{username} - {position_name(self.position_id) or self.position.name}{primary}"
 
 
 class PerformanceEntry(models.Model):
@@ -252,11 +328,107 @@ class PerformanceEntry(models.Model):
         ordering = ['-date', '-created_at']
         verbose_name_plural = "Performance Entries"
 
+    def clean(self):
+        super().clean()
+        if self.sport_profile_id:
+            position_id = self.position_profile.position_id if self.position_profile_id else None
+            # One game's stat line may be partial, so required metrics aren't enforced here.
+            raise_metric_violations(self.sport_profile.sport_id, position_id, self.metrics, check_required=False)
+
     def __str__(self):
         username = self.sport_profile.user_profile.user.username if self.sport_profile.user_profile else "Unknown User"
         return f"{username} - {self.event_name or 'Performance'} on {self.date}"
 
 
+class MetricTrendSummary(models.Model):
+    """
+    Materialized trend statistics for one metric of one sport profile,
+    maintained incrementally from PerformanceEntry saves (see trends).
+    Running sums are stored alongside the results so each new entry updates
+    the row without re-reading the athlete's history.
+    """
+    sport_profile = models.ForeignKey(SportProfile, on_delete=models.CASCADE, related_name='metric_trends')
+    metric_code = models.CharField(max_length=50)
+    lower_is_better = models.BooleanField(default=False, help_text="True for time-based metrics")
+
+    entry_count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    # Sum of squared deviations from the mean (Welford); variance = m2 / entry_count.
+    m2 = models.FloatField(default=0)
+
+    best_value = models.FloatField(null=True, blank=True)
+    best_date = models.DateField(null=True, blank=True)
+    latest_value = models.FloatField(null=True, blank=True)
+    latest_date = models.DateField(null=True, blank=True)
+
+    # Most recent entries as [ISO date, value], oldest first, and their mean.
+    recent_values = models.JSONField(default=list, blank=True)
+    rolling_average = models.FloatField(null=True, blank=True)
+
+    # Per season least-squares sums {season: [n, sum_t, sum_y, sum_tt, sum_ty]}
+    # (t in days), and the improvement per 30 days they give.
+    season_sums = models.JSONField(default=dict, blank=True)
+    season_rates = models.JSONField(default=dict, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('sport_profile', 'metric_code')
+
+    @property
+    def variance(self):
+        return self.m2 / self.entry_count if self.entry_count else None
+
+    def __str__(self):
+        return f"{self.metric_code} trend for sport profile {self.sport_profile_id}"
+
+
+class MetricValue(models.Model):
+    """
+    One typed metric value from a PositionProfile's or PerformanceEntry's
+    metrics JSON, converted to the SI unit of its MetricDefinition (seconds,
+    meters, kilograms; counts and percentages as-is). Kept in sync on save
+    (see metric_store), so range filters and rankings are index scans instead
+    of JSON parsing.
+    """
+    sport_profile = models.ForeignKey(SportProfile, on_delete=models.CASCADE, related_name='metric_values')
+    position_profile = models.ForeignKey(
+        PositionProfile, on_delete=models.CASCADE, null=True, blank=True, related_name='metric_values'
+    )
+    performance_entry = models.ForeignKey(
+        PerformanceEntry, on_delete=models.CASCADE, null=True, blank=True, related_name='metric_values'
+    )
+    metric_definition = models.ForeignKey(MetricDefinition, on_delete=models.CASCADE, related_name='values')
+
+    canonical_value = models.FloatField()
+    raw_value = models.CharField(max_length=50, help_text="Value as stored in the metrics JSON")
+    recorded_at = models.DateTimeField(help_text="Entry date, or when the profile's metrics were last saved")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['metric_definition', 'canonical_value'], name='metricvalue_rank_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(position_profile__isnull=True) ^ Q(performance_entry__isnull=True),
+                name='metricvalue_one_source',
+            ),
+            models.UniqueConstraint(
+                fields=['position_profile', 'metric_definition'],
+                condition=Q(position_profile__isnull=False),
+                name='metricvalue_position_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['performance_entry', 'metric_definition'],
+                condition=Q(performance_entry__isnull=False),
+                name='metricvalue_entry_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.raw_value} (metric {self.metric_definition_id}, sport profile {self.sport_profile_id})"
+
+
 class CompetitionResult(models.Model):
     """
     Tracks honors, accolades, tournament placements, awards, etc.
@@ -321,9 +493,22 @@ class ChatSession(models.Model):
     title = models.CharField(max_length=200, default='New Chat')
     summary = models.CharField(max_length=255, blank=True)
 
+    # Denormalized message stats, kept current by the Conversation signals in
+    # one UPDATE per message (see session_stats) so listings need no joins.
+    message_count = models.PositiveIntegerField(default=0, editable=False)
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    total_prompt_chars = models.BigIntegerField(default=0, editable=False)
+    total_response_chars = models.BigIntegerField(default=0, editable=False)
+
     def __str__(self):
         return f"'{self.title}' for {self.user.username} (Updated: {self.updated_at.strftime('%Y-%m-%d %H:%M')})"
 
+    class Meta:
+        indexes = [
+            # Sidebar listing: keyset pages ordered by (updated_at, id) per user.
+            models.Index(fields=['user', '-updated_at', '-id']),
+        ]
+
 class Conversation(models.Model):
 # ... (Conversation definition remains unchanged)
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='messages', null=True)
@@ -332,6 +517,14 @@ class Conversation(models.Model):
     response_text = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    # Celery task that produced this message, so task status polls resolve
+    # the message through a unique index instead of matching response_text.
+    task_id = models.CharField(max_length=255, null=True, blank=True, unique=True, editable=False)
+
+    # Content hash of the compiled system prompt used for this reply, so
+    # latency and quality can be compared across prompt versions.
+    prompt_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
+
     def __str__(self):
         user_name = self.user.username if self.user else "Unknown User"
         if self.session:
@@ -373,6 +566,13 @@ class LedgerEntry(models.Model):
     is_deleted = models.BooleanField(default=False, help_text="Soft delete - moved to deleted section")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Content hash of the last action-item generation run, recorded even when
+    # the model gave nothing usable, so repeats of that run skip the model.
+    action_items_key = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
     # Track who saved it for family context
     created_by_role = models.CharField(
         max_length=20,
@@ -385,7 +585,13 @@ class LedgerEntry(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['family_account', '-created_at']),
+            # Partial indexes: soft-deleted rows are only read on request, so
+            # they are left out of the indexes behind the default listings.
+            models.Index(fields=['user', '-created_at'], condition=Q(is_deleted=False), name='ledger_user_live_idx'),
+            models.Index(
+                fields=['family_account', '-created_at'], condition=Q(is_deleted=False), name='ledger_family_live_idx'
+            ),
+            models.Index(fields=['user', '-created_at'], condition=Q(is_deleted=True), name='ledger_user_deleted_idx'),
         ]
 
     def __str__(self):
@@ -440,12 +646,43 @@ class ActionItem(models.Model):
     )
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    # Items generated from a Ledger entry carry the hash of the content they
+    # were generated from, so one run can't write the same item twice; the
+    # entry's action_items_key marks the run itself as done.
+    generation_key = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ['is_complete', 'priority', '-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_ledger_entry', 'generation_key', 'description'],
+                condition=~Q(generation_key=''),
+                name='action_generated_unique',
+            ),
+        ]
         indexes = [
-            models.Index(fields=['family_account', 'is_complete', '-created_at']),
+            models.Index(
+                fields=['user', 'is_complete', '-created_at'], condition=Q(is_deleted=False), name='action_user_live_idx'
+            ),
+            models.Index(
+                fields=['family_account', 'is_complete', '-created_at'],
+                condition=Q(is_deleted=False),
+                name='action_family_live_idx',
+            ),
+            models.Index(fields=['user', '-created_at'], condition=Q(is_deleted=True), name='action_user_deleted_idx'),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Completion state as loaded, so the analytics signal can tell a
+        # completion toggle from any other save without re-reading the row.
+        instance._loaded_is_complete = instance.is_complete if 'is_complete' in field_names else None
+        return instance
+
     def __str__(self):
         status = "COMPLETE" if self.is_complete else "PENDING"
         return f"[{status}] {self.description[:30]}..."
@@ -506,6 +743,7 @@ class UserAnalytics(models.Model):
 
     # Quality signals
     avg_message_length = models.IntegerField(default=0, help_text="Average characters per message")
+    total_message_chars = models.BigIntegerField(default=0, help_text="Running sum behind avg_message_length")
     searches_triggered = models.IntegerField(default=0, help_text="Times agent used search tool")
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -514,6 +752,20 @@ class UserAnalytics(models.Model):
     def __str__(self):
         return f"Analytics for {self.user.username}"
 
+
+class AnalyticsFlushBatch(models.Model):
+    """
+    One applied flush of the write-behind analytics buffer. Inserted in the
+    same transaction as the counter updates, so a batch that is retried after
+    a crash is applied at most once.
+    """
+    batch_id = models.CharField(max_length=64, unique=True)
+    users = models.IntegerField(default=0)
+    flushed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Analytics flush {self.batch_id} ({self.users} users)"
+
 # --- END NEW MODELS ---
 
 
@@ -0,0 +1,337 @@
+"""
+Cohort percentile index for athlete metrics.
+
+For every (sport, position, graduation year, metric) cohort the index holds the
+sorted values recorded on PositionProfile.metrics, one .npy array per cohort.
+Percentiles respect metric direction: for TIME metrics a lower value ranks
+higher.
+
+The index is published to Redis in generations, so the Celery worker that
+builds it and the web service that reads it need no shared disk: arrays are
+stored content-addressed under ARRAY_KEY, each generation's manifest under
+MANIFEST_KEY, and CURRENT_KEY names the live generation. Profile changes mark
+their cohort group dirty; an incremental build uploads only those groups'
+arrays and refers to the rest of the previous generation by name.
+
+Each host copies the current generation into PERCENTILE_INDEX_DIR on first
+use (reusing files it already has) and readers open the files with mmap, so
+every gunicorn worker on a host shares one read-only copy through the page
+cache and answers percentile and top-N queries with a binary search. Readers
+notice a new generation on their next query.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import redis
+from django.conf import settings
+from django.db.models import Q
+
+from . import redis_client
+from .catalog import get_catalog
+from .models import PositionProfile
+from .trends import lower_is_better, numeric_metrics
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'percentiles:dirty'
+BUILD_LOCK_KEY = 'percentiles:build:lock'
+CURRENT_KEY = 'percentiles:current'
+GENERATIONS_KEY = 'percentiles:generations'
+MANIFEST_KEY = 'percentiles:manifest:{generation}'
+ARRAY_KEY = 'percentiles:array:{file}'
+MANIFEST = 'manifest.json'
+KEEP_GENERATIONS = 3
+
+
+@dataclass(frozen=True, slots=True)
+class Standing:
+    percentile: float
+    rank: int
+    cohort_size: int
+    lower_is_better: bool
+
+
+def cohort_key(sport_code, position_code, grad_year, metric_code):
+    return f"{sport_code}|{position_code}|{grad_year}|{metric_code}"
+
+
+def _file_name(data):
+    # Named by content, so unchanged cohorts are shared between generations.
+    return hashlib.sha1(data).hexdigest()[:20] + '.npy'
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+class PercentileIndex:
+    """One published generation; arrays are memory-mapped on first use."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.cohorts = json.load(f)['cohorts']
+        self._arrays = {}
+
+    def values(self, key):
+        array = self._arrays.get(key)
+        if array is None:
+            entry = self.cohorts.get(key)
+            if entry is None:
+                return None
+            array = np.load(os.path.join(self.path, entry['file']), mmap_mode='r')
+            self._arrays[key] = array
+        return array
+
+    def standing(self, sport_code, position_code, grad_year, metric_code, value):
+        """Where value ranks in its cohort, or None when there is no cohort."""
+        key = cohort_key(sport_code, position_code, grad_year, metric_code)
+        values = self.values(key)
+        if values is None or not len(values):
+            return None
+        lower_better = self.cohorts[key]['lower_is_better']
+        below = int(np.searchsorted(values, value, side='left'))
+        above = len(values) - int(np.searchsorted(values, value, side='right'))
+        ties = len(values) - below - above
+        beaten = above if lower_better else below
+        return Standing(
+            percentile=round(100.0 * (beaten + 0.5 * ties) / len(values), 1),
+            rank=len(values) - beaten - ties + 1,
+            cohort_size=len(values),
+            lower_is_better=lower_better,
+        )
+
+    def top(self, sport_code, position_code, grad_year, metric_code, n=10):
+        """The n best values in a cohort, best first."""
+        key = cohort_key(sport_code, position_code, grad_year, metric_code)
+        values = self.values(key)
+        if values is None:
+            return []
+        best = values[:n] if self.cohorts[key]['lower_is_better'] else values[::-1][:n]
+        return [float(v) for v in best]
+
+
+_index = None
+
+
+def _materialize(base, generation):
+    """Copy a published generation from Redis into base/generation; returns its path."""
+    path = os.path.join(base, generation)
+    if os.path.isdir(path):
+        return path
+    manifest = redis_client.get_redis().get(MANIFEST_KEY.format(generation=generation))
+    if manifest is None:
+        raise LookupError(f"Percentile index generation {generation} is no longer published")
+    cohorts = json.loads(manifest)['cohorts']
+
+    os.makedirs(base, exist_ok=True)
+    local = {}
+    for name in os.listdir(base):
+        if name.startswith('gen-'):
+            for file in os.listdir(os.path.join(base, name)):
+                local.setdefault(file, os.path.join(base, name, file))
+    temporary = os.path.join(base, f".{generation}.{os.getpid()}.tmp")
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    missing = []
+    for file in {entry['file'] for entry in cohorts.values()}:
+        if file in local:
+            os.link(local[file], os.path.join(temporary, file))
+        else:
+            missing.append(file)
+    if missing:
+        arrays = redis_client.get_binary_redis().mget([ARRAY_KEY.format(file=file) for file in missing])
+        for file, data in zip(missing, arrays):
+            if data is None:
+                shutil.rmtree(temporary, ignore_errors=True)
+                raise LookupError(f"Percentile index array {file} is missing")
+            with open(os.path.join(temporary, file), 'wb') as f:
+                f.write(data)
+    with open(os.path.join(temporary, MANIFEST), 'w') as f:
+        f.write(manifest)
+    try:
+        os.rename(temporary, path)
+    except OSError:
+        # Another process on this host got there first.
+        shutil.rmtree(temporary, ignore_errors=True)
+
+    # Older copies may still be mapped by readers; unlinked files stay valid
+    # for them, so only the newest few are kept.
+    generations = sorted(name for name in os.listdir(base) if name.startswith('gen-'))
+    for name in generations[:-KEEP_GENERATIONS]:
+        shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+    return path
+
+
+def get_index():
+    """The current generation for this process, or None before the first build."""
+    global _index
+    try:
+        generation = redis_client.get_redis().get(CURRENT_KEY)
+        if generation is None:
+            return None
+        if _index is None or os.path.basename(_index.path) != generation:
+            _index = PercentileIndex(_materialize(settings.PERCENTILE_INDEX_DIR, generation))
+    except (redis.RedisError, LookupError, OSError) as e:
+        # Keep answering from the generation already loaded, if any.
+        logger.warning(f"Percentile index refresh failed: {e}")
+    return _index
+
+
+# ---------------------------------------------------------------------------
+# Change tracking
+# ---------------------------------------------------------------------------
+
+def mark_dirty(sport_id, position_id, grad_year):
+    """Queue a (sport, position, graduation year) group for the next incremental build."""
+    if not grad_year:
+        return
+    try:
+        redis_client.get_redis().sadd(DIRTY_KEY, f"{sport_id}:{position_id}:{grad_year}")
+    except redis.RedisError as e:
+        # The nightly full build picks the change up.
+        logger.warning(f"Percentile index dirty mark failed: {e}")
+
+
+def _take_dirty(conn):
+    groups = conn.smembers(DIRTY_KEY)
+    if groups:
+        conn.srem(DIRTY_KEY, *groups)
+    return {tuple(int(part) for part in group.split(':')) for group in groups}
+
+
+# ---------------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------------
+
+def _collect(groups=None, chunk_size=2000):
+    """{cohort key: (values, lower_is_better, group)} for all profiles, or only those in groups."""
+    catalog = get_catalog()
+    queryset = PositionProfile.objects.filter(sport_profile__graduation_year__isnull=False)
+    if groups is not None:
+        match = Q(pk__in=[])
+        for sport_id, position_id, grad_year in groups:
+            match |= Q(sport_profile__sport_id=sport_id, position_id=position_id,
+                       sport_profile__graduation_year=grad_year)
+        queryset = queryset.filter(match)
+
+    cohorts = {}
+    rows = queryset.values_list(
+        'sport_profile__sport_id', 'position_id', 'sport_profile__graduation_year', 'metrics'
+    ).iterator(chunk_size=chunk_size)
+    for sport_id, position_id, grad_year, metrics in rows:
+        sport, position = catalog.sport(sport_id), catalog.position(position_id)
+        if sport is None or position is None:
+            continue
+        for code, value in numeric_metrics(metrics).items():
+            key = cohort_key(sport.code, position.code, grad_year, code)
+            if key not in cohorts:
+                cohorts[key] = ([], lower_is_better(sport_id, code), [sport_id, position_id, grad_year])
+            cohorts[key][0].append(value)
+    return cohorts
+
+
+def _publish(conn, generation, cohorts):
+    conn.set(MANIFEST_KEY.format(generation=generation), json.dumps({'built_at': time.time(), 'cohorts': cohorts}))
+    conn.set(CURRENT_KEY, generation)
+    conn.lpush(GENERATIONS_KEY, generation)
+
+    # Readers may still be copying a recent generation, so the newest few stay
+    # published; arrays none of them refer to are dropped.
+    expired = conn.lrange(GENERATIONS_KEY, KEEP_GENERATIONS, -1)
+    if not expired:
+        return
+    conn.ltrim(GENERATIONS_KEY, 0, KEEP_GENERATIONS - 1)
+    kept = set()
+    for name in conn.lrange(GENERATIONS_KEY, 0, -1):
+        manifest = conn.get(MANIFEST_KEY.format(generation=name))
+        if manifest:
+            kept.update(entry['file'] for entry in json.loads(manifest)['cohorts'].values())
+    stale = set()
+    for name in expired:
+        manifest = conn.get(MANIFEST_KEY.format(generation=name))
+        if manifest:
+            stale.update(entry['file'] for entry in json.loads(manifest)['cohorts'].values())
+    conn.delete(*(MANIFEST_KEY.format(generation=name) for name in expired))
+    if stale - kept:
+        conn.delete(*(ARRAY_KEY.format(file=file) for file in stale - kept))
+
+
+def build_index(full=False):
+    """
+    Build and publish a new generation. Incremental unless full=True or there
+    is no current generation; returns the number of cohorts written, or None
+    when there was nothing to do or another build holds the lock.
+    """
+    conn = redis_client.get_redis()
+    if not conn.set(BUILD_LOCK_KEY, 1, nx=True, ex=settings.PERCENTILE_INDEX_LOCK_SECONDS):
+        return None
+    dirty = set()
+    try:
+        dirty = _take_dirty(conn)
+        current = conn.get(CURRENT_KEY)
+        manifest = current and conn.get(MANIFEST_KEY.format(generation=current))
+        if not manifest:
+            full = True
+        if not full and not dirty:
+            return None
+
+        cohorts = {}
+        if not full:
+            # Carry over every cohort outside the dirty groups without re-uploading it.
+            for key, entry in json.loads(manifest)['cohorts'].items():
+                if tuple(entry['group']) not in dirty:
+                    cohorts[key] = entry
+
+        arrays, written = {}, 0
+        for key, (values, lower_better, group) in _collect(None if full else dirty).items():
+            buffer = io.BytesIO()
+            np.save(buffer, np.sort(np.asarray(values, dtype=np.float64)))
+            data = buffer.getvalue()
+            entry = {'file': _file_name(data), 'count': len(values), 'lower_is_better': lower_better, 'group': group}
+            arrays[ARRAY_KEY.format(file=entry['file'])] = data
+            cohorts[key] = entry
+            written += 1
+
+        # Arrays first, so a published manifest never names a missing array.
+        if arrays:
+            redis_client.get_binary_redis().mset(arrays)
+        _publish(conn, f"gen-{time.time_ns()}", cohorts)
+        dirty = set()
+        return written
+    finally:
+        if dirty:
+            # The build failed: leave its groups queued for the next one.
+            conn.sadd(DIRTY_KEY, *(':'.join(str(part) for part in group) for group in dirty))
+        conn.delete(BUILD_LOCK_KEY)
+
+
+def peer_context(sport_profile, limit=5):
+    """Percentile lines for the agent's player context: one query, then index lookups."""
+    index = get_index()
+    if index is None or not sport_profile.graduation_year:
+        return []
+    catalog = get_catalog()
+    sport = catalog.sport(sport_profile.sport_id)
+    lines = []
+    for position_id, metrics in sport_profile.position_profiles.values_list('position_id', 'metrics'):
+        position = catalog.position(position_id)
+        if sport is None or position is None:
+            continue
+        for code, value in numeric_metrics(metrics).items():
+            standing = index.standing(sport.code, position.code, sport_profile.graduation_year, code, value)
+            if standing and standing.cohort_size > 1:
+                lines.append(
+                    f"{code} {value:g} is in the {standing.percentile:g}th percentile of "
+                    f"{standing.cohort_size} class-of-{sport_profile.graduation_year} {position.abbreviation or position.code}s"
+                )
+            if len(lines) >= limit:
+                return lines
+    return lines
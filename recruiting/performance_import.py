@@ -0,0 +1,292 @@
+"""
+Bulk import of PerformanceEntry and CompetitionResult rows from CSV or JSONL.
+
+Input is read as a stream, one row at a time, and handled in batches of
+batch_size rows: each batch is checked as a block (model field validation,
+then the metrics against the MetricDefinitions of every row's sport and
+position through metric_validation.validate_batch) and its valid rows are
+written with one bulk_create inside their own transaction. Invalid rows are
+skipped and reported with their line number. An interrupted import can be
+resumed from the last committed line.
+
+Row layout (CSV header or JSONL keys): the model's fields by name, plus
+`sport_profile` (id; optional when a default is given) and, for performance
+rows, `position` (position code). Every other column of a performance row is
+a metric code. A CSV metric header may carry its unit as `code[UNIT]`; in
+JSONL a metric value may be {"value": ..., "unit": ...}, and the metrics may
+also be nested under "metrics". A stated unit must match the definition's.
+
+bulk_create skips model signals, so each batch writes its typed MetricValues
+in the same transaction, and trend summaries of the sport profiles touched
+are rebuilt once at the end instead of once per row.
+"""
+import csv
+import json
+import re
+import time
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .catalog import get_catalog
+from .metric_store import store_entries
+from .metric_validation import as_number, validate_batch
+from .models import CompetitionResult, PerformanceEntry, PositionProfile, SportProfile
+from .trends import rebuild_summaries
+
+PERFORMANCE = 'performance'
+COMPETITION = 'competition'
+MODELS = {PERFORMANCE: PerformanceEntry, COMPETITION: CompetitionResult}
+FORMATS = ('csv', 'jsonl')
+
+# Fields an import may set, per model; everything else is left to its default.
+IMPORT_FIELDS = {
+    PERFORMANCE: (
+        'date', 'season', 'event_name', 'opponent', 'location', 'notes', 'video_url', 'is_verified', 'verified_by',
+    ),
+    COMPETITION: (
+        'result_type', 'competition_name', 'competition_level', 'date', 'placement', 'description',
+        'significance', 'certificate_url', 'article_url',
+    ),
+}
+
+UNIT_HEADER = re.compile(r'^(?P<code>[^\[\]]+)\[(?P<unit>[^\[\]]+)\]$')
+
+
+@dataclass(frozen=True, slots=True)
+class RowError:
+    line: int
+    field: str
+    message: str
+
+
+@dataclass(slots=True)
+class ImportResult:
+    rows_read: int = 0
+    created: int = 0
+    skipped: int = 0
+    # Last input line of the last batch committed (validated, in a dry run);
+    # pass it as start_line to resume.
+    last_line: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+    sport_profile_ids: set = field(default_factory=set)
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+@dataclass(slots=True)
+class _Row:
+    line: int
+    values: dict
+    metrics: dict
+    sport_profile_id: int = None
+    position_code: str = None
+    sport_id: int = None
+    position_id: int = None
+    position_profile_id: int = None
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict or None, parse error) from a text stream without reading it whole."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # line_num is the record's last physical line (quoted fields may span lines).
+            yield reader.line_num, {key: value for key, value in row.items() if key is not None}, None
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if isinstance(row, dict):
+            yield line_number, row, None
+        else:
+            yield line_number, None, 'Expected a JSON object.'
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+class PerformanceImporter:
+    """
+    Imports rows for one model. sport_profiles limits which SportProfiles rows
+    may name (the endpoint passes the uploader's); None allows any.
+    """
+
+    def __init__(self, model=PERFORMANCE, sport_profiles=None, default_sport_profile_id=None,
+                 batch_size=500, dry_run=False):
+        self.kind = model
+        self.model = MODELS[model]
+        self.fields = IMPORT_FIELDS[model]
+        self.sport_profiles = SportProfile.objects.all() if sport_profiles is None else sport_profiles
+        self.default_sport_profile_id = default_sport_profile_id
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self._sport_ids = {}         # sport_profile_id -> sport_id, or None when not allowed
+        self._position_profiles = {}  # (sport_profile_id, position_id) -> position_profile_id
+        # Where to resume if run() raises part way through.
+        self.last_committed_line = 0
+
+    def run(self, stream, fmt='csv', start_line=0):
+        result = ImportResult(last_line=start_line)
+        self.last_committed_line = start_line
+        started = time.perf_counter()
+        batch = []
+        for line, row, error in read_rows(stream, fmt):
+            if line <= start_line:
+                continue
+            result.rows_read += 1
+            batch.append((line, row, error))
+            if len(batch) >= self.batch_size:
+                self._flush(batch, line, result)
+                batch = []
+        if batch:
+            self._flush(batch, line, result)
+        if not self.dry_run and self.kind == PERFORMANCE:
+            for sport_profile_id in result.sport_profile_ids:
+                rebuild_summaries(sport_profile_id)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    # -- Batches --------------------------------------------------------------
+
+    def _flush(self, raw_rows, last_line, result):
+        errors = [RowError(line, '', error) for line, _, error in raw_rows if error]
+        rows = [self._parse(line, raw, errors) for line, raw, error in raw_rows if not error]
+        rows = [row for row in rows if row is not None]
+        rows = self._resolve(rows, errors)
+        if self.kind == PERFORMANCE:
+            rows = self._check_metrics(rows, errors)
+        built = self._build(rows, errors)
+        objects = [obj for _, obj in built]
+
+        if objects and not self.dry_run:
+            with transaction.atomic():
+                self.model.objects.bulk_create(objects)
+                if self.kind == PERFORMANCE:
+                    store_entries([(obj, row.sport_id, row.position_id) for row, obj in built])
+        result.created += len(objects)
+        result.skipped += len(raw_rows) - len(objects)
+        result.errors.extend(sorted(errors, key=lambda error: error.line))
+        result.sport_profile_ids.update(obj.sport_profile_id for obj in objects)
+        result.last_line = self.last_committed_line = last_line
+
+    def _parse(self, line, raw, errors):
+        raw = dict(raw)
+        sport_profile_id = raw.pop('sport_profile', None)
+        position_code = raw.pop('position', None)
+        nested = raw.pop('metrics', None) if self.kind == PERFORMANCE else None
+        values, metrics = {}, {}
+        for key, value in raw.items():
+            if key in self.fields:
+                if not _is_blank(value):
+                    values[key] = value
+            elif self.kind == PERFORMANCE:
+                if not _is_blank(value):
+                    metrics[key] = value
+            elif not _is_blank(value):
+                errors.append(RowError(line, key, 'Unknown column.'))
+                return None
+        if isinstance(nested, dict):
+            metrics.update(nested)
+
+        if _is_blank(sport_profile_id):
+            sport_profile_id = self.default_sport_profile_id
+        try:
+            sport_profile_id = int(sport_profile_id)
+        except (TypeError, ValueError):
+            errors.append(RowError(line, 'sport_profile', 'A sport profile id is required.'))
+            return None
+        if _is_blank(position_code):
+            position_code = None
+        return _Row(line, values, metrics, sport_profile_id=sport_profile_id, position_code=position_code)
+
+    def _resolve(self, rows, errors):
+        """Look up each row's sport and position profile; two queries per batch at most."""
+        unknown = {row.sport_profile_id for row in rows} - self._sport_ids.keys()
+        if unknown:
+            allowed = dict(self.sport_profiles.filter(pk__in=unknown).values_list('pk', 'sport_id'))
+            for sport_profile_id in unknown:
+                self._sport_ids[sport_profile_id] = allowed.get(sport_profile_id)
+            position_profiles = PositionProfile.objects.filter(sport_profile_id__in=allowed).values_list(
+                'sport_profile_id', 'position_id', 'pk'
+            )
+            for sport_profile_id, position_id, pk in position_profiles:
+                self._position_profiles[(sport_profile_id, position_id)] = pk
+
+        catalog = get_catalog()
+        resolved = []
+        for row in rows:
+            row.sport_id = self._sport_ids.get(row.sport_profile_id)
+            if row.sport_id is None:
+                errors.append(RowError(row.line, 'sport_profile', f'Unknown sport profile {row.sport_profile_id}.'))
+                continue
+            if row.position_code is not None:
+                sport = catalog.sport(row.sport_id)
+                position = catalog.position_by_code(sport.code, str(row.position_code).strip()) if sport else None
+                pk = self._position_profiles.get((row.sport_profile_id, position.id)) if position else None
+                if pk is None:
+                    errors.append(RowError(row.line, 'position', f'No {row.position_code} profile for this athlete.'))
+                    continue
+                row.position_id, row.position_profile_id = position.id, pk
+            resolved.append(row)
+        return resolved
+
+    def _check_metrics(self, rows, errors):
+        """Check units, coerce values to numbers, then validate the whole batch against the definitions."""
+        catalog = get_catalog()
+        checked = []
+        for row in rows:
+            metrics, ok = {}, True
+            for key, value in row.metrics.items():
+                code, unit = key, None
+                match = UNIT_HEADER.match(key)
+                if match:
+                    code, unit = match['code'].strip(), match['unit'].strip()
+                if isinstance(value, dict):
+                    value, unit = value.get('value'), value.get('unit', unit)
+                definition = catalog.metric_by_code(row.sport_id, code)
+                if unit and definition is not None and unit.upper() != definition.unit:
+                    errors.append(RowError(row.line, code, f'Expected unit {definition.unit}, got {unit}.'))
+                    ok = False
+                number = as_number(value)
+                metrics[code] = number if number is not None else value
+            if ok:
+                row.metrics = metrics
+                checked.append(row)
+
+        invalid = set()
+        violations = validate_batch(
+            [(row.line, row.sport_id, row.position_id, row.metrics) for row in checked], check_required=False
+        )
+        for violation in violations:
+            errors.append(RowError(violation.object_id, violation.code, violation.detail))
+            invalid.add(violation.object_id)
+        return [row for row in checked if row.line not in invalid]
+
+    def _build(self, rows, errors):
+        """[(row, unsaved instance)] for the rows whose fields validate."""
+        objects = []
+        exclude = ['sport_profile', 'position_profile']
+        for row in rows:
+            obj = self.model(sport_profile_id=row.sport_profile_id, **row.values)
+            if self.kind == PERFORMANCE:
+                obj.position_profile_id = row.position_profile_id
+                obj.metrics = row.metrics
+            try:
+                obj.clean_fields(exclude=exclude)
+            except ValidationError as e:
+                for name, messages in e.message_dict.items():
+                    errors.append(RowError(row.line, name, ' '.join(messages)))
+                continue
+            objects.append((row, obj))
+        return objects
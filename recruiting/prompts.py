@@ -0,0 +1,96 @@
+"""
+Compiled system prompt assembled from the active PromptComponents.
+
+Every active component (except the ones below that are not part of the system
+prompt) is joined in `order` into one artifact with a content hash. The artifact
+is cached per process and in the shared cache. Saving or deleting a component
+bumps a shared version counter, so every web and worker process notices the
+change on its next lookup and recompiles once.
+"""
+import hashlib
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+from .models import PromptComponent
+
+PROMPT_VERSION_KEY = 'prompts:version'
+COMPILED_PROMPT_KEY = 'prompts:compiled:{version}'
+
+# Components stored alongside the prompt that are shown to users, not sent to the model.
+EXCLUDED_COMPONENTS = ('welcome_message',)
+
+FALLBACK_PROMPT = "You are a helpful AI assistant."
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    text: str
+    content_hash: str
+    version: int
+    components: tuple
+
+
+# Per-process copy of the most recently compiled prompt.
+_local_prompt = None
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def current_version():
+    """Shared prompt version, initialised to 1 the first time it is read."""
+    version = cache.get(PROMPT_VERSION_KEY)
+    if version is None:
+        cache.add(PROMPT_VERSION_KEY, 1, timeout=None)
+        version = cache.get(PROMPT_VERSION_KEY, 1)
+    return version
+
+
+def compile_prompt(version):
+    """Assemble the active components, lowest order first, into a CompiledPrompt."""
+    components = list(
+        PromptComponent.objects.filter(is_active=True)
+        .exclude(name__in=EXCLUDED_COMPONENTS)
+        .order_by('order', 'name')
+        .values_list('name', 'content')
+    )
+    if components:
+        text = "\n\n".join(content.strip() for _, content in components)
+    else:
+        text = FALLBACK_PROMPT
+    return CompiledPrompt(
+        text=text,
+        content_hash=content_hash(text),
+        version=version,
+        components=tuple(name for name, _ in components),
+    )
+
+
+def get_compiled_prompt():
+    """
+    Return the current CompiledPrompt. Costs one shared-cache read when the
+    process copy is current, and touches the database only after a change.
+    """
+    global _local_prompt
+    version = current_version()
+    if _local_prompt is not None and _local_prompt.version == version:
+        return _local_prompt
+
+    key = COMPILED_PROMPT_KEY.format(version=version)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_prompt(version)
+        cache.set(key, compiled, timeout=None)
+    _local_prompt = compiled
+    return compiled
+
+
+def invalidate_compiled_prompt():
+    """Move every process to a new prompt version."""
+    try:
+        cache.incr(PROMPT_VERSION_KEY)
+    except ValueError:
+        # Key missing (e.g. cache flushed): any new value forces a recompile.
+        cache.set(PROMPT_VERSION_KEY, (_local_prompt.version + 1) if _local_prompt else 2, timeout=None)
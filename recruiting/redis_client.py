@@ -0,0 +1,29 @@
+"""
+Process-wide Redis client for app-level features (response streams, shared
+caches, counters). Celery talks to Redis through its own connections.
+"""
+import redis
+from django.conf import settings
+
+_client = None
+_binary_client = None
+
+
+def get_redis():
+    """
+    Return the shared Redis client, creating it on first use.
+    redis-py re-creates pooled connections after a fork, so the same client is
+    safe to use from gunicorn and Celery prefork children.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+def get_binary_redis():
+    """Like get_redis, but replies are left as bytes (for binary values)."""
+    global _binary_client
+    if _binary_client is None:
+        _binary_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _binary_client
@@ -0,0 +1,222 @@
+"""
+Two-tier cache in front of the google_search tools.
+
+Tier one is an in-process cachetools TTL/LRU cache; tier two is the shared
+Django cache (Redis in production) so every worker benefits from a search any
+other worker already paid for. Keys are normalized queries, so "NCAA D1 football
+dead period 2025" and "dead period for ncaa d1 football 2025" share an entry.
+Concurrent misses for the same key are collapsed into one upstream call, both
+within a process and across processes.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from',
+    'how', 'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'the', 'to', 'what',
+    'when', 'where', 'which', 'who', 'with',
+})
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'.+-]*")
+
+
+def normalize_query(query):
+    """
+    Case-fold, tokenize, drop stop words and sort the remaining tokens, so
+    queries that differ only in case, spacing, filler words or word order map
+    to the same key.
+    """
+    tokens = _TOKEN_RE.findall((query or '').lower())
+    tokens = [token.strip(".'-") for token in tokens]
+    meaningful = [token for token in tokens if token and token not in STOP_WORDS]
+    return ' '.join(sorted(set(meaningful or tokens)))
+
+
+class _Flight:
+    """An in-progress upstream call that other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SearchCache:
+    """
+    Local TTL/LRU tier in front of the shared cache tier, with singleflight and
+    hit counters. Only successful result dicts are cached.
+    """
+
+    def __init__(self, namespace, local_ttl=None, shared_ttl=None, maxsize=None, lock_timeout=None):
+        self.namespace = namespace
+        self.shared_ttl = settings.SEARCH_CACHE_SHARED_TTL if shared_ttl is None else shared_ttl
+        self.lock_timeout = settings.SEARCH_CACHE_LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+        self._local = TTLCache(
+            maxsize=settings.SEARCH_CACHE_MAXSIZE if maxsize is None else maxsize,
+            ttl=settings.SEARCH_CACHE_LOCAL_TTL if local_ttl is None else local_ttl,
+        )
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._async_inflight = {}
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _key(self, normalized):
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return f"search:{self.namespace}:{digest}"
+
+    @staticmethod
+    def _cacheable(result):
+        # Errors and credential problems should be retried, not remembered.
+        return isinstance(result, dict) and 'error' not in result
+
+    def get_or_fetch(self, query, fetch):
+        key = self._key(normalize_query(query))
+
+        with self._lock:
+            result = self._local.get(key)
+            if result is not None:
+                self.local_hits += 1
+                return result
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait(self.lock_timeout)
+            if flight.result is not None:
+                with self._lock:
+                    self.coalesced += 1
+                return flight.result
+            return fetch()
+
+        try:
+            flight.result = self._fetch_shared(key, fetch)
+            return flight.result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _fetch_shared(self, key, fetch):
+        result = cache.get(key)
+        if result is not None:
+            self._remember_local(key, result, shared_hit=True)
+            return result
+
+        lock_key = f"{key}:lock"
+        have_lock = cache.add(lock_key, 1, timeout=self.lock_timeout)
+        if not have_lock:
+            # Another process is fetching this query; wait for its result.
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                result = cache.get(key)
+                if result is not None:
+                    with self._lock:
+                        self.coalesced += 1
+                    self._remember_local(key, result, shared_hit=True)
+                    return result
+
+        try:
+            with self._lock:
+                self.misses += 1
+            result = fetch()
+            if self._cacheable(result):
+                cache.set(key, result, timeout=self.shared_ttl)
+                self._remember_local(key, result)
+            return result
+        finally:
+            if have_lock:
+                cache.delete(lock_key)
+
+    async def aget_or_fetch(self, query, fetch):
+        """
+        Async counterpart of get_or_fetch for the event-loop agent; `fetch` is a
+        coroutine function. Concurrent misses on the loop await one shared task.
+        """
+        key = self._key(normalize_query(query))
+        with self._lock:
+            result = self._local.get(key)
+            if result is not None:
+                self.local_hits += 1
+                return result
+
+        task = self._async_inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            result = await asyncio.shield(task)
+            with self._lock:
+                self.coalesced += 1
+            return result
+
+        task = asyncio.ensure_future(self._afetch_shared(key, fetch))
+        self._async_inflight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self._async_inflight.get(key) is task:
+                del self._async_inflight[key]
+
+    async def _afetch_shared(self, key, fetch):
+        result = await cache.aget(key)
+        if result is not None:
+            self._remember_local(key, result, shared_hit=True)
+            return result
+
+        with self._lock:
+            self.misses += 1
+        result = await fetch()
+        if self._cacheable(result):
+            await cache.aset(key, result, timeout=self.shared_ttl)
+            self._remember_local(key, result)
+        return result
+
+    def _remember_local(self, key, result, shared_hit=False):
+        with self._lock:
+            self._local[key] = result
+            if shared_hit:
+                self.shared_hits += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.misses + self.coalesced
+            hits = lookups - self.misses
+            return {
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'coalesced': self.coalesced,
+                'misses': self.misses,
+                'hit_rate': (hits / lookups) if lookups else 0.0,
+            }
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+def cached_search(namespace):
+    """
+    Decorator for search tools taking a single `query` argument. The wrapped
+    function exposes its SearchCache as `.cache` for stats.
+    """
+    def decorator(func):
+        search_cache = SearchCache(namespace)
+
+        def wrapper(query):
+            return search_cache.get_or_fetch(query, lambda: func(query))
+
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        wrapper.cache = search_cache
+        return wrapper
+    return decorator
@@ -0,0 +1,97 @@
+"""
+Denormalized message stats on ChatSession.
+
+Creating or deleting a Conversation adjusts its session's message_count,
+character totals, last_message_at and updated_at in a single UPDATE of F()
+expressions, so concurrent replies never lose a count and the sidebar order
+follows the latest message. backfill_session_stats recounts from the
+Conversation table for existing rows or after bulk changes.
+"""
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest, Length
+from django.utils import timezone
+
+from .models import ChatSession, Conversation
+
+STATS_FIELDS = ('message_count', 'last_message_at', 'total_prompt_chars', 'total_response_chars')
+
+
+def record_message(conversation):
+    if not conversation.session_id:
+        return
+    ChatSession.objects.filter(pk=conversation.session_id).update(
+        message_count=F('message_count') + 1,
+        total_prompt_chars=F('total_prompt_chars') + len(conversation.prompt_text),
+        total_response_chars=F('total_response_chars') + len(conversation.response_text),
+        last_message_at=conversation.timestamp,
+        updated_at=timezone.now(),
+    )
+
+
+def forget_message(conversation):
+    if not conversation.session_id:
+        return
+    latest = (
+        Conversation.objects.filter(session_id=OuterRef('pk'))
+        .order_by('-timestamp')
+        .values('timestamp')[:1]
+    )
+    ChatSession.objects.filter(pk=conversation.session_id).update(
+        message_count=Greatest(F('message_count') - 1, 0),
+        total_prompt_chars=Greatest(F('total_prompt_chars') - len(conversation.prompt_text), 0),
+        total_response_chars=Greatest(F('total_response_chars') - len(conversation.response_text), 0),
+        last_message_at=Subquery(latest),
+    )
+
+
+def backfill_session_stats(session_ids=None, batch_size=500):
+    """
+    Recount STATS_FIELDS for every session (or session_ids) and save the rows
+    that drifted; updated_at is moved up to the last message where it lags.
+    Returns the number of sessions corrected.
+    """
+    queryset = ChatSession.objects.order_by('pk')
+    if session_ids is not None:
+        queryset = queryset.filter(pk__in=session_ids)
+
+    corrected = 0
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return corrected
+        last_pk = batch[-1].pk
+
+        stats = {
+            row.pop('session_id'): row
+            for row in Conversation.objects.filter(session_id__in=[session.pk for session in batch])
+            .values('session_id')
+            .annotate(
+                n=Count('id'),
+                last=Max('timestamp'),
+                prompt_chars=Coalesce(Sum(Length('prompt_text')), 0),
+                response_chars=Coalesce(Sum(Length('response_text')), 0),
+            )
+        }
+
+        changed = []
+        for session in batch:
+            counts = stats.get(session.pk, {})
+            expected = {
+                'message_count': counts.get('n', 0),
+                'last_message_at': counts.get('last'),
+                'total_prompt_chars': counts.get('prompt_chars', 0),
+                'total_response_chars': counts.get('response_chars', 0),
+            }
+            stale_order = expected['last_message_at'] and session.updated_at < expected['last_message_at']
+            if stale_order or any(getattr(session, field) != value for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(session, field, value)
+                if stale_order:
+                    session.updated_at = expected['last_message_at']
+                changed.append(session)
+
+        if changed:
+            ChatSession.objects.bulk_update(changed, STATS_FIELDS + ('updated_at',))
+            corrected += len(changed)
@@ -4,16 +4,19 @@ Django signals to automatically update UserAnalytics when user actions occur.
 This keeps the analytics dashboard up-to-date in real-time.
 """
 
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from django.contrib.auth.models import User
-from django.utils import timezone
-from datetime import timedelta
 
+from . import athlete_search, family_feed, ledger_retrieval, metric_store, percentiles, session_stats, trends
+from .analytics import record_deltas
+from .catalog import invalidate_catalog
 from .models import (
     Conversation, ChatSession, LedgerEntry, ActionItem,
-    UserProfile, UserAnalytics
+    UserProfile, UserAnalytics, PromptComponent, FamilyMember,
+    Sport, Position, MetricDefinition, PerformanceEntry, PositionProfile, SportProfile
 )
+from .prompts import invalidate_compiled_prompt
 
 
 # ============================================================================
@@ -42,31 +45,143 @@ def create_user_analytics(sender, instance, created, **kwargs):
 def update_analytics_on_message(sender, instance, created, **kwargs):
     """
     Update analytics when a new conversation message is created.
-    Tracks message counts and session activity.
+    Tracks message counts, message length and activity in one UPDATE.
     """
     if created:
-        analytics, _ = UserAnalytics.objects.get_or_create(user=instance.user)
+        record_deltas(
+            instance.user_id,
+            {
+                'total_messages_sent': 1,
+                'total_agent_responses': 1,
+                'total_message_chars': len(instance.prompt_text),
+            },
+            touch_last_active=True,
+        )
 
-        # Increment message counts
-        analytics.total_messages_sent += 1
-        analytics.total_agent_responses += 1
 
-        # Update average message length
-        total_chars = analytics.avg_message_length * (analytics.total_messages_sent - 1)
-        total_chars += len(instance.prompt_text)
-        analytics.avg_message_length = int(total_chars / analytics.total_messages_sent)
+# ============================================================================
+# KEEP CHAT SESSION MESSAGE STATS CURRENT
+# ============================================================================
 
-        # Update last active
-        analytics.last_active = timezone.now()
+@receiver(post_save, sender=Conversation)
+def update_session_stats_on_message(sender, instance, created, **kwargs):
+    """Count the new message on its session and move the session to the top of the sidebar."""
+    if created:
+        session_stats.record_message(instance)
 
-        # Update 7-day session count
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        analytics.session_count_last_7_days = ChatSession.objects.filter(
-            user=instance.user,
-            created_at__gte=seven_days_ago
-        ).count()
 
-        analytics.save()
+@receiver(post_delete, sender=Conversation)
+def update_session_stats_on_message_delete(sender, instance, origin=None, **kwargs):
+    # Messages removed along with their session (or user) leave nothing to update.
+    if isinstance(origin, Conversation) or getattr(origin, 'model', None) is Conversation:
+        session_stats.forget_message(instance)
+
+
+# ============================================================================
+# MAINTAIN METRIC TREND SUMMARIES
+# ============================================================================
+
+@receiver(post_save, sender=PerformanceEntry)
+def update_metric_trends_on_entry(sender, instance, created, **kwargs):
+    """New entries are folded into the running summaries; edits rebuild the profile's summaries."""
+    if created:
+        trends.record_entry(instance)
+    else:
+        trends.rebuild_summaries(instance.sport_profile_id)
+
+
+@receiver(post_delete, sender=PerformanceEntry)
+def update_metric_trends_on_entry_delete(sender, instance, origin=None, **kwargs):
+    # Entries removed with their sport profile take the summaries with them.
+    if isinstance(origin, PerformanceEntry) or getattr(origin, 'model', None) is PerformanceEntry:
+        trends.rebuild_summaries(instance.sport_profile_id)
+
+
+# ============================================================================
+# MIRROR METRICS INTO TYPED METRIC VALUES
+# ============================================================================
+
+@receiver(post_save, sender=PositionProfile)
+def sync_metric_values_on_position_profile(sender, instance, created, **kwargs):
+    metric_store.sync_position_profile(instance, created=created)
+
+
+@receiver(post_save, sender=PerformanceEntry)
+def sync_metric_values_on_entry(sender, instance, created, **kwargs):
+    # Deletes need nothing: the values cascade with their row.
+    metric_store.sync_entry(instance, created=created)
+
+
+# ============================================================================
+# QUEUE PERCENTILE INDEX REBUILDS
+# ============================================================================
+
+def _mark_cohorts_dirty(sport_id, position_ids, grad_years):
+    groups = [(position_id, year) for position_id in position_ids for year in grad_years if year]
+    if groups:
+        transaction.on_commit(
+            lambda: [percentiles.mark_dirty(sport_id, position_id, year) for position_id, year in groups]
+        )
+
+
+@receiver(post_save, sender=PositionProfile)
+@receiver(post_delete, sender=PositionProfile)
+def mark_percentile_cohort_on_position_profile(sender, instance, origin=None, **kwargs):
+    # Profiles removed with their sport profile are queued by its pre_delete.
+    if origin is not None and not (
+        isinstance(origin, PositionProfile) or getattr(origin, 'model', None) is PositionProfile
+    ):
+        return
+    sport_profile = instance.sport_profile
+    _mark_cohorts_dirty(sport_profile.sport_id, [instance.position_id], [sport_profile.graduation_year])
+
+
+@receiver(post_save, sender=SportProfile)
+def mark_percentile_cohorts_on_graduation_year(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_graduation_year', None)
+    if created or previous == instance.graduation_year:
+        return
+    position_ids = list(instance.position_profiles.values_list('position_id', flat=True))
+    _mark_cohorts_dirty(instance.sport_id, position_ids, [previous, instance.graduation_year])
+    instance._loaded_graduation_year = instance.graduation_year
+
+
+@receiver(pre_delete, sender=SportProfile)
+def mark_percentile_cohorts_on_sport_profile_delete(sender, instance, **kwargs):
+    position_ids = list(instance.position_profiles.values_list('position_id', flat=True))
+    _mark_cohorts_dirty(instance.sport_id, position_ids, [instance.graduation_year])
+
+
+# ============================================================================
+# EXPIRE ATHLETE SEARCH FACETS
+# ============================================================================
+
+@receiver(post_save, sender=SportProfile)
+@receiver(post_delete, sender=SportProfile)
+def invalidate_search_facets_on_sport_profile(sender, instance, **kwargs):
+    transaction.on_commit(lambda: athlete_search.invalidate_facets([instance.sport_id]))
+
+
+@receiver(post_save, sender=PositionProfile)
+@receiver(post_delete, sender=PositionProfile)
+def invalidate_search_facets_on_position_profile(sender, instance, origin=None, **kwargs):
+    # Removed with their sport profile: its own signal covers them.
+    if origin is not None and not (
+        isinstance(origin, PositionProfile) or getattr(origin, 'model', None) is PositionProfile
+    ):
+        return
+    sport_id = instance.sport_profile.sport_id
+    transaction.on_commit(lambda: athlete_search.invalidate_facets([sport_id]))
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_search_facets_on_state_change(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_loaded_state', None) == instance.state:
+        return
+    instance._loaded_state = instance.state
+    sport_ids = list(instance.sport_profiles_new.values_list('sport_id', flat=True))
+    if sport_ids:
+        transaction.on_commit(lambda: athlete_search.invalidate_facets(sport_ids))
 
 
 # ============================================================================
@@ -76,12 +191,11 @@ def update_analytics_on_message(sender, instance, created, **kwargs):
 @receiver(post_save, sender=ChatSession)
 def update_analytics_on_session(sender, instance, created, **kwargs):
     """
-    Update total session count when a new chat session is created.
+    Count a new chat session. The 7-day count only grows here; sessions
+    ageing out of the window are dropped by the reconciliation job.
     """
     if created:
-        analytics, _ = UserAnalytics.objects.get_or_create(user=instance.user)
-        analytics.total_sessions = ChatSession.objects.filter(user=instance.user).count()
-        analytics.save()
+        record_deltas(instance.user_id, {'total_sessions': 1, 'session_count_last_7_days': 1})
 
 
 # ============================================================================
@@ -94,9 +208,7 @@ def update_analytics_on_ledger(sender, instance, created, **kwargs):
     Update ledger entry count when a new entry is saved.
     """
     if created:
-        analytics, _ = UserAnalytics.objects.get_or_create(user=instance.user)
-        analytics.ledger_entries_count = LedgerEntry.objects.filter(user=instance.user).count()
-        analytics.save()
+        record_deltas(instance.user_id, {'ledger_entries_count': 1})
 
 
 @receiver(post_delete, sender=LedgerEntry)
@@ -104,12 +216,7 @@ def update_analytics_on_ledger_delete(sender, instance, **kwargs):
     """
     Update ledger entry count when an entry is deleted.
     """
-    try:
-        analytics = UserAnalytics.objects.get(user=instance.user)
-        analytics.ledger_entries_count = LedgerEntry.objects.filter(user=instance.user).count()
-        analytics.save()
-    except UserAnalytics.DoesNotExist:
-        pass
+    record_deltas(instance.user_id, {'ledger_entries_count': -1})
 
 
 # ============================================================================
@@ -121,16 +228,14 @@ def update_analytics_on_action_item(sender, instance, created, **kwargs):
     """
     Update action item counts when items are created or completed.
     """
-    analytics, _ = UserAnalytics.objects.get_or_create(user=instance.user)
-
-    # Recalculate counts from database
-    analytics.action_items_created = ActionItem.objects.filter(user=instance.user).count()
-    analytics.action_items_completed = ActionItem.objects.filter(
-        user=instance.user,
-        is_complete=True
-    ).count()
+    was_complete = False if created else getattr(instance, '_loaded_is_complete', None)
+    instance._loaded_is_complete = instance.is_complete
 
-    analytics.save()
+    deltas = {'action_items_created': 1} if created else {}
+    if was_complete is not None and was_complete != instance.is_complete:
+        deltas['action_items_completed'] = 1 if instance.is_complete else -1
+    if deltas:
+        record_deltas(instance.user_id, deltas)
 
 
 @receiver(post_delete, sender=ActionItem)
@@ -138,13 +243,95 @@ def update_analytics_on_action_item_delete(sender, instance, **kwargs):
     """
     Update action item counts when an item is deleted.
     """
-    try:
-        analytics = UserAnalytics.objects.get(user=instance.user)
-        analytics.action_items_created = ActionItem.objects.filter(user=instance.user).count()
-        analytics.action_items_completed = ActionItem.objects.filter(
-            user=instance.user,
-            is_complete=True
-        ).count()
-        analytics.save()
-    except UserAnalytics.DoesNotExist:
-        pass
+    record_deltas(
+        instance.user_id,
+        {'action_items_created': -1, 'action_items_completed': -int(instance.is_complete)},
+    )
+
+
+# ============================================================================
+# INVALIDATE COMPILED SYSTEM PROMPT ON PROMPT COMPONENT CHANGES
+# ============================================================================
+
+@receiver(post_save, sender=PromptComponent)
+@receiver(post_delete, sender=PromptComponent)
+def invalidate_prompt_on_component_change(sender, instance, **kwargs):
+    """
+    Bump the shared prompt version once the change is committed, so every web
+    and worker process recompiles the system prompt on its next request.
+    """
+    transaction.on_commit(invalidate_compiled_prompt)
+
+
+
+# ============================================================================
+# RELOAD THE SPORT CATALOG ON REFERENCE TABLE CHANGES
+# ============================================================================
+
+@receiver(post_save, sender=Sport)
+@receiver(post_delete, sender=Sport)
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+@receiver(post_save, sender=MetricDefinition)
+@receiver(post_delete, sender=MetricDefinition)
+def invalidate_catalog_on_change(sender, instance, **kwargs):
+    """Bump the catalog version once committed; every process reloads on its next lookup."""
+    transaction.on_commit(invalidate_catalog)
+
+# ============================================================================
+# INVALIDATE CACHED FAMILY BOARDS ON LEDGER / ACTION ITEM / MEMBER CHANGES
+# ============================================================================
+
+@receiver(post_save, sender=LedgerEntry)
+@receiver(post_delete, sender=LedgerEntry)
+@receiver(post_save, sender=ActionItem)
+@receiver(post_delete, sender=ActionItem)
+def invalidate_family_feed_on_change(sender, instance, **kwargs):
+    """
+    Bump the board version of the writer's family (and of the family the row
+    is shared with) once committed; see family_feed.
+    """
+    user_id, family_id = instance.user_id, instance.family_account_id
+    transaction.on_commit(lambda: family_feed.invalidate(user_id, family_id))
+
+
+@receiver(post_save, sender=FamilyMember)
+@receiver(post_delete, sender=FamilyMember)
+def invalidate_family_feed_on_membership_change(sender, instance, **kwargs):
+    user_id, family_id = instance.user_id, instance.family_account_id
+    transaction.on_commit(lambda: family_feed.invalidate_membership(user_id, family_id))
+
+
+# ============================================================================
+# KEEP LEDGER RETRIEVAL INDEXES IN STEP WITH LEDGER ENTRIES
+# ============================================================================
+
+@receiver(post_save, sender=LedgerEntry)
+@receiver(post_delete, sender=LedgerEntry)
+def expire_ledger_retrieval_on_change(sender, instance, **kwargs):
+    """Expire the entry's cached scopes once committed; they are rebuilt on their next query."""
+    user_id, family_id = instance.user_id, instance.family_account_id
+    transaction.on_commit(lambda: ledger_retrieval.entry_changed(user_id, family_id))
+
+
+# ============================================================================
+# RESYNC STORED METRIC VALUES WHEN DEFINITIONS CHANGE
+# ============================================================================
+
+@receiver(post_save, sender=MetricDefinition)
+@receiver(post_delete, sender=MetricDefinition)
+def resync_metric_values_on_definition(sender, instance, signal, created=False, origin=None, **kwargs):
+    """A definition was added, removed or re-scoped: rewrite the stored values of its code."""
+    if origin is not None and not (
+        isinstance(origin, MetricDefinition) or getattr(origin, 'model', None) is MetricDefinition
+    ):
+        return  # removed with its sport or position
+    loaded = getattr(instance, '_loaded_store_fields', None)
+    current = tuple(getattr(instance, name) for name in MetricDefinition.STORE_FIELDS)
+    if signal is post_save and not created and loaded == current:
+        return  # relabel, bounds or display change; stored values are unaffected
+    scopes = {(instance.sport_id, instance.code)}
+    if loaded is not None:
+        scopes.add((loaded[0], loaded[2]))
+    # Registered after invalidate_catalog_on_change, so the catalog version is bumped first.
+    transaction.on_commit(lambda: metric_store.queue_resync(scopes))
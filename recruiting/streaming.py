@@ -0,0 +1,226 @@
+"""
+Token streaming for agent replies.
+
+The Celery task publishes each text chunk to a per-task Redis stream as the
+model produces it; the SSE endpoint relays that stream to the browser. Redis
+stream entry ids double as SSE event ids, so a reconnecting EventSource resumes
+from its Last-Event-ID without losing or repeating chunks. Text the model
+writes in a round that turns out to call tools is not part of the saved reply,
+so such a round ends with a 'reset' event telling the client to discard it.
+"""
+import asyncio
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+from vertexai.generative_models import GenerationResponse
+
+from . import redis_client
+
+STREAM_KEY = 'agent-stream:{task_id}'
+OWNER_KEY = 'agent-stream:{task_id}:owner'
+
+# Events that end a stream; the client stops listening after either one.
+TERMINAL_EVENTS = ('done', 'failed')
+
+logger = logging.getLogger(__name__)
+
+
+class StreamUnavailable(Exception):
+    """Redis could not be reached; the client should poll for the reply instead."""
+
+
+def register_stream(task_id, user_id):
+    """
+    Record which user may read a task's stream. Returns False if Redis is
+    unavailable, in which case the caller should not offer a stream URL.
+    """
+    try:
+        redis_client.get_redis().set(
+            OWNER_KEY.format(task_id=task_id), user_id, ex=settings.AGENT_STREAM_TTL_SECONDS
+        )
+    except redis.RedisError as e:
+        logger.warning(f"Could not register stream for task {task_id}: {e}")
+        return False
+    return True
+
+
+def stream_owner(task_id):
+    """Return the user id registered for a task's stream, or None. Raises StreamUnavailable."""
+    try:
+        owner = redis_client.get_redis().get(OWNER_KEY.format(task_id=task_id))
+    except redis.RedisError as e:
+        logger.warning(f"Could not look up the stream owner for task {task_id}: {e}")
+        raise StreamUnavailable() from e
+    return int(owner) if owner is not None else None
+
+
+def publish(task_id, event, payload):
+    """
+    Append one event to the task's stream and return its id. Streaming is
+    best-effort: if Redis is unavailable the task carries on and the client's
+    task-status polling fallback still delivers the saved reply.
+    """
+    conn = redis_client.get_redis()
+    key = STREAM_KEY.format(task_id=task_id)
+    try:
+        event_id = conn.xadd(key, {'event': event, 'data': json.dumps(payload)})
+        conn.expire(key, settings.AGENT_STREAM_TTL_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish '{event}' to stream for task {task_id}: {e}")
+        return None
+    return event_id
+
+
+def publish_chunk(task_id, text):
+    return publish(task_id, 'chunk', {'text': text})
+
+
+def publish_reset(task_id):
+    return publish(task_id, 'reset', {})
+
+
+def publish_done(task_id, conversation_id, session_id):
+    return publish(task_id, 'done', {'conversation_id': str(conversation_id), 'session_id': str(session_id)})
+
+
+def publish_failed(task_id, message):
+    return publish(task_id, 'failed', {'message': message})
+
+
+def read_events(task_id, last_event_id=None, block_ms=None, idle_timeout=None):
+    """
+    Yield (event_id, event, payload) tuples after last_event_id, blocking for new
+    entries until a terminal event arrives. Yields (None, None, None) on every
+    empty poll so callers can emit keep-alives, and stops after idle_timeout
+    seconds without new events.
+    """
+    conn = redis_client.get_redis()
+    key = STREAM_KEY.format(task_id=task_id)
+    cursor = last_event_id or '0'
+    block_ms = settings.AGENT_STREAM_BLOCK_MS if block_ms is None else block_ms
+    idle_timeout = settings.AGENT_STREAM_IDLE_TIMEOUT_SECONDS if idle_timeout is None else idle_timeout
+    last_activity = time.monotonic()
+
+    while True:
+        try:
+            entries = conn.xread({key: cursor}, block=block_ms, count=100)
+        except redis.RedisError as e:
+            # Ends like an idle timeout, so the client falls back to polling.
+            logger.warning(f"Could not read stream for task {task_id}: {e}")
+            return
+        if not entries:
+            if time.monotonic() - last_activity >= idle_timeout:
+                return
+            yield None, None, None
+            continue
+
+        last_activity = time.monotonic()
+        for event_id, fields in entries[0][1]:
+            cursor = event_id
+            event = fields.get('event')
+            yield event_id, event, json.loads(fields.get('data') or '{}')
+            if event in TERMINAL_EVENTS:
+                return
+
+
+def format_sse(event_id, event, payload):
+    """Encode one Server-Sent Event frame."""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def sse_stream(task_id, last_event_id=None):
+    """Generator of SSE frames for StreamingHttpResponse."""
+    yield "retry: 2000\n\n"
+    finished = False
+    for event_id, event, payload in read_events(task_id, last_event_id):
+        if event_id is None:
+            yield ": keep-alive\n\n"
+            continue
+        finished = event in TERMINAL_EVENTS
+        yield format_sse(event_id, event, payload)
+    if not finished:
+        # Idle timeout or Redis lost: tell the client to fall back to polling task status.
+        yield "event: timeout\ndata: {}\n\n"
+
+
+def chunk_text(chunk):
+    """Text carried by one streamed chunk, ignoring function-call parts."""
+    text = []
+    for candidate in chunk.to_dict().get('candidates', [])[:1]:
+        for part in candidate.get('content', {}).get('parts', []):
+            if 'text' in part:
+                text.append(part['text'])
+    return ''.join(text)
+
+
+def merge_chunks(chunks):
+    """
+    Merge streamed chunks back into a single GenerationResponse, concatenating
+    text and keeping function-call parts, so the tool loop can treat streamed
+    and non-streamed turns the same way.
+    """
+    text = []
+    parts = []
+    for chunk in chunks:
+        for candidate in chunk.to_dict().get('candidates', [])[:1]:
+            for part in candidate.get('content', {}).get('parts', []):
+                if 'text' in part:
+                    text.append(part['text'])
+                elif part:
+                    parts.append(part)
+    if text:
+        parts.insert(0, {'text': ''.join(text)})
+    return GenerationResponse.from_dict({'candidates': [{'content': {'role': 'model', 'parts': parts}}]})
+
+
+class FakeStreamingModel:
+    """
+    Stand-in for GenerativeModel used in local development and tests.
+    Emits a canned reply in fixed-size chunks, sleeping `interval` seconds
+    between chunks, and never calls tools.
+    """
+
+    def __init__(self, reply=None, chunk_words=3, interval=None):
+        self.reply = reply
+        self.chunk_words = chunk_words
+        self.interval = settings.AGENT_FAKE_MODEL_CHUNK_INTERVAL if interval is None else interval
+
+    def _reply_for(self, contents):
+        if self.reply:
+            return self.reply
+        prompt = contents if isinstance(contents, str) else contents[-1].parts[-1].text
+        return (
+            "This is a simulated reply from the local fake model. "
+            f"You asked: {prompt}"
+        )
+
+    def _chunks(self, text):
+        words = text.split(' ')
+        for i in range(0, len(words), self.chunk_words):
+            piece = ' '.join(words[i:i + self.chunk_words])
+            if i + self.chunk_words < len(words):
+                piece += ' '
+            yield GenerationResponse.from_dict(
+                {'candidates': [{'content': {'role': 'model', 'parts': [{'text': piece}]}}]}
+            )
+
+    def _stream(self, text):
+        for i, chunk in enumerate(self._chunks(text)):
+            if i and self.interval:
+                time.sleep(self.interval)
+            yield chunk
+
+    def generate_content(self, contents, tool_config=None, stream=False, **kwargs):
+        text = self._reply_for(contents)
+        if stream:
+            return self._stream(text)
+        return merge_chunks(self._chunks(text))
+
+    async def generate_content_async(self, contents, tool_config=None, **kwargs):
+        chunks = list(self._chunks(self._reply_for(contents)))
+        if self.interval and len(chunks) > 1:
+            await asyncio.sleep(self.interval * (len(chunks) - 1))
+        return merge_chunks(chunks)
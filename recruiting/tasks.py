@@ -2,8 +2,10 @@ import os
 import json
 import vertexai
 from celery import shared_task
+from celery.signals import worker_process_init
 from django.core.exceptions import ObjectDoesNotExist
 from json.decoder import JSONDecodeError
+from datetime import timedelta
 import requests 
 
 from vertexai.generative_models import (
@@ -12,13 +14,25 @@ from vertexai.generative_models import (
     ToolConfig,
 )
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Conversation, ChatSession, ActionItem, LedgerEntry, AdminSettings # <-- ADDED NEW MODELS
+from django.db import transaction
+from django.utils import timezone
+from .models import Conversation, ChatSession, ActionItem, LedgerEntry, AdminSettings, AnalyticsFlushBatch # <-- ADDED NEW MODELS
+from . import family_feed, http_client, metric_store, percentiles, streaming
+from .analytics import reconcile_user_analytics, record_deltas
+from .analytics_buffer import flush_analytics_buffer
+from .model_registry import get_model, registry as model_registry
+from .prompts import content_hash
+from .tool_executor import ToolExecutor
+from .search_cache import cached_search
 
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT_ID")
 LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
 vertexai.init(project=PROJECT_ID, location=LOCATION)
 
+MODEL_NAME = "gemini-2.5-flash"
+
 # --- Google Custom Search API Configuration ---
 CUSTOM_SEARCH_ENGINE_ID = os.getenv("CUSTOM_SEARCH_ENGINE_ID")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -45,6 +59,25 @@ TOOL_CONFIG_AUTO = ToolConfig(
     )
 )
 
+def format_search_results(search_data):
+    """Consolidates Custom Search API items into the tool result dict for the LLM."""
+    context_string = ""
+
+    for i, item in enumerate(search_data.get('items', [])):
+        context_string += (
+            f"Result {i+1}:\n"
+            f"Title: {item.get('title')}\n"
+            f"Text: {item.get('snippet')}\n"
+            f"Source URL: {item.get('link')}\n\n"
+        )
+
+    if not context_string:
+        return {"search_results": "No relevant search results found."}
+
+    return {"search_context": context_string}
+
+
+@cached_search('basic')
 def google_search(query):
     # ... (google_search function remains unchanged)
     """
@@ -65,26 +98,11 @@ def google_search(query):
     }
 
     try:
-        response = requests.get(SEARCH_API_URL, params=params, timeout=5)
+        response = http_client.get(SEARCH_API_URL, params=params)
         
         # We assume the HTTP request succeeded, but if not, raise the status error
         response.raise_for_status() 
-        search_data = response.json()
-        
-        context_string = "" 
-        
-        for i, item in enumerate(search_data.get('items', [])):
-            context_string += (
-                f"Result {i+1}:\n"
-                f"Title: {item.get('title')}\n"
-                f"Text: {item.get('snippet')}\n"
-                f"Source URL: {item.get('link')}\n\n"
-            )
-        
-        if not context_string:
-            return {"search_results": "No relevant search results found."}
-
-        return {"search_context": context_string}
+        return format_search_results(response.json())
 
     except requests.exceptions.RequestException as e:
         print(f"Error connecting to Google Search API: {e}")
@@ -95,6 +113,36 @@ def google_search(query):
         return {"error": "An internal error occurred during search."}
 
 
+# Tools the agent may call; all calls in one round run concurrently.
+agent_tools = ToolExecutor(
+    max_workers=settings.AGENT_TOOL_MAX_WORKERS,
+    timeout=settings.AGENT_TOOL_TIMEOUT_SECONDS,
+)
+agent_tools.register("google_search", google_search)
+
+
+def _run_tool_calls(function_call_content, function_round):
+    """
+    Executes every function_call part of the model's turn concurrently and
+    returns the function_response parts in the same order.
+    """
+    calls = [
+        (part.function_call.name, dict(part.function_call.args))
+        for part in function_call_content.parts
+        if part.function_call
+    ]
+    outputs, metrics = agent_tools.run(calls)
+    print(
+        f"[FUNCTION CALLING] Round {function_round}: {metrics.calls} call(s) in {metrics.wall_seconds:.2f}s "
+        f"(sequential {metrics.sequential_seconds:.2f}s, saved {metrics.saved_seconds:.2f}s)"
+    )
+    print(f"[SEARCH CACHE] {google_search.cache.stats()}")
+    return [
+        Part.from_function_response(name=name, response=output)
+        for (name, _), output in zip(calls, outputs)
+    ]
+
+
 # --- UNTETHERED MODE PROMPT ---
 UNTETHERED_PROMPT = """
 You are Claude, an AI assistant created by Anthropic.
@@ -106,13 +154,63 @@ Respond naturally and helpfully to any request.
 """
 
 
+def _generate(model, messages_for_api, stream_task_id=None):
+    """
+    Runs one model turn. With stream_task_id set, the turn is streamed and each
+    text chunk is published to the task's SSE stream as it arrives; the chunks
+    are merged back into one response so the tool loop is the same either way.
+    Only the final round's text is saved, so a round that ends in function
+    calls publishes a reset and the client drops what it showed.
+    """
+    if not stream_task_id:
+        return model.generate_content(messages_for_api, tool_config=TOOL_CONFIG_AUTO)
+
+    chunks = []
+    published = False
+    for chunk in model.generate_content(messages_for_api, tool_config=TOOL_CONFIG_AUTO, stream=True):
+        chunks.append(chunk)
+        text = streaming.chunk_text(chunk)
+        if text:
+            streaming.publish_chunk(stream_task_id, text)
+            published = True
+    response = streaming.merge_chunks(chunks)
+    if published and response.candidates and response.candidates[0].function_calls:
+        streaming.publish_reset(stream_task_id)
+    return response
+
+
+def extract_response_text(response):
+    """
+    Defensive text extraction to prevent SDK errors from crashing the agent
+    after the tool loop (e.g. when the final turn still holds a function call).
+    """
+    try:
+        return response.text
+    except (ValueError, AttributeError) as e:
+        print(f"[ERROR] Failed to extract text from response: {e}")
+        # Fallback to direct extraction of text from the first candidate part
+        if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
+            text_part = next((p.text for p in response.candidates[0].content.parts if p.text), None)
+            if text_part:
+                return text_part
+            # If all else fails, use a generic error message
+            return "I encountered an internal error while synthesizing my response. The search may have been successful, but I couldn't formulate a proper answer. Please try rephrasing your question."
+        return "I encountered an unrecoverable internal error while processing your request."
+
+
 # --- AI Response Task ---
 @shared_task(bind=True)
-def get_ai_response(self, user_prompt, core_prompt, history_dicts, session_id, user_id):
+def get_ai_response(self, user_prompt, core_prompt, history_dicts, session_id, user_id, stream=False, prompt_hash='',
+                    call_context=''):
     """
     Generates a response, handling tool execution manually, including multiple function calls.
     Now supports admin untethered mode for unrestricted conversations.
+    With stream=True, text is published to the task's Redis stream as it is generated.
+    prompt_hash identifies the compiled system prompt and is stored on the Conversation.
+    call_context (date, player context, Ledger insights) is sent ahead of the
+    prompt rather than in the system instruction, so the model instance is shared.
     """
+    stream_task_id = self.request.id if stream else None
     try:
         # Check if admin has untethered mode enabled
         user = User.objects.get(pk=user_id)
@@ -120,25 +218,24 @@ def get_ai_response(self, user_prompt, core_prompt, history_dicts, session_id, u
             admin_settings = user.admin_settings
             if admin_settings.untethered_mode_enabled:
                 core_prompt = UNTETHERED_PROMPT
+                prompt_hash = content_hash(UNTETHERED_PROMPT)
+                call_context = ''
                 print(f"[ADMIN MODE] User {user.username} is using untethered mode")
         except AdminSettings.DoesNotExist:
             pass  # Not an admin user, continue with normal prompt
 
-        model = GenerativeModel(
-            "gemini-2.5-flash",
-            system_instruction=[core_prompt],
-            tools=[search_tool]
-        )
+        if settings.AGENT_FAKE_MODEL:
+            model = streaming.FakeStreamingModel()
+        else:
+            model = get_model(MODEL_NAME, core_prompt, (search_tool,))
 
         history = [Content(role=item['role'], parts=[Part.from_text(p['text']) for p in item['parts']]) for item in history_dicts]
         
-        messages_for_api = history + [Content(role="user", parts=[Part.from_text(user_prompt)])]
+        prompt_parts = [Part.from_text(call_context)] if call_context else []
+        messages_for_api = history + [Content(role="user", parts=prompt_parts + [Part.from_text(user_prompt)])]
 
         # 1. First call to the model
-        response = model.generate_content(
-            messages_for_api,
-            tool_config=TOOL_CONFIG_AUTO
-        )
+        response = _generate(model, messages_for_api, stream_task_id)
 
         # Allow up to 5 rounds of function calling to handle multi-step searches
         max_function_rounds = 5
@@ -159,24 +256,8 @@ def get_ai_response(self, user_prompt, core_prompt, history_dicts, session_id, u
             model_function_call_content = response.candidates[0].content
             messages_for_api.append(model_function_call_content)
 
-            tool_responses = []
-
-            # 2. Iterate through ALL function_call parts generated by the model
-            for part in model_function_call_content.parts:
-                if part.function_call:
-                    function_call = part.function_call
-                    function_name = function_call.name
-
-                    if function_name == "google_search":
-                        args = dict(function_call.args)
-                        tool_output = google_search(**args)
-
-                        tool_responses.append(
-                            Part.from_function_response(
-                                name=function_name,
-                                response=tool_output
-                            )
-                        )
+            # 2. Run ALL function_call parts generated by the model concurrently
+            tool_responses = _run_tool_calls(model_function_call_content, function_round)
 
             # 3. Append ALL tool responses to the history
             if tool_responses:
@@ -185,105 +266,140 @@ def get_ai_response(self, user_prompt, core_prompt, history_dicts, session_id, u
                 )
 
                 # 4. Call the model again to either get more function calls or the final response
-                response = model.generate_content(messages_for_api, tool_config=TOOL_CONFIG_AUTO)
+                response = _generate(model, messages_for_api, stream_task_id)
 
         if function_round >= max_function_rounds:
             print(f"[FUNCTION CALLING] WARNING: Reached maximum function calling rounds ({max_function_rounds}). Attempting to extract response anyway.")
 
-        # --- FIX: Defensive text extraction to prevent SDK errors from crashing task ---
-        try:
-            ai_response_text = response.text
-        except (ValueError, AttributeError) as e:
-            print(f"[ERROR] Failed to extract text from response: {e}")
-            # Fallback to direct extraction of text from the first candidate part
-            if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                text_part = next((p.text for p in response.candidates[0].content.parts if p.text), None)
-                if text_part:
-                    ai_response_text = text_part
-                else:
-                    # If all else fails, use a generic error message
-                    ai_response_text = "I encountered an internal error while synthesizing my response. The search may have been successful, but I couldn't formulate a proper answer. Please try rephrasing your question."
-            else:
-                ai_response_text = "I encountered an unrecoverable internal error while processing your request."
-
+        ai_response_text = extract_response_text(response)
 
         chat_session = ChatSession.objects.get(id=session_id)
-        Conversation.objects.create(
+        conversation = Conversation.objects.create(
             session=chat_session,
             user_id=user_id,
             prompt_text=user_prompt,
-            response_text=ai_response_text
+            response_text=ai_response_text,
+            task_id=self.request.id,
+            prompt_hash=prompt_hash
         )
+        if stream_task_id:
+            streaming.publish_done(stream_task_id, conversation.id, chat_session.id)
         return ai_response_text
 
     except ObjectDoesNotExist:
+        if stream_task_id:
+            streaming.publish_failed(stream_task_id, "Chat session not found.")
         return "Chat session not found."
     except Exception as e:
         print(f"An unexpected error occurred in AI agent task: {e}. Retrying in 60s.")
+        if stream_task_id:
+            # The client falls back to polling, which also covers the retry.
+            streaming.publish_failed(stream_task_id, "The response is being retried.")
         raise self.retry(exc=e, countdown=60)
 
 
 # --- NEW TASK FOR MILESTONE 3: GENERATING ACTION ITEMS ---
 
+ACTION_ITEMS_SYSTEM_PROMPT = (
+    "You are an expert project manager and recruiting strategist. Your task is to analyze "
+    "the provided advice/insight and distill it into 3 to 5 clear, concrete, and actionable "
+    "steps (Action Items) for a student-athlete. Each action item must be a short, direct "
+    "sentence (max 15 words). Ignore any background context or titles, focus strictly on the action."
+    "Respond ONLY with a single JSON array containing objects with the key 'description'. "
+    "DO NOT include any markdown fences (```json) or introductory text. "
+    "Example response: [{'description': 'Research 10 target schools this week.'}, {'description': 'Create a new highlight reel clip.'}]"
+)
+
+def _generated_descriptions(action_list):
+    """Distinct, non-empty descriptions from the model's list, in order, cut to the column length."""
+    max_length = ActionItem._meta.get_field('description').max_length
+    descriptions = []
+    for action_data in action_list:
+        description = action_data.get('description') if isinstance(action_data, dict) else None
+        if isinstance(description, str) and description.strip():
+            description = description.strip()[:max_length]
+            if description not in descriptions:
+                descriptions.append(description)
+    return descriptions
+
+
 @shared_task(bind=True)
 def generate_action_items_task(self, user_id, ledger_entry_id, ledger_content):
     """
     Analyzes the content of a LedgerEntry and generates structured ActionItem records.
+
+    Idempotent per (ledger entry, content hash): each run records the hash on
+    the entry, even when the model gave no usable items, so retries and
+    repeated requests for the same content return without calling the model.
+    Items are written with one bulk INSERT in a transaction holding the
+    entry's row lock, so concurrent runs can't both write; bulk_create skips
+    model signals, so the analytics delta and board invalidation are applied
+    once afterwards.
     """
+    generation_key = content_hash(ledger_content)
+    if LedgerEntry.all_objects.filter(pk=ledger_entry_id, action_items_key=generation_key).exists():
+        return f"Action Items were already generated from Ledger Entry {ledger_entry_id}."
+
     try:
-        system_prompt = (
-            "You are an expert project manager and recruiting strategist. Your task is to analyze "
-            "the provided advice/insight and distill it into 3 to 5 clear, concrete, and actionable "
-            "steps (Action Items) for a student-athlete. Each action item must be a short, direct "
-            "sentence (max 15 words). Ignore any background context or titles, focus strictly on the action."
-            "Respond ONLY with a single JSON array containing objects with the key 'description'. "
-            "DO NOT include any markdown fences (```json) or introductory text. "
-            "Example response: [{'description': 'Research 10 target schools this week.'}, {'description': 'Create a new highlight reel clip.'}]"
-        )
-        
-        model = GenerativeModel("gemini-2.5-flash", system_instruction=[system_prompt])
-        
+        model = get_model(MODEL_NAME, ACTION_ITEMS_SYSTEM_PROMPT)
+
         # The content sent to the model is just the advice from the Ledger
         response = model.generate_content(ledger_content)
-        
         raw_text = response.text.strip()
-        cleaned_text = raw_text.replace("```json", "").replace("```", "").strip()
-
-        try:
-            # Parse the structured list of action items
-            action_list = json.loads(cleaned_text)
-            
-            if not isinstance(action_list, list):
-                raise JSONDecodeError("Root is not a list.", cleaned_text, 0)
-            
-            # Retrieve the necessary objects
-            user = User.objects.get(pk=user_id)
-            source_entry = LedgerEntry.objects.get(pk=ledger_entry_id)
-
-            created_count = 0
-            for action_data in action_list:
-                description = action_data.get('description')
-                if description:
-                    ActionItem.objects.create(
-                        user=user,
-                        source_ledger_entry=source_entry,
-                        description=description,
-                        priority=2 # Default to Medium priority for generated tasks
-                    )
-                    created_count += 1
-            
-            return f"Successfully created {created_count} Action Items from Ledger Entry {ledger_entry_id}."
-
-        except JSONDecodeError as jde:
-            print(f"JSON Decoding Error: {jde}. Raw Response: {raw_text}")
-            return f"Failed to generate Action Items: Bad JSON format."
-        
-    except (ObjectDoesNotExist, Exception) as e:
+    except Exception as e:
+        # Safe to retry: nothing has been written yet, and a retry racing a
+        # duplicate request is caught by the generation key.
         print(f"Error generating action items: {e}")
         raise self.retry(exc=e, countdown=60)
 
+    cleaned_text = raw_text.replace("```json", "").replace("```", "").strip()
+    try:
+        # Parse the structured list of action items
+        action_list = json.loads(cleaned_text)
+        if not isinstance(action_list, list):
+            raise JSONDecodeError("Root is not a list.", cleaned_text, 0)
+    except JSONDecodeError as jde:
+        print(f"JSON Decoding Error: {jde}. Raw Response: {raw_text}")
+        action_list = None
+    descriptions = _generated_descriptions(action_list or [])
+
+    with transaction.atomic():
+        # Serializes runs for the same entry; the loser sees the winner's key.
+        locked = LedgerEntry.all_objects.select_for_update().filter(pk=ledger_entry_id)
+        recorded_key = locked.values_list('action_items_key', flat=True).first()
+        if recorded_key is None:
+            return f"Ledger Entry {ledger_entry_id} no longer exists."
+        if recorded_key == generation_key:
+            return f"Action Items were already generated from Ledger Entry {ledger_entry_id}."
+        ActionItem.objects.bulk_create([
+            ActionItem(
+                user_id=user_id,
+                source_ledger_entry_id=ledger_entry_id,
+                description=description,
+                priority=2,  # Default to Medium priority for generated tasks
+                generation_key=generation_key,
+            )
+            for description in descriptions
+        ], ignore_conflicts=True)
+        # A queryset update, so the entry's save signals don't fire.
+        LedgerEntry.all_objects.filter(pk=ledger_entry_id).update(action_items_key=generation_key)
+
+    if action_list is None:
+        return f"Failed to generate Action Items: Bad JSON format."
+    if descriptions:
+        record_deltas(user_id, {'action_items_created': len(descriptions)})
+        family_feed.invalidate(user_id)
+    return f"Successfully created {len(descriptions)} Action Items from Ledger Entry {ledger_entry_id}."
+
 
 # --- Title and Summary Task (Unchanged) ---
+TITLE_SUMMARY_SYSTEM_PROMPT = (
+    "You are a summarization expert. Analyze the provided conversation snippet. "
+    "Generate a concise, engaging title (max 5 words) and a brief summary (max 20 words). "
+    "Respond ONLY with a single valid JSON object containing the keys 'title' and 'summary'. "
+    "DO NOT include any markdown fences (```json) or introductory text."
+)
+
 @shared_task(bind=True)
 def generate_title_and_summary(self, session_id):
     # ... (generate_title_and_summary remains unchanged)
@@ -301,14 +417,7 @@ def generate_title_and_summary(self, session_id):
                 
         conversation_context = "\n\n".join(context_parts)
         
-        system_prompt = (
-            "You are a summarization expert. Analyze the provided conversation snippet. "
-            "Generate a concise, engaging title (max 5 words) and a brief summary (max 20 words). "
-            "Respond ONLY with a single valid JSON object containing the keys 'title' and 'summary'. "
-            "DO NOT include any markdown fences (```json) or introductory text."
-        )
-        
-        model = GenerativeModel("gemini-2.5-flash", system_instruction=[system_prompt])
+        model = get_model(MODEL_NAME, TITLE_SUMMARY_SYSTEM_PROMPT)
         response = model.generate_content(conversation_context)
         
         raw_text = response.text.strip()
@@ -338,4 +447,69 @@ def generate_title_and_summary(self, session_id):
         return f"Chat session {session_id} not found."
     except Exception as e:
         print(f"Error generating title/summary for session {session_id}: {e}")
-        raise self.retry(exc=e, countdown=60)
\ No newline at end of file
+        raise self.retry(exc=e, countdown=60)
+
+
+# --- Metric Value Store ---
+@shared_task
+def resync_metric_values_task(sport_id, code):
+    """Rewrites the typed MetricValues for one metric code after its definitions changed."""
+    written = metric_store.resync_code(sport_id, code)
+    print(f"[METRIC STORE] Resynced {code} in sport {sport_id}: {written} value(s).")
+    return written
+
+
+# --- Analytics Reconciliation ---
+@shared_task
+def reconcile_analytics_task():
+    """
+    Recounts UserAnalytics from the source tables. Scheduled by Celery beat to
+    age out the rolling 7-day session count and correct any drift left by bulk
+    updates that bypass signals.
+    """
+    if settings.ANALYTICS_WRITE_BEHIND:
+        # Buffered deltas would otherwise be added on top of the fresh counts.
+        flush_analytics_buffer()
+    corrected = reconcile_user_analytics()
+    # Flush records only guard against re-applying a batch retried after a crash.
+    AnalyticsFlushBatch.objects.filter(flushed_at__lt=timezone.now() - timedelta(days=7)).delete()
+    print(f"[ANALYTICS] Reconciliation corrected {corrected} row(s).")
+    return corrected
+
+
+@shared_task
+def flush_analytics_buffer_task():
+    """Applies buffered UserAnalytics deltas (write-behind mode) in bulk."""
+    if not settings.ANALYTICS_WRITE_BEHIND:
+        return 0
+    flushed = flush_analytics_buffer()
+    if flushed:
+        print(f"[ANALYTICS] Flushed buffered deltas for {flushed} user(s).")
+    return flushed
+
+
+# --- Percentile Index ---
+@shared_task
+def rebuild_percentile_index_task(full=False):
+    """Publishes a new percentile index generation covering the cohorts changed since the last one."""
+    written = percentiles.build_index(full=full)
+    if written is not None:
+        print(f"[PERCENTILES] Published index generation ({written} cohort(s) rewritten, full={full}).")
+    return written
+
+
+# --- Worker Warm-up ---
+@worker_process_init.connect
+def warm_model_registry(**kwargs):
+    """
+    Build the fixed-prompt models once per worker process at start-up, so the
+    first action-item and summary tasks reuse them instead of paying setup cost.
+    """
+    try:
+        model_registry.warm([
+            (MODEL_NAME, ACTION_ITEMS_SYSTEM_PROMPT, ()),
+            (MODEL_NAME, TITLE_SUMMARY_SYSTEM_PROMPT, ()),
+        ])
+        print(f"[MODEL REGISTRY] Warmed worker process: {model_registry.stats()}")
+    except Exception as e:
+        print(f"[MODEL REGISTRY] Warm-up skipped: {e}")
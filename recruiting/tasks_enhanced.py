@@ -13,7 +13,12 @@ from vertexai.generative_models import (
     ToolConfig,
 )
 
+from django.conf import settings
+
 from .models import Conversation, ChatSession, ActionItem, LedgerEntry
+from . import http_client
+from .search_cache import cached_search
+from .tool_executor import ToolExecutor
 
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT_ID")
 LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
@@ -87,15 +92,11 @@ TOOL_CONFIG_AUTO = ToolConfig(
 # ENHANCED SEARCH FUNCTION WITH VALIDATION & CITATION
 # ============================================================================
 
-def google_search(query):
+@cached_search('enhanced')
+def _search_results(query):
     """
-    Executes a search using the Google Custom Search API with enhanced result processing.
-
-    Improvements:
-    - Increased result count to 8 for better coverage
-    - Adds metadata for source validation
-    - Includes search timestamp
-    - Better error messaging
+    Raw ranked results for query, or an error dict. Only this list is cached
+    (under the normalized query); google_search formats it per call.
     """
     print(f"[SEARCH] Executing query: '{query}'")
 
@@ -113,7 +114,7 @@ def google_search(query):
     }
 
     try:
-        response = requests.get(SEARCH_API_URL, params=params, timeout=10)  # Increased timeout
+        response = http_client.get(SEARCH_API_URL, params=params, read_timeout=10)  # Increased timeout
         response.raise_for_status()
         search_data = response.json()
 
@@ -128,32 +129,7 @@ def google_search(query):
                 'source_domain': item.get('displayLink', 'Unknown source')
             }
             results.append(result_entry)
-
-        if not results:
-            return {
-                "status": "no_results",
-                "message": f"No search results found for query: '{query}'",
-                "suggestion": "Try rephrasing your search with different keywords or check for typos."
-            }
-
-        # Format results for LLM consumption
-        context_string = f"Search Query: '{query}'\n"
-        context_string += f"Search Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}\n"
-        context_string += f"Total Results: {len(results)}\n\n"
-
-        for result in results:
-            context_string += f"[{result['rank']}] {result['title']}\n"
-            context_string += f"    Source: {result['source_domain']}\n"
-            context_string += f"    {result['snippet']}\n"
-            context_string += f"    URL: {result['url']}\n\n"
-
-        return {
-            "status": "success",
-            "query": query,
-            "result_count": len(results),
-            "search_context": context_string,
-            "sources": [r['url'] for r in results]  # Separate list for citation tracking
-        }
+        return {"results": results}
 
     except requests.exceptions.Timeout:
         return {
@@ -174,6 +150,57 @@ def google_search(query):
         }
 
 
+def google_search(query):
+    """
+    Executes a search using the Google Custom Search API with enhanced result processing.
+
+    Improvements:
+    - Increased result count to 8 for better coverage
+    - Adds metadata for source validation
+    - Includes search timestamp
+    - Better error messaging
+    """
+    fetched = _search_results(query)
+    if "error" in fetched:
+        return fetched
+    results = fetched["results"]
+
+    if not results:
+        return {
+            "status": "no_results",
+            "message": f"No search results found for query: '{query}'",
+            "suggestion": "Try rephrasing your search with different keywords or check for typos."
+        }
+
+    # Format results for LLM consumption; the query and timestamp are this call's,
+    # even when the results were cached for an equivalent query.
+    context_string = f"Search Query: '{query}'\n"
+    context_string += f"Search Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}\n"
+    context_string += f"Total Results: {len(results)}\n\n"
+
+    for result in results:
+        context_string += f"[{result['rank']}] {result['title']}\n"
+        context_string += f"    Source: {result['source_domain']}\n"
+        context_string += f"    {result['snippet']}\n"
+        context_string += f"    URL: {result['url']}\n\n"
+
+    return {
+        "status": "success",
+        "query": query,
+        "result_count": len(results),
+        "search_context": context_string,
+        "sources": [r['url'] for r in results]  # Separate list for citation tracking
+    }
+
+
+# Concurrent executor for the enhanced tool set
+agent_tools = ToolExecutor(
+    max_workers=settings.AGENT_TOOL_MAX_WORKERS,
+    timeout=settings.AGENT_TOOL_TIMEOUT_SECONDS,
+)
+agent_tools.register("google_search", google_search)
+
+
 # ============================================================================
 # ENHANCED AI RESPONSE TASK WITH IMPROVED SEARCH HANDLING
 # ============================================================================
@@ -224,30 +251,30 @@ def get_ai_response(self, user_prompt, core_prompt, history_dicts, session_id, u
             model_function_call_content = response.candidates[0].content
             messages_for_api.append(model_function_call_content)
 
-            tool_responses = []
-
-            # Execute all function calls
-            for part in model_function_call_content.parts:
-                if part.function_call:
-                    function_call = part.function_call
-                    function_name = function_call.name
-
-                    if function_name == "google_search":
-                        args = dict(function_call.args)
-                        print(f"[AGENT] Executing search: {args.get('query', 'No query')}")
-
-                        tool_output = google_search(**args)
-
-                        # Track sources if search was successful
-                        if tool_output.get('status') == 'success':
-                            cited_sources.extend(tool_output.get('sources', []))
+            # Execute all function calls concurrently, keeping the model's order
+            calls = [
+                (part.function_call.name, dict(part.function_call.args))
+                for part in model_function_call_content.parts
+                if part.function_call
+            ]
+            outputs, metrics = agent_tools.run(calls)
+            print(
+                f"[AGENT] {metrics.calls} tool call(s) in {metrics.wall_seconds:.2f}s "
+                f"(sequential {metrics.sequential_seconds:.2f}s, saved {metrics.saved_seconds:.2f}s)"
+            )
 
-                        tool_responses.append(
-                            Part.from_function_response(
-                                name=function_name,
-                                response=tool_output
-                            )
-                        )
+            tool_responses = []
+            for (function_name, _), tool_output in zip(calls, outputs):
+                # Track sources if search was successful
+                if tool_output.get('status') == 'success':
+                    cited_sources.extend(tool_output.get('sources', []))
+
+                tool_responses.append(
+                    Part.from_function_response(
+                        name=function_name,
+                        response=tool_output
+                    )
+                )
 
             # Append all tool responses
             if tool_responses:
@@ -287,7 +314,8 @@ def get_ai_response(self, user_prompt, core_prompt, history_dicts, session_id, u
             session=chat_session,
             user_id=user_id,
             prompt_text=user_prompt,
-            response_text=ai_response_text
+            response_text=ai_response_text,
+            task_id=self.request.id
         )
 
         print(f"[AGENT] Response generated. Searches performed: {len(cited_sources) > 0}")
@@ -1,6 +1,50 @@
-from django.test import TestCase, Client
+import asyncio
+import dataclasses
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+import redis
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.http import QueryDict
+from django.test import AsyncClient, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from . import (
+    async_agent, athlete_search, catalog, http_client, ledger_retrieval, metric_store, metric_validation, percentiles,
+    prompts, streaming, tasks, text_search, trends,
+)
+from .history import build_history, estimate_tokens
+from .model_registry import ModelRegistry
+from .pagination import encode_cursor
+from . import analytics_buffer
+from .analytics import reconcile_user_analytics
+from .models import (
+    ActionItem, AnalyticsFlushBatch, ChatSession, CompetitionResult, Conversation, FamilyAccount, FamilyMember, LedgerEntry,
+    MetricDefinition, MetricTrendSummary, MetricValue, PerformanceEntry, Position, PositionProfile, PromptComponent, Sport, SportProfile,
+    UserAnalytics, UserProfile,
+)
+from .performance_import import COMPETITION, PerformanceImporter
+from .search_cache import SearchCache, normalize_query
+from .session_stats import backfill_session_stats
+from .tasks import generate_action_items_task, get_ai_response
+from .tool_executor import ToolExecutor
+from .views import _prepare_agent_call
+
 class AgentViewTests(TestCase):
     def setUp(self):
         # This sets up a "client" that can act like a web browser in our tests.
@@ -23,4 +67,1649 @@ class AgentViewTests(TestCase):
         # The 'reverse' function finds the URL for our agent's main page.
         response = self.client.get(reverse('index'))
         # We check if the response is a redirect (status code 302).
-        self.assertEqual(response.status_code, 302)
\ No newline at end of file
+        self.assertEqual(response.status_code, 302)
+
+class TaskStatusLookupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        self.client.force_login(self.user)
+        self.session = ChatSession.objects.create(user=self.user, title='Recruiting')
+        self.conversation = Conversation.objects.create(
+            session=self.session,
+            user=self.user,
+            prompt_text='When can coaches call me?',
+            response_text='After June 15 of your sophomore year.',
+            task_id='task-123',
+        )
+
+    @patch('recruiting.views.generate_title_and_summary')
+    @patch('recruiting.views.AsyncResult')
+    def test_success_resolves_message_by_task_id(self, mock_result, mock_summary):
+        """
+        A finished task is mapped to its Conversation through the task id,
+        not by matching the response text.
+        """
+        mock_result.return_value = MagicMock(status='SUCCESS', result='unrelated text')
+        response = self.client.get(reverse('get_task_status', args=['task-123']))
+
+        data = response.json()
+        self.assertEqual(data['conversation_id'], str(self.conversation.id))
+        self.assertEqual(data['session_id'], str(self.session.id))
+        mock_summary.delay.assert_called_once_with(str(self.session.id))
+
+    @patch('recruiting.views.generate_title_and_summary')
+    @patch('recruiting.views.AsyncResult')
+    def test_other_users_task_is_not_resolved(self, mock_result, mock_summary):
+        other = User.objects.create_user(username='other', password='pw')
+        self.client.force_login(other)
+        mock_result.return_value = MagicMock(status='SUCCESS', result='unrelated text')
+        response = self.client.get(reverse('get_task_status', args=['task-123']))
+
+        self.assertNotIn('conversation_id', response.json())
+        mock_summary.delay.assert_not_called()
+
+
+@override_settings(AGENT_FAKE_MODEL=True, AGENT_FAKE_MODEL_CHUNK_INTERVAL=0.25, AGENT_STREAMING_ENABLED=True)
+class AgentStreamingTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        patcher = patch('recruiting.redis_client.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username='streamer', password='pw')
+        self.client.force_login(self.user)
+        self.session = ChatSession.objects.create(user=self.user, title='Streaming')
+
+    def _sse_frames(self, response):
+        body = b''.join(response.streaming_content).decode()
+        return [frame for frame in body.split('\n\n') if frame.startswith('id: ')]
+
+    @patch('recruiting.streaming.time.sleep')
+    def test_task_streams_fake_model_chunks_on_fixed_schedule(self, mock_sleep):
+        get_ai_response.apply(
+            args=['What is a dead period?', 'core prompt', [], str(self.session.id), self.user.id],
+            kwargs={'stream': True},
+            task_id='stream-task',
+        )
+
+        events = list(streaming.read_events('stream-task', block_ms=1, idle_timeout=0))
+        chunks = [payload['text'] for _, event, payload in events if event == 'chunk']
+        conversation = Conversation.objects.get(task_id='stream-task')
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), conversation.response_text)
+        self.assertEqual(events[-1][1], 'done')
+        self.assertEqual(events[-1][2]['conversation_id'], str(conversation.id))
+        self.assertEqual(mock_sleep.call_count, len(chunks) - 1)
+        mock_sleep.assert_called_with(0.25)
+
+    def test_text_before_a_tool_call_is_reset(self):
+        def frame(part):
+            return streaming.GenerationResponse.from_dict({'candidates': [{'content': {'role': 'model', 'parts': [part]}}]})
+
+        model = MagicMock()
+        model.generate_content.return_value = iter([
+            frame({'text': 'Let me look that up. '}),
+            frame({'function_call': {'name': 'google_search', 'args': {'query': 'dead period'}}}),
+        ])
+        response = tasks._generate(model, [], stream_task_id='tool-task')
+        self.assertTrue(response.candidates[0].function_calls)
+        events = [event for _, event, _ in streaming.read_events('tool-task', block_ms=1, idle_timeout=0) if event]
+        self.assertEqual(events, ['chunk', 'reset'])
+
+    def test_sse_endpoint_falls_back_when_redis_drops(self):
+        streaming.register_stream('dropped-task', self.user.id)
+        with patch.object(self.redis, 'xread', side_effect=redis.ConnectionError('down')):
+            response = self.client.get(reverse('stream_task_response', args=['dropped-task']))
+            body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.endswith('event: timeout\ndata: {}\n\n'))
+
+    def test_sse_endpoint_resumes_after_last_event_id(self):
+        streaming.register_stream('resume-task', self.user.id)
+        first = streaming.publish_chunk('resume-task', 'Hello ')
+        streaming.publish_chunk('resume-task', 'coach')
+        streaming.publish_done('resume-task', 1, self.session.id)
+
+        response = self.client.get(
+            reverse('stream_task_response', args=['resume-task']),
+            HTTP_LAST_EVENT_ID=first,
+        )
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = self._sse_frames(response)
+        self.assertEqual(len(frames), 2)
+        self.assertIn('event: chunk', frames[0])
+        self.assertIn('"coach"', frames[0])
+        self.assertIn('event: done', frames[1])
+
+    def test_sse_endpoint_rejects_other_users(self):
+        streaming.register_stream('private-task', self.user.id)
+        other = User.objects.create_user(username='intruder', password='pw')
+        self.client.force_login(other)
+
+        response = self.client.get(reverse('stream_task_response', args=['private-task']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_sse_endpoint_reports_redis_outages(self):
+        broken = MagicMock()
+        broken.get.side_effect = redis.ConnectionError('down')
+        with patch('recruiting.redis_client.get_redis', return_value=broken):
+            response = self.client.get(reverse('stream_task_response', args=['any-task']))
+        self.assertEqual(response.status_code, 503)
+
+    @patch('recruiting.views.get_ai_response')
+    def test_ask_agent_offers_stream_url(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id='ask-task')
+        response = self.client.post(
+            reverse('ask_agent'),
+            data=json.dumps({'prompt': 'Hi', 'session_id': str(self.session.id)}),
+            content_type='application/json',
+        )
+
+        data = response.json()
+        self.assertEqual(data['stream_url'], reverse('stream_task_response', args=['ask-task']))
+        self.assertEqual(streaming.stream_owner('ask-task'), self.user.id)
+        self.assertTrue(mock_task.delay.call_args.kwargs['stream'])
+
+    @override_settings(AGENT_STREAMING_ENABLED=False)
+    @patch('recruiting.views.get_ai_response')
+    def test_ask_agent_falls_back_to_polling_when_disabled(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id='poll-task')
+        response = self.client.post(
+            reverse('ask_agent'),
+            data=json.dumps({'prompt': 'Hi', 'session_id': str(self.session.id)}),
+            content_type='application/json',
+        )
+
+        self.assertNotIn('stream_url', response.json())
+
+
+class CompiledPromptTests(TestCase):
+    def setUp(self):
+        PromptComponent.objects.all().delete()
+        cache.clear()
+        prompts._local_prompt = None
+
+    def test_active_components_are_compiled_in_order(self):
+        PromptComponent.objects.create(name='guardrails', content='Stay on topic.', order=2)
+        PromptComponent.objects.create(name='persona', content='You are Coach Alex.', order=1)
+        PromptComponent.objects.create(name='draft', content='Unused.', order=0, is_active=False)
+        PromptComponent.objects.create(name='welcome_message', content='Hi {username}', order=-1)
+
+        compiled = prompts.get_compiled_prompt()
+
+        self.assertEqual(compiled.text, 'You are Coach Alex.\n\nStay on topic.')
+        self.assertEqual(compiled.components, ('persona', 'guardrails'))
+        self.assertEqual(compiled.content_hash, prompts.content_hash(compiled.text))
+
+    def test_cached_prompt_skips_database_until_a_component_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            component = PromptComponent.objects.create(name='persona', content='Version one.')
+        first = prompts.get_compiled_prompt()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(prompts.get_compiled_prompt(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            component.content = 'Version two.'
+            component.save()
+        second = prompts.get_compiled_prompt()
+
+        self.assertEqual(second.text, 'Version two.')
+        self.assertGreater(second.version, first.version)
+        self.assertNotEqual(second.content_hash, first.content_hash)
+
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        self.built = []
+
+        def factory(model_name, system_instruction, tools):
+            model = object()
+            self.built.append((system_instruction, model))
+            return model
+
+        self.registry = ModelRegistry(factory=factory, max_size=2)
+
+    def test_models_are_reused_per_model_instruction_and_tools(self):
+        first = self.registry.get('gemini-2.5-flash', 'Summarize.')
+        again = self.registry.get('gemini-2.5-flash', 'Summarize.')
+        other = self.registry.get('gemini-2.5-flash', 'Plan actions.')
+
+        self.assertIs(first, again)
+        self.assertIsNot(first, other)
+        stats = self.registry.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_least_recently_used_model_is_evicted(self):
+        self.registry.get('gemini-2.5-flash', 'a')
+        self.registry.get('gemini-2.5-flash', 'b')
+        self.registry.get('gemini-2.5-flash', 'a')
+        self.registry.get('gemini-2.5-flash', 'c')
+        self.registry.get('gemini-2.5-flash', 'a')
+        self.registry.get('gemini-2.5-flash', 'b')
+
+        self.assertEqual([instruction for instruction, _ in self.built], ['a', 'b', 'c', 'b'])
+        self.assertEqual(self.registry.stats()['evictions'], 2)
+
+
+class ToolExecutorTests(TestCase):
+    def setUp(self):
+        self.executor = ToolExecutor(max_workers=4, timeout=1.0)
+
+        def slow_search(query, delay=0.2):
+            time.sleep(delay)
+            return {"search_context": query}
+
+        self.executor.register("google_search", slow_search)
+
+    def test_calls_run_concurrently_and_keep_part_order(self):
+        calls = [("google_search", {"query": q}) for q in ("dead period", "NCAA D1 rules", "coach emails")]
+        outputs, metrics = self.executor.run(calls)
+
+        self.assertEqual([o["search_context"] for o in outputs], ["dead period", "NCAA D1 rules", "coach emails"])
+        self.assertLess(metrics.wall_seconds, 0.5)
+        self.assertGreater(metrics.sequential_seconds, 0.55)
+        self.assertGreater(metrics.saved_seconds, 0.2)
+
+    def test_timeouts_and_unknown_tools_return_errors(self):
+        calls = [
+            ("google_search", {"query": "slow", "delay": 1.5}),
+            ("book_visit", {}),
+            ("google_search", {"query": "fast", "delay": 0}),
+        ]
+        outputs, _ = self.executor.run(calls)
+
+        self.assertIn("timed out", outputs[0]["error"])
+        self.assertIn("Unknown tool", outputs[1]["error"])
+        self.assertEqual(outputs[2]["search_context"], "fast")
+
+    def test_timeout_counts_from_when_each_call_starts(self):
+        executor = ToolExecutor(max_workers=1, timeout=0.5)
+        executor.register("google_search", self.executor._tools["google_search"])
+        calls = [("google_search", {"query": q, "delay": 0.3}) for q in ("first", "queued")]
+        outputs, metrics = executor.run(calls)
+
+        # The second call waited 0.3s for the worker, then ran within its own 0.5s.
+        self.assertEqual([o.get("search_context") for o in outputs], ["first", "queued"])
+        self.assertGreater(metrics.wall_seconds, 0.55)
+
+
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def fetch(self, query, delay=0):
+        def run():
+            self.calls.append(query)
+            time.sleep(delay)
+            return {"search_context": f"results for {query}"}
+        return run
+
+    def test_near_identical_queries_share_a_key(self):
+        self.assertEqual(
+            normalize_query("NCAA D1 football dead period 2025"),
+            normalize_query("  the dead period for ncaa d1 FOOTBALL 2025? "),
+        )
+        self.assertNotEqual(normalize_query("D1 dead period"), normalize_query("D2 dead period"))
+
+    def test_local_then_shared_tier(self):
+        worker_a = SearchCache('test')
+        worker_b = SearchCache('test')
+        query = "NCAA D1 football dead period 2025"
+
+        worker_a.get_or_fetch(query, self.fetch(query))
+        worker_a.get_or_fetch(query.lower(), self.fetch(query))
+        result = worker_b.get_or_fetch(query, self.fetch(query))
+
+        self.assertEqual(self.calls, [query])
+        self.assertEqual(result["search_context"], f"results for {query}")
+        self.assertEqual(worker_a.stats()["local_hits"], 1)
+        self.assertEqual(worker_b.stats()["shared_hits"], 1)
+
+    def test_errors_are_not_cached(self):
+        search_cache = SearchCache('test')
+        for _ in range(2):
+            search_cache.get_or_fetch("dead period", lambda: self.calls.append(1) or {"error": "quota"})
+        self.assertEqual(len(self.calls), 2)
+
+    def test_equivalent_queries_share_results_but_not_their_framing(self):
+        from . import tasks_enhanced
+        response = MagicMock()
+        response.json.return_value = {'items': [{'title': 'Dead period', 'link': 'https://ncaa.org'}]}
+        tasks_enhanced._search_results.cache.clear_local()
+        with patch.object(tasks_enhanced, 'GOOGLE_API_KEY', 'key'), \
+                patch.object(tasks_enhanced, 'CUSTOM_SEARCH_ENGINE_ID', 'cx'), \
+                patch.object(tasks_enhanced.http_client, 'get', return_value=response) as get:
+            first = tasks_enhanced.google_search('NCAA dead period')
+            second = tasks_enhanced.google_search('dead period for the ncaa')
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(second['query'], 'dead period for the ncaa')
+        self.assertIn("Search Query: 'dead period for the ncaa'", second['search_context'])
+        self.assertEqual(first['sources'], second['sources'])
+
+    def test_concurrent_misses_make_one_call(self):
+        search_cache = SearchCache('test')
+        query = "coach contact rules"
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(search_cache.get_or_fetch(query, self.fetch(query, 0.2))))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(search_cache.stats()["coalesced"], 7)
+
+    async def test_async_lookups_coalesce_and_share_the_cache(self):
+        search_cache = SearchCache('test')
+        query = "official visit rules"
+
+        async def fetch():
+            self.calls.append(query)
+            await asyncio.sleep(0.1)
+            return {"search_context": query}
+
+        results = await asyncio.gather(*(search_cache.aget_or_fetch(query, fetch) for _ in range(5)))
+        cached = SearchCache('test').get_or_fetch(query, self.fetch(query))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual({r["search_context"] for r in results}, {query})
+        self.assertEqual(cached, {"search_context": query})
+
+
+class _StubSearchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # Runs once per TCP connection; the sleep stands in for a TLS handshake.
+        self.server.connections += 1
+        time.sleep(0.03)
+        super().setup()
+
+    def do_GET(self):
+        if self.server.fail_next > 0:
+            self.server.fail_next -= 1
+            status, body = 503, b'{}'
+        else:
+            status, body = 200, b'{"items": []}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(OUTBOUND_HTTP_BACKOFF_FACTOR=0, OUTBOUND_HTTP_BACKOFF_JITTER=0)
+class PooledHttpClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubSearchHandler)
+        self.server.connections = 0
+        self.server.fail_next = 0
+        self.url = f"http://127.0.0.1:{self.server.server_port}/customsearch"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        http_client.reset()
+
+    def tearDown(self):
+        http_client.reset()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused_and_calls_get_faster(self):
+        start = time.perf_counter()
+        for _ in range(10):
+            requests.get(self.url, timeout=5).json()
+        bare_seconds = time.perf_counter() - start
+        bare_connections = self.server.connections
+
+        self.server.connections = 0
+        start = time.perf_counter()
+        for _ in range(10):
+            http_client.get(self.url).json()
+        pooled_seconds = time.perf_counter() - start
+
+        self.assertEqual(bare_connections, 10)
+        self.assertEqual(self.server.connections, 1)
+        self.assertLess(pooled_seconds, bare_seconds / 2)
+
+    def test_retries_transient_server_errors(self):
+        self.server.fail_next = 2
+        response = http_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+
+class HistoryWindowTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        self.session = ChatSession.objects.create(user=self.user, title='History')
+        for i in range(15):
+            Conversation.objects.create(
+                session=self.session, user=self.user,
+                prompt_text=f"question {i}", response_text=f"answer {i} " + "x" * 392,
+            )
+
+    def test_keeps_most_recent_turns_in_chronological_order(self):
+        window = build_history(self.session, token_budget=10_000, max_turns=10, max_response_tokens=0)
+
+        prompts_sent = [c["parts"][0]["text"] for c in window.contents if c["role"] == "user"]
+        self.assertEqual(prompts_sent, [f"question {i}" for i in range(5, 15)])
+        self.assertEqual(window.contents[-1]["role"], "model")
+
+    def test_stops_at_token_budget(self):
+        window = build_history(self.session, token_budget=350, max_turns=20, max_response_tokens=0)
+
+        self.assertEqual(window.turns, 3)
+        self.assertLessEqual(window.tokens, 350)
+        self.assertEqual(window.contents[0]["parts"][0]["text"], "question 12")
+
+    def test_long_past_responses_are_truncated(self):
+        Conversation.objects.create(
+            session=self.session, user=self.user, prompt_text="essay please", response_text="y" * 40_000,
+        )
+        window = build_history(self.session, token_budget=2_000, max_turns=20, max_response_tokens=500)
+
+        self.assertEqual(window.truncated, 1)
+        self.assertLess(estimate_tokens(window.contents[-1]["parts"][0]["text"]), 520)
+        self.assertGreater(window.turns, 1)
+
+
+class _ScriptedAsyncModel:
+    """Asks for two searches in its first turn, then answers."""
+
+    def __init__(self):
+        self.turns = 0
+
+    async def generate_content_async(self, contents, tool_config=None):
+        self.turns += 1
+        if self.turns == 1:
+            parts = [
+                {'function_call': {'name': 'google_search', 'args': {'query': 'dead period'}}},
+                {'function_call': {'name': 'google_search', 'args': {'query': 'D1 rules'}}},
+            ]
+        else:
+            parts = [{'text': f"Answer using {len(contents[-1].parts)} results"}]
+        return streaming.GenerationResponse.from_dict({'candidates': [{'content': {'role': 'model', 'parts': parts}}]})
+
+
+@override_settings(AGENT_ASYNC_ENABLED=True, AGENT_FAKE_MODEL=True, AGENT_FAKE_MODEL_CHUNK_INTERVAL=0)
+class AsyncAgentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        self.session = ChatSession.objects.create(user=self.user, title='Async')
+
+    @patch('recruiting.views.generate_title_and_summary')
+    async def test_async_view_returns_and_stores_reply(self, mock_title_task):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.post(
+            reverse('ask_agent_async'),
+            data=json.dumps({'prompt': 'When is the dead period?', 'session_id': str(self.session.id)}),
+            content_type='application/json',
+        )
+        # Titled and summarized after the first message, as on the Celery path.
+        mock_title_task.delay.assert_called_once_with(str(self.session.id))
+
+        data = response.json()
+        self.assertEqual(data['status'], 'SUCCESS')
+        self.assertIn('When is the dead period?', data['response'])
+        conversation = await Conversation.objects.aget(pk=data['conversation_id'])
+        self.assertEqual(conversation.session_id, self.session.id)
+
+    @override_settings(AGENT_ASYNC_ENABLED=False)
+    async def test_disabled_by_default(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.post(reverse('ask_agent_async'), data='{}', content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_tool_calls_run_concurrently_on_the_loop(self):
+        async def slow_search(query):
+            await asyncio.sleep(0.2)
+            return {"search_context": query}
+
+        with patch.dict(async_agent.ASYNC_TOOLS, {'google_search': slow_search}):
+            start = time.perf_counter()
+            reply = await async_agent.generate_reply(_ScriptedAsyncModel(), 'question', [])
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(reply, 'Answer using 2 results')
+        self.assertLess(elapsed, 0.35)
+
+    async def test_many_conversations_share_one_loop(self):
+        model = streaming.FakeStreamingModel(reply='one two three four five', chunk_words=1, interval=0.05)
+
+        start = time.perf_counter()
+        replies = await asyncio.gather(*(async_agent.generate_reply(model, 'hi', []) for _ in range(50)))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(set(replies), {'one two three four five'})
+        self.assertLess(elapsed, 1.0)
+
+
+class AnalyticsCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        self.session = ChatSession.objects.create(user=self.user, title='Counters')
+
+    def analytics(self):
+        return UserAnalytics.objects.get(user=self.user)
+
+    def add_message(self, text):
+        return Conversation.objects.create(session=self.session, user=self.user, prompt_text=text, response_text='ok')
+
+    def test_message_save_cost_is_constant(self):
+        # INSERT, analytics UPDATE, session stats UPDATE.
+        self.add_message('first')
+        with self.assertNumQueries(3):
+            self.add_message('short history')
+        for _ in range(30):
+            self.add_message('x')
+        with self.assertNumQueries(3):
+            self.add_message('long history')
+
+    def test_average_is_kept_from_running_sum(self):
+        self.add_message('aaaa')
+        self.add_message('bb')
+
+        analytics = self.analytics()
+        self.assertEqual(analytics.total_messages_sent, 2)
+        self.assertEqual(analytics.total_message_chars, 6)
+        self.assertEqual(analytics.avg_message_length, 3)
+        self.assertEqual(analytics.total_sessions, 1)
+
+    def test_action_item_completion_toggles(self):
+        item = ActionItem.objects.create(user=self.user, description='Email coaches')
+        item = ActionItem.objects.get(pk=item.pk)
+        item.is_complete = True
+        item.save()
+        item.save()
+        self.assertEqual((self.analytics().action_items_created, self.analytics().action_items_completed), (1, 1))
+
+        item.is_complete = False
+        item.save()
+        self.assertEqual(self.analytics().action_items_completed, 0)
+
+        ActionItem.objects.filter(pk=item.pk).update(is_complete=True)
+        ActionItem.objects.get(pk=item.pk).delete()
+        self.assertEqual((self.analytics().action_items_created, self.analytics().action_items_completed), (0, 0))
+
+    def test_reconciliation_recounts_drift(self):
+        self.add_message('hello')
+        ActionItem.objects.create(user=self.user, description='Film', is_complete=True)
+        UserAnalytics.objects.filter(user=self.user).update(
+            total_messages_sent=40, action_items_completed=0, session_count_last_7_days=9
+        )
+
+        self.assertEqual(reconcile_user_analytics(), 1)
+        analytics = self.analytics()
+        self.assertEqual(analytics.total_messages_sent, 1)
+        self.assertEqual(analytics.avg_message_length, 5)
+        self.assertEqual(analytics.action_items_completed, 1)
+        self.assertEqual(analytics.session_count_last_7_days, 1)
+        self.assertEqual(reconcile_user_analytics(), 0)
+
+
+@override_settings(ANALYTICS_WRITE_BEHIND=True)
+class AnalyticsWriteBehindTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        patcher = patch('recruiting.redis_client.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        analytics_buffer.flush_analytics_buffer()  # as beat would have, starting the heartbeat
+        self.users = [User.objects.create_user(username=f'athlete{i}', password='pw') for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sessions = [ChatSession.objects.create(user=user, title='Buffered') for user in self.users]
+
+    def send(self, index, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            Conversation.objects.create(
+                session=self.sessions[index], user=self.users[index], prompt_text=text, response_text='ok'
+            )
+
+    def counts(self, index):
+        analytics = UserAnalytics.objects.filter(user=self.users[index]).first()
+        if analytics is None:
+            return None
+        return analytics.total_messages_sent, analytics.avg_message_length, analytics.total_sessions
+
+    def test_saves_only_touch_redis_until_flush(self):
+        # INSERT and the session stats UPDATE; no analytics query.
+        with self.assertNumQueries(2):
+            self.send(0, 'aaaa')
+        self.send(0, 'bb')
+        self.send(1, 'hello')
+        self.assertIsNone(self.counts(0))
+
+        self.assertEqual(analytics_buffer.flush_analytics_buffer(), 3)
+        self.assertEqual(self.counts(0), (2, 3, 1))
+        self.assertEqual(self.counts(1), (1, 5, 1))
+        self.assertEqual(self.counts(2), (0, 0, 1))
+        self.assertEqual(self.redis.keys('analytics:*'), [analytics_buffer.HEARTBEAT_KEY])
+
+    def test_rolled_back_saves_are_never_buffered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Conversation.objects.create(
+                    session=self.sessions[0], user=self.users[0], prompt_text='lost', response_text='ok'
+                )
+                raise RuntimeError('import batch failed')
+        self.assertIsNone(self.redis.hget(analytics_buffer.DELTAS_KEY.format(user_id=self.users[0].id), 'total_messages_sent'))
+        analytics_buffer.flush_analytics_buffer()
+        self.assertEqual(self.counts(0), (0, 0, 1))
+
+    def test_errors_while_applying_keep_the_batch_pending(self):
+        self.send(0, 'hello')
+        with patch('recruiting.analytics_buffer._apply_rows', side_effect=IntegrityError('bad row')):
+            with self.assertRaises(IntegrityError):
+                analytics_buffer.flush_analytics_buffer()
+        self.assertEqual(len(self.redis.smembers(analytics_buffer.PENDING_KEY)), 1)
+        analytics_buffer.flush_analytics_buffer()
+        self.assertEqual(self.counts(0)[0], 1)
+
+    def test_writes_through_when_flushes_stop(self):
+        self.redis.delete(analytics_buffer.HEARTBEAT_KEY)
+        self.send(0, 'aaaa')
+        # The message went straight to the row; the session, buffered in setUp, waits for a flush.
+        self.assertEqual(self.counts(0), (1, 4, 0))
+
+    def test_flush_is_bulk(self):
+        for i in range(3):
+            self.send(i, 'hi')
+        analytics_buffer.flush_analytics_buffer()
+        for i in range(3):
+            self.send(i, 'again')
+        # Marker check, savepoint, batch insert, existing-row lookup, one CASE update, release.
+        with self.assertNumQueries(6):
+            analytics_buffer.flush_analytics_buffer()
+
+    def test_crash_before_commit_is_retried(self):
+        self.send(0, 'hello')
+        with patch('recruiting.analytics_buffer._apply_rows', side_effect=RuntimeError('worker died')):
+            with self.assertRaises(RuntimeError):
+                analytics_buffer.flush_analytics_buffer()
+        self.send(0, 'again')
+
+        analytics_buffer.flush_analytics_buffer()
+        self.assertEqual(self.counts(0)[0], 2)
+
+    def test_crash_after_commit_is_not_applied_twice(self):
+        self.send(0, 'hello')
+        with patch('recruiting.analytics_buffer._discard_batch', side_effect=RuntimeError('worker died')):
+            with self.assertRaises(RuntimeError):
+                analytics_buffer.flush_analytics_buffer()
+        self.assertEqual(self.counts(0)[0], 1)
+
+        analytics_buffer.flush_analytics_buffer()
+        self.assertEqual(self.counts(0)[0], 1)
+        self.assertEqual(AnalyticsFlushBatch.objects.count(), 1)
+        self.assertFalse(self.redis.smembers(analytics_buffer.PENDING_KEY))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        self.client.force_login(self.user)
+        self.session = ChatSession.objects.create(user=self.user, title='Paged')
+        for i in range(7):
+            Conversation.objects.create(
+                session=self.session, user=self.user, prompt_text=f"q{i}", response_text=f"a{i}"
+            )
+
+    def history(self, **params):
+        url = reverse('get_session_history', args=[self.session.id])
+        return self.client.get(url, params).json()
+
+    @staticmethod
+    def prompts(data):
+        return [m['text'] for m in data['history'] if m['type'] == 'user']
+
+    def test_latest_page_then_older_pages(self):
+        latest = self.history(limit=3)
+        self.assertEqual(self.prompts(latest), ['q4', 'q5', 'q6'])
+
+        older = self.history(limit=3, before=latest['cursors']['before'])
+        self.assertEqual(self.prompts(older), ['q1', 'q2', 'q3'])
+
+        oldest = self.history(limit=3, before=older['cursors']['before'])
+        self.assertEqual(self.prompts(oldest), ['q0'])
+        self.assertIsNone(oldest['cursors']['before'])
+
+    def test_after_cursor_returns_only_the_new_exchange(self):
+        cursor = self.history()['cursors']['after']
+        Conversation.objects.create(session=self.session, user=self.user, prompt_text='q7', response_text='a7')
+
+        delta = self.history(after=cursor)
+        self.assertEqual(self.prompts(delta), ['q7'])
+        self.assertEqual(delta['history'][1]['text'], 'a7')
+
+        unchanged = self.history(after=delta['cursors']['after'])
+        self.assertEqual(unchanged['history'], [])
+        self.assertEqual(unchanged['cursors']['after'], delta['cursors']['after'])
+
+    def test_session_pages_and_count(self):
+        for i in range(4):
+            ChatSession.objects.create(user=self.user, title=f'Chat {i}')
+        first = self.client.get(reverse('get_chat_sessions'), {'limit': 3}).json()
+        second = self.client.get(reverse('get_chat_sessions'), {'limit': 3, 'cursor': first['next_cursor']}).json()
+
+        self.assertEqual(first['count'], 5)
+        self.assertNotIn('count', second)
+        self.assertIsNone(second['next_cursor'])
+        ids = [s['id'] for s in first['sessions'] + second['sessions']]
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('get_chat_sessions'), {'cursor': 'nope'}).status_code, 400)
+        # Well-formed, but the pk half is not a UUID (ChatSession's pk).
+        tampered = encode_cursor(datetime(2024, 1, 1), 'x')
+        self.assertEqual(self.client.get(reverse('get_chat_sessions'), {'cursor': tampered}).status_code, 400)
+
+
+class SoftDeleteStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        self.client.force_login(self.user)
+        for i in range(3):
+            LedgerEntry.objects.create(user=self.user, title=f'Live {i}', content='c')
+        LedgerEntry.objects.create(user=self.user, title='Gone', content='c', is_deleted=True)
+        ActionItem.objects.create(user=self.user, description='todo')
+        ActionItem.objects.create(user=self.user, description='done', is_complete=True)
+        ActionItem.objects.create(user=self.user, description='dropped', is_deleted=True)
+
+    def test_default_manager_hides_deleted_rows(self):
+        self.assertEqual(LedgerEntry.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(LedgerEntry.all_objects.filter(user=self.user).count(), 4)
+        self.assertEqual(ActionItem.objects.filter(user=self.user).count(), 2)
+
+    def test_status_scoped_pages(self):
+        items = lambda status: [
+            item['description'] for item in
+            self.client.get(reverse('action_items_list'), {'status': status}).json()['items']
+        ]
+        self.assertEqual(items('active'), ['todo'])
+        self.assertEqual(items('completed'), ['done'])
+        self.assertEqual(items('deleted'), ['dropped'])
+
+        deleted = self.client.get(reverse('ledger_list'), {'status': 'deleted'}).json()
+        self.assertEqual([entry['title'] for entry in deleted['entries']], ['Gone'])
+
+    def test_ledger_cursor_paging(self):
+        first = self.client.get(reverse('ledger_list'), {'limit': 2}).json()
+        second = self.client.get(reverse('ledger_list'), {'limit': 2, 'cursor': first['next_cursor']}).json()
+        self.assertEqual([entry['title'] for entry in first['entries']], ['Live 2', 'Live 1'])
+        self.assertEqual([entry['title'] for entry in second['entries']], ['Live 0'])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_unknown_status(self):
+        self.assertEqual(self.client.get(reverse('ledger_list'), {'status': 'archived'}).status_code, 400)
+
+    def test_repeated_delete_is_idempotent(self):
+        entry = LedgerEntry.objects.filter(user=self.user).first()
+        item = ActionItem.objects.get(description='todo')
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('delete_ledger_entry', args=[entry.id])).status_code, 200)
+            self.assertEqual(self.client.post(reverse('delete_action_item', args=[item.id])).status_code, 200)
+        self.assertTrue(LedgerEntry.all_objects.get(pk=entry.pk).is_deleted)
+        self.assertTrue(ActionItem.all_objects.get(pk=item.pk).is_deleted)
+
+    def test_reset_removes_soft_deleted_rows(self):
+        self.client.post(
+            reverse('reset_my_data'), json.dumps({'confirmation': 'athlete'}), content_type='application/json'
+        )
+        self.assertFalse(LedgerEntry.all_objects.filter(user=self.user).exists())
+        self.assertFalse(ActionItem.all_objects.filter(user=self.user).exists())
+
+
+class FamilyFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        family = FamilyAccount.objects.create(primary_email='family@example.com')
+        self.athlete = User.objects.create_user(username='athlete', password='pw')
+        self.parent = User.objects.create_user(username='parent', password='pw')
+        self.outsider = User.objects.create_user(username='outsider', password='pw')
+        FamilyMember.objects.create(family_account=family, user=self.athlete, role='athlete')
+        self.parent_member = FamilyMember.objects.create(family_account=family, user=self.parent, role='parent')
+        LedgerEntry.objects.create(user=self.athlete, family_account=family, title='Shared', content='c')
+        LedgerEntry.objects.create(user=self.athlete, title='Private', content='c')
+        LedgerEntry.objects.create(user=self.outsider, title='Other family', content='c')
+        self.family = family
+
+    def board(self, user):
+        self.client.force_login(user)
+        return [entry['title'] for entry in self.client.get(reverse('ledger_list')).json()['entries']]
+
+    def test_member_sees_own_and_shared_rows(self):
+        self.assertEqual(self.board(self.athlete), ['Private', 'Shared'])
+        self.assertEqual(self.board(self.parent), ['Shared'])
+        self.assertEqual(self.board(self.outsider), ['Other family'])
+
+    def test_permission_flag_hides_shared_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.parent_member.can_manage_ledger = False
+            self.parent_member.save()
+        self.assertEqual(self.board(self.parent), [])
+
+    def test_polling_hits_cache_until_a_member_writes(self):
+        self.board(self.parent)
+        with CaptureQueriesContext(connection) as queries:
+            self.board(self.parent)
+        self.assertFalse([q for q in queries if 'recruiting_ledgerentry' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LedgerEntry.objects.create(user=self.athlete, family_account=self.family, title='New', content='c')
+        self.assertEqual(self.board(self.parent), ['New', 'Shared'])
+
+    def test_family_shared_action_can_be_completed_by_member(self):
+        item = ActionItem.objects.create(user=self.athlete, family_account=self.family, description='Email coach')
+        self.client.force_login(self.parent)
+        response = self.client.post(reverse('toggle_action_item_complete', args=[item.id]))
+        self.assertTrue(response.json()['is_complete'])
+        self.client.force_login(self.outsider)
+        response = self.client.post(reverse('toggle_action_item_complete', args=[item.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class SessionStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        self.session = ChatSession.objects.create(user=self.user, title='Stats')
+
+    def add(self, prompt, response):
+        return Conversation.objects.create(
+            session=self.session, user=self.user, prompt_text=prompt, response_text=response
+        )
+
+    def test_messages_update_stats_and_ordering(self):
+        created_updated_at = self.session.updated_at
+        self.add('abc', 'de')
+        last = self.add('fg', 'hijk')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.message_count, 2)
+        self.assertEqual(self.session.total_prompt_chars, 5)
+        self.assertEqual(self.session.total_response_chars, 6)
+        self.assertEqual(self.session.last_message_at, last.timestamp)
+        self.assertGreater(self.session.updated_at, created_updated_at)
+
+    def test_delete_recomputes_last_message(self):
+        first = self.add('abc', 'de')
+        self.add('fg', 'hijk').delete()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.message_count, 1)
+        self.assertEqual(self.session.total_response_chars, 2)
+        self.assertEqual(self.session.last_message_at, first.timestamp)
+
+    def test_backfill_corrects_drift(self):
+        self.add('abc', 'de')
+        ChatSession.objects.update(message_count=0, total_prompt_chars=0, last_message_at=None)
+        self.assertEqual(backfill_session_stats(), 1)
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.message_count, self.session.total_prompt_chars), (1, 3))
+        self.assertEqual(backfill_session_stats(), 0)
+
+
+class SportCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sport = Sport.objects.create(name='Football', code='FOOTBALL')
+        self.qb = Position.objects.create(sport=self.sport, name='Quarterback', code='QB', abbreviation='QB')
+        MetricDefinition.objects.create(
+            sport=self.sport, name='Forty', code='forty', metric_type='TIME', unit='SECONDS', is_common=True, display_order=1
+        )
+        MetricDefinition.objects.create(
+            sport=self.sport, position=self.qb, name='Completion %', code='completion_pct',
+            metric_type='PERCENTAGE', unit='PERCENT',
+        )
+        catalog.invalidate_catalog()
+
+    def test_metrics_for_includes_common_metrics(self):
+        current = catalog.get_catalog()
+        self.assertEqual([m.code for m in current.metrics_for('FOOTBALL')], ['forty'])
+        self.assertEqual([m.code for m in current.metrics_for('FOOTBALL', 'QB')], ['forty', 'completion_pct'])
+        self.assertEqual(current.metrics_for('FOOTBALL', 'XX'), ())
+        self.assertEqual(current.position_by_code('FOOTBALL', 'QB').id, self.qb.id)
+
+    def test_records_are_immutable(self):
+        record = catalog.get_catalog().sport_by_code('FOOTBALL')
+        self.assertFalse(hasattr(record, '__dict__'))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            record.name = 'Soccer'
+
+    def test_str_reads_names_from_catalog(self):
+        catalog.get_catalog()
+        position = Position.objects.get(pk=self.qb.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(position), 'Football - Quarterback')
+
+    @override_settings(CATALOG_VERSION_CHECK_SECONDS=0)
+    def test_reloads_after_change_in_any_process(self):
+        catalog.get_catalog()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sport.name = 'Gridiron'
+            self.sport.save()
+        self.assertEqual(catalog.get_catalog().sport(self.sport.pk).name, 'Gridiron')
+
+        Sport.objects.filter(pk=self.sport.pk).update(name='American Football')
+        cache.incr(catalog.CATALOG_VERSION_KEY)  # as bumped by another process
+        self.assertEqual(catalog.get_catalog().sport(self.sport.pk).name, 'American Football')
+
+
+class MetricValidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sport = Sport.objects.create(name='Football', code='FOOTBALL')
+        self.qb = Position.objects.create(sport=sport, name='Quarterback', code='QB', abbreviation='QB')
+        MetricDefinition.objects.create(
+            sport=sport, name='Forty', code='forty', metric_type='TIME', unit='SECONDS',
+            min_value=4, max_value=7, is_required=True,
+        )
+        MetricDefinition.objects.create(
+            sport=sport, position=self.qb, name='Completion %', code='completion_pct',
+            metric_type='PERCENTAGE', unit='PERCENT', min_value=0, max_value=100,
+        )
+        catalog.invalidate_catalog()
+        user = User.objects.create_user(username='athlete', password='pw')
+        user_profile = UserProfile.objects.create(user=user)
+        self.sport_profile = SportProfile.objects.create(user_profile=user_profile, sport=sport)
+
+    def profile(self, metrics):
+        return PositionProfile(sport_profile=self.sport_profile, position=self.qb, metrics=metrics)
+
+    def test_batch_reports_each_kind_of_violation(self):
+        rows = [
+            (1, self.sport_profile.sport_id, self.qb.id, {'forty': '4.5', 'completion_pct': 64}),
+            (2, self.sport_profile.sport_id, self.qb.id, {'forty': 3.1, 'completion_pct': 'lots', 'arm': 9}),
+            (3, self.sport_profile.sport_id, self.qb.id, {'completion_pct': 140}),
+        ]
+        found = {(v.object_id, v.code, v.kind) for v in metric_validation.validate_batch(rows)}
+        self.assertEqual(found, {
+            (2, 'forty', metric_validation.OUT_OF_RANGE),
+            (2, 'completion_pct', metric_validation.NOT_NUMERIC),
+            (2, 'arm', metric_validation.UNKNOWN_CODE),
+            (3, 'completion_pct', metric_validation.OUT_OF_RANGE),
+            (3, 'forty', metric_validation.MISSING_REQUIRED),
+        })
+
+    def test_streams_queryset_in_chunks(self):
+        position_profile = self.profile({'forty': 5})
+        position_profile.save()
+        for i, forty in enumerate((5, 9, 6)):
+            PerformanceEntry.objects.create(
+                sport_profile=self.sport_profile, position_profile=position_profile,
+                date=f'2026-09-0{i + 1}', season='2026 Fall', metrics={'forty': forty},
+            )
+        violations = list(metric_validation.iter_violations(PerformanceEntry.objects.all(), chunk_size=2))
+        self.assertEqual([(v.code, v.kind, v.value) for v in violations], [('forty', 'out_of_range', 9)])
+
+    def test_partial_entries_and_undefined_scopes_pass(self):
+        position_profile = self.profile({'forty': 5})
+        position_profile.save()
+        entry = PerformanceEntry(sport_profile=self.sport_profile, position_profile=position_profile,
+                                 date='2026-09-01', season='2026 Fall', metrics={'completion_pct': 64})
+        entry.clean()  # forty is required on profiles, not on a single game
+        with self.assertRaises(ValidationError):
+            self.profile({'completion_pct': 64}).clean()
+
+        other = Sport.objects.create(name='Lacrosse', code='LACROSSE')
+        catalog.invalidate_catalog()
+        self.assertEqual(metric_validation.validate_metrics(other.id, None, {'goals': 3}), [])
+
+    def test_clean_reuses_compiled_bounds(self):
+        self.profile({'forty': 5}).clean()
+        with self.assertNumQueries(0):
+            with self.assertRaises(ValidationError):
+                self.profile({'forty': 12}).clean()
+
+
+class MetricTrendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sport = Sport.objects.create(name='Football', code='FOOTBALL')
+        MetricDefinition.objects.create(
+            sport=self.sport, name='Forty', code='forty', metric_type='TIME', unit='SECONDS'
+        )
+        catalog.invalidate_catalog()
+        user = User.objects.create_user(username='athlete', password='pw')
+        user_profile = UserProfile.objects.create(user=user)
+        self.sport_profile = SportProfile.objects.create(user_profile=user_profile, sport=self.sport)
+
+    def add(self, day, season, **metrics):
+        return PerformanceEntry.objects.create(
+            sport_profile=self.sport_profile, date=day, season=season, metrics=metrics
+        )
+
+    def summary(self, code):
+        return MetricTrendSummary.objects.get(sport_profile=self.sport_profile, metric_code=code)
+
+    def test_incremental_summary_matches_rebuild(self):
+        self.add('2026-09-01', 'Fall', forty=4.9, vertical=30)
+        self.add('2026-09-15', 'Fall', forty=4.7, vertical='31')
+        self.add('2026-08-20', 'Summer', forty=5.0)
+        self.add('2026-10-01', 'Fall', forty=4.8, vertical=33)
+        incremental = self.summary('forty')
+
+        self.assertTrue(incremental.lower_is_better)
+        self.assertEqual((incremental.best_value, str(incremental.best_date)), (4.7, '2026-09-15'))
+        self.assertEqual((incremental.latest_value, str(incremental.latest_date)), (4.8, '2026-10-01'))
+        self.assertGreater(incremental.season_rates['Fall'], 0)  # times dropping: improving
+        self.assertIsNone(incremental.season_rates['Summer'])
+
+        trends.rebuild_summaries(self.sport_profile.id)
+        rebuilt = self.summary('forty')
+        for field in ('entry_count', 'best_value', 'best_date', 'latest_value', 'recent_values'):
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field), field)
+        self.assertAlmostEqual(rebuilt.variance, incremental.variance)
+        self.assertAlmostEqual(rebuilt.rolling_average, incremental.rolling_average)
+        self.assertAlmostEqual(rebuilt.season_rates['Fall'], incremental.season_rates['Fall'])
+        self.assertEqual(self.summary('vertical').best_value, 33)
+
+    def test_new_entry_cost_is_constant(self):
+        self.add('2026-09-01', 'Fall', forty=4.9)
+        entry = PerformanceEntry(
+            sport_profile=self.sport_profile, date='2026-09-08', season='Fall', metrics={'forty': 4.8}
+        )
+        # INSERT, then a savepoint around the summary insert-if-missing, locked read and
+        # update, then the entry's typed MetricValue insert.
+        with self.assertNumQueries(7):
+            entry.save()
+
+    def test_delete_rebuilds(self):
+        self.add('2026-09-01', 'Fall', forty=4.9)
+        self.add('2026-09-08', 'Fall', forty=4.6).delete()
+        self.assertEqual(self.summary('forty').best_value, 4.9)
+        self.assertEqual(self.summary('forty').entry_count, 1)
+
+
+class PercentileIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        for name, client in (('get_redis', self.redis), ('get_binary_redis', fakeredis.FakeRedis(server=server))):
+            patcher = patch(f'recruiting.redis_client.{name}', return_value=client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.use_directory()
+
+        self.sport = Sport.objects.create(name='Football', code='FOOTBALL')
+        self.wr = Position.objects.create(sport=self.sport, name='Wide Receiver', code='WR', abbreviation='WR')
+        self.qb = Position.objects.create(sport=self.sport, name='Quarterback', code='QB', abbreviation='QB')
+        MetricDefinition.objects.create(
+            sport=self.sport, name='Forty', code='forty', metric_type='TIME', unit='SECONDS'
+        )
+        catalog.invalidate_catalog()
+
+    def use_directory(self):
+        """A fresh local index directory, as on another host."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PERCENTILE_INDEX_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        percentiles._index = None
+
+    def athlete(self, name, position, grad_year=2027, **metrics):
+        user_profile = UserProfile.objects.create(user=User.objects.create_user(username=name, password='pw'))
+        sport_profile = SportProfile.objects.create(
+            user_profile=user_profile, sport=self.sport, graduation_year=grad_year
+        )
+        return PositionProfile.objects.create(sport_profile=sport_profile, position=position, metrics=metrics)
+
+    def test_percentiles_respect_metric_direction(self):
+        for i, (forty, vertical) in enumerate([(4.4, 38), (4.6, 34), (4.6, 30), (4.9, 28)]):
+            self.athlete(f'wr{i}', self.wr, forty=forty, vertical=vertical)
+        self.athlete('other-class', self.wr, grad_year=2028, forty=4.2)
+        self.athlete('undeclared', self.wr, grad_year=None, forty=4.1)
+        self.assertEqual(percentiles.build_index(), 3)
+
+        index = percentiles.get_index()
+        fastest = index.standing('FOOTBALL', 'WR', 2027, 'forty', 4.4)
+        self.assertEqual((fastest.percentile, fastest.rank, fastest.cohort_size), (87.5, 1, 4))
+        tied = index.standing('FOOTBALL', 'WR', 2027, 'forty', 4.6)
+        self.assertEqual((tied.percentile, tied.rank), (50.0, 2))
+        self.assertEqual(index.standing('FOOTBALL', 'WR', 2027, 'vertical', 38).percentile, 87.5)
+        self.assertEqual(index.top('FOOTBALL', 'WR', 2027, 'forty', n=2), [4.4, 4.6])
+        self.assertEqual(index.top('FOOTBALL', 'WR', 2027, 'vertical', n=2), [38, 34])
+        self.assertIsNone(index.standing('FOOTBALL', 'QB', 2027, 'forty', 4.4))
+
+    def test_incremental_build_rewrites_only_dirty_cohorts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = self.athlete('wr', self.wr, forty=4.6)
+            self.athlete('qb', self.qb, forty=4.8)
+        percentiles.build_index(full=True)
+        self.assertEqual(self.redis.scard(percentiles.DIRTY_KEY), 0)
+        self.assertIsNone(percentiles.build_index())
+        old_index = percentiles.get_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.athlete('wr2', self.wr, forty=4.4)
+        self.assertEqual(percentiles.build_index(), 1)
+        index = percentiles.get_index()
+        self.assertNotEqual(index.path, old_index.path)
+        self.assertEqual(index.standing('FOOTBALL', 'WR', 2027, 'forty', 4.4).cohort_size, 2)
+        self.assertEqual(index.standing('FOOTBALL', 'QB', 2027, 'forty', 4.8).cohort_size, 1)
+        # Readers of the previous generation keep their view.
+        self.assertEqual(old_index.standing('FOOTBALL', 'WR', 2027, 'forty', 4.4).cohort_size, 1)
+
+        # Moving a profile to another class requeues both cohorts.
+        sport_profile = SportProfile.objects.get(pk=moved.sport_profile_id)
+        sport_profile.graduation_year = 2028
+        with self.captureOnCommitCallbacks(execute=True):
+            sport_profile.save()
+        percentiles.build_index()
+        index = percentiles.get_index()
+        self.assertEqual(index.standing('FOOTBALL', 'WR', 2027, 'forty', 4.6).cohort_size, 1)
+        self.assertEqual(index.standing('FOOTBALL', 'WR', 2028, 'forty', 4.6).cohort_size, 1)
+
+    def test_index_built_by_the_worker_is_readable_on_another_host(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.athlete('wr', self.wr, forty=4.6)
+            self.athlete('qb', self.qb, forty=4.8)
+        for _ in range(percentiles.KEEP_GENERATIONS + 1):
+            percentiles.build_index(full=True)
+        self.use_directory()
+        index = percentiles.get_index()
+        self.assertEqual(index.standing('FOOTBALL', 'QB', 2027, 'forty', 4.8).cohort_size, 1)
+        self.assertEqual(os.path.dirname(index.path), settings.PERCENTILE_INDEX_DIR)
+        # Older generations are unpublished; arrays still referenced survive.
+        self.assertEqual(self.redis.llen(percentiles.GENERATIONS_KEY), percentiles.KEEP_GENERATIONS)
+        self.assertEqual(len(self.redis.keys(percentiles.ARRAY_KEY.format(file='*'))), 2)
+
+
+class PerformanceImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sport = Sport.objects.create(name='Basketball', code='BASKETBALL')
+        self.guard = Position.objects.create(sport=self.sport, name='Point Guard', code='PG')
+        MetricDefinition.objects.create(
+            sport=self.sport, name='Points', code='points', metric_type='COUNT', unit='COUNT', min_value=0, max_value=100
+        )
+        MetricDefinition.objects.create(
+            sport=self.sport, position=self.guard, name='Assists', code='assists', metric_type='COUNT', unit='COUNT'
+        )
+        catalog.invalidate_catalog()
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        user_profile = UserProfile.objects.create(user=self.user)
+        self.sport_profile = SportProfile.objects.create(user_profile=user_profile, sport=self.sport)
+        PositionProfile.objects.create(sport_profile=self.sport_profile, position=self.guard)
+        stranger = UserProfile.objects.create(user=User.objects.create_user(username='stranger', password='pw'))
+        self.other_profile = SportProfile.objects.create(user_profile=stranger, sport=self.sport)
+
+    CSV = (
+        'date,season,opponent,position,points[COUNT],assists\n'
+        '2026-01-05,2025-26,Central,PG,21,7\n'
+        '2026-01-09,2025-26,North,,140,\n'        # points out of range
+        'not-a-date,2025-26,South,,12,\n'         # bad date
+        '2026-01-16,2025-26,East,,18,\n'
+        '2026-01-20,2025-26,West,,9,4\n'          # assists is a guard metric: unknown without a position
+    )
+
+    def test_valid_rows_are_bulk_written_and_invalid_ones_reported(self):
+        importer = PerformanceImporter(default_sport_profile_id=self.sport_profile.id, batch_size=2)
+        result = importer.run(io.StringIO(self.CSV))
+
+        self.assertEqual((result.created, result.skipped, result.last_line), (2, 3, 6))
+        self.assertEqual([(error.line, error.field) for error in result.errors],
+                         [(3, 'points'), (4, 'date'), (6, 'assists')])
+        entries = PerformanceEntry.objects.filter(sport_profile=self.sport_profile).order_by('date')
+        self.assertEqual([entry.metrics for entry in entries], [{'points': 21, 'assists': 7}, {'points': 18}])
+        self.assertIsNotNone(entries[0].position_profile_id)
+        self.assertEqual(MetricValue.objects.filter(performance_entry__in=entries).count(), 3)
+        # Signals are bypassed, so the import rebuilds the trend summaries itself.
+        self.assertEqual(MetricTrendSummary.objects.get(sport_profile=self.sport_profile, metric_code='points').entry_count, 2)
+
+    def test_dry_run_writes_nothing_and_resume_skips_committed_lines(self):
+        dry = PerformanceImporter(default_sport_profile_id=self.sport_profile.id, dry_run=True)
+        self.assertEqual(dry.run(io.StringIO(self.CSV)).created, 2)
+        self.assertFalse(PerformanceEntry.objects.exists())
+
+        resumed = PerformanceImporter(default_sport_profile_id=self.sport_profile.id).run(
+            io.StringIO(self.CSV), start_line=4
+        )
+        self.assertEqual((resumed.rows_read, resumed.created), (2, 1))
+        self.assertEqual(PerformanceEntry.objects.get().opponent, 'East')
+
+    def test_jsonl_units_and_sport_profile_scope(self):
+        lines = [
+            {'sport_profile': self.sport_profile.id, 'result_type': 'AWARD', 'competition_name': 'All-State',
+             'competition_level': 'State', 'date': '2026-03-01', 'description': 'First team'},
+            {'sport_profile': self.other_profile.id, 'result_type': 'AWARD', 'competition_name': 'All-State',
+             'competition_level': 'State', 'date': '2026-03-01', 'description': 'Not theirs'},
+        ]
+        stream = io.StringIO('\n'.join(json.dumps(line) for line in lines) + '\n{broken\n')
+        profiles = SportProfile.objects.filter(user_profile__user=self.user)
+        result = PerformanceImporter(COMPETITION, sport_profiles=profiles).run(stream, 'jsonl')
+        self.assertEqual(result.created, 1)
+        self.assertEqual([(error.line, error.field) for error in result.errors], [(2, 'sport_profile'), (3, '')])
+        self.assertEqual(CompetitionResult.objects.get().sport_profile, self.sport_profile)
+
+        stream = io.StringIO(json.dumps({'date': '2026-01-05', 'season': '2025-26',
+                                         'metrics': {'points': {'value': 20, 'unit': 'SECONDS'}}}))
+        result = PerformanceImporter(default_sport_profile_id=self.sport_profile.id).run(stream, 'jsonl')
+        self.assertEqual(result.errors[0].message, 'Expected unit COUNT, got SECONDS.')
+
+    def test_upload_endpoint_imports_into_own_profile(self):
+        client = Client()
+        client.login(username='athlete', password='pw')
+        upload = SimpleUploadedFile('games.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+        response = client.post(reverse('import_performances'), {'file': upload})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['skipped'], data['last_line']), (2, 3, 6))
+        self.assertEqual(data['errors'][0], {'line': 3, 'field': 'points', 'message': 'Expected between 0 and 100.'})
+        self.assertEqual(PerformanceEntry.objects.filter(sport_profile=self.sport_profile).count(), 2)
+
+    def test_upload_endpoint_needs_edit_permission_and_an_unambiguous_profile(self):
+        family = FamilyAccount.objects.create(primary_email='family@example.com')
+        self.sport_profile.family_account = family
+        self.sport_profile.save()
+        parent = User.objects.create_user(username='parent', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            member = FamilyMember.objects.create(
+                family_account=family, user=parent, role='parent', can_edit_profile=False
+            )
+        csv_row = 'sport_profile,date,season,points\n%s,2026-01-05,2025-26,10\n' % self.sport_profile.id
+
+        def upload(content):
+            self.client.force_login(parent)
+            return self.client.post(reverse('import_performances'), {
+                'file': SimpleUploadedFile('games.csv', content.encode('utf-8'), content_type='text/csv'),
+            }).json()
+
+        self.assertEqual(upload(csv_row)['errors'][0]['field'], 'sport_profile')
+        with self.captureOnCommitCallbacks(execute=True):
+            member.can_edit_profile = True
+            member.save()
+        self.assertEqual(upload(csv_row)['created'], 1)
+
+        # A second editable profile: rows without one are no longer guessed.
+        SportProfile.objects.create(user_profile=UserProfile.objects.create(user=parent), sport=self.sport)
+        data = upload('date,season,points\n2026-01-06,2025-26,11\n')
+        self.assertEqual((data['created'], data['errors'][0]['field']), (0, 'sport_profile'))
+
+
+class AthleteSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch('recruiting.redis_client.get_redis', return_value=fakeredis.FakeRedis(decode_responses=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.football = Sport.objects.create(name='Football', code='FOOTBALL')
+        self.soccer = Sport.objects.create(name='Soccer', code='SOCCER')
+        self.qb = Position.objects.create(sport=self.football, name='Quarterback', code='QB')
+        self.wr = Position.objects.create(sport=self.football, name='Wide Receiver', code='WR')
+        MetricDefinition.objects.create(
+            sport=self.football, name='Forty', code='forty', metric_type='TIME', unit='SECONDS'
+        )
+        catalog.invalidate_catalog()
+        self.athletes = [
+            self.athlete('qb1', 'TX', 2026, '3.80', self.qb, forty='4.7'),
+            self.athlete('qb2', 'tx', 2026, '3.10', self.qb, forty=4.9),
+            self.athlete('qb3', 'CA', 2026, '3.90', self.qb, forty='fast'),
+            self.athlete('wr1', 'TX', 2027, '3.50', self.wr, forty=4.4),
+        ]
+        self.coach = User.objects.create_user(username='coach', password='pw')
+        family = FamilyAccount.objects.create(primary_email='recruiting@example.com')
+        FamilyMember.objects.create(family_account=family, user=self.coach, role='coach')
+
+    def athlete(self, name, state, year, gpa, position, **metrics):
+        user_profile = UserProfile.objects.create(
+            user=User.objects.create_user(username=name, password='pw'), state=state
+        )
+        sport_profile = SportProfile.objects.create(
+            user_profile=user_profile, sport=self.football, graduation_year=year, gpa=gpa
+        )
+        PositionProfile.objects.create(sport_profile=sport_profile, position=position, metrics=metrics)
+        return sport_profile
+
+    def search(self, query, **kwargs):
+        filters = athlete_search.SearchFilters.from_query(QueryDict(query))
+        results, cursor = athlete_search.search(filters, **kwargs)
+        return [row['name'] for row in results], cursor
+
+    def test_structured_and_metric_filters(self):
+        catalog.get_catalog()
+        with self.assertNumQueries(2):
+            names, _ = self.search('sport=football&position=qb&grad_year=2026&state=TX')
+        self.assertEqual(names, ['qb1', 'qb2'])
+        self.assertEqual(self.search('sport=FOOTBALL&gpa_min=3.5&gpa_max=3.85')[0], ['qb1', 'wr1'])
+        # String-stored metric values compare as numbers; non-numeric ones never match.
+        self.assertEqual(self.search('sport=FOOTBALL&metric=forty:lte:4.8')[0], ['qb1', 'wr1'])
+        self.assertEqual(self.search('sport=FOOTBALL&position=QB&metric=forty:gte:4.8')[0], ['qb2'])
+        self.assertEqual(self.search('sport=HOCKEY')[0], [])
+        # A code with no definition yet is read from the metrics JSON.
+        PositionProfile.objects.filter(sport_profile=self.athletes[3]).update(metrics={'shuttle': '4.1'})
+        self.assertEqual(self.search('sport=FOOTBALL&metric=shuttle:lte:4.2')[0], ['wr1'])
+        with self.assertRaises(athlete_search.InvalidSearch):
+            self.search('metric=forty:between:4')
+
+    def test_keyset_pages_and_cached_facets(self):
+        first, cursor = self.search('sport=FOOTBALL', limit=3)
+        rest, end = self.search('sport=FOOTBALL', limit=3, cursor=cursor)
+        self.assertEqual((first + rest, end), (['qb1', 'qb2', 'qb3', 'wr1'], None))
+
+        filters = athlete_search.SearchFilters.from_query(QueryDict('sport=FOOTBALL&grad_year=2026&position=QB'))
+        facets = athlete_search.facet_counts(filters)
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['state'], {'TX': 2, 'CA': 1})
+        self.assertEqual(facets['position'], {'QB': 3})
+        self.assertEqual(facets['graduation_year'], {2026: 3})
+        with self.assertNumQueries(0):
+            athlete_search.facet_counts(filters)
+
+        # A change in another sport leaves the cached counts alone; one in football refreshes them.
+        with self.captureOnCommitCallbacks(execute=True):
+            athlete_search.invalidate_facets([self.soccer.id])
+        with self.assertNumQueries(0):
+            athlete_search.facet_counts(filters)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.athlete('qb4', 'CA', 2026, '3.00', self.qb)
+        self.assertEqual(athlete_search.facet_counts(filters)['state'], {'TX': 2, 'CA': 2})
+
+    def test_endpoint_is_limited_to_coaches_and_staff(self):
+        client = Client()
+        client.login(username='qb1', password='pw')
+        self.assertEqual(client.get(reverse('search_athletes'), {'sport': 'FOOTBALL'}).status_code, 403)
+
+        client.login(username='coach', password='pw')
+        response = client.get(reverse('search_athletes'), {'sport': 'FOOTBALL', 'state': 'TX', 'limit': 1})
+        data = response.json()
+        self.assertEqual([row['name'] for row in data['results']], ['qb1'])
+        self.assertEqual(data['results'][0]['positions'], ['QB'])
+        self.assertEqual(data['facets']['total'], 3)
+        page = client.get(reverse('search_athletes'), {'sport': 'FOOTBALL', 'state': 'TX', 'cursor': data['next_cursor']})
+        self.assertNotIn('facets', page.json())
+        self.assertEqual(client.get(reverse('search_athletes'), {'cursor': 'junk'}).status_code, 400)
+
+
+class MetricValueStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sport = Sport.objects.create(name='Football', code='FOOTBALL')
+        self.wr = Position.objects.create(sport=self.sport, name='Wide Receiver', code='WR')
+        self.forty = MetricDefinition.objects.create(
+            sport=self.sport, name='Forty', code='forty', metric_type='TIME', unit='SECONDS'
+        )
+        self.vertical = MetricDefinition.objects.create(
+            sport=self.sport, position=self.wr, name='Vertical', code='vertical', metric_type='DISTANCE', unit='INCHES'
+        )
+        catalog.invalidate_catalog()
+        self.profiles = [self.athlete(f'wr{i}') for i in range(3)]
+
+    def athlete(self, name):
+        user_profile = UserProfile.objects.create(user=User.objects.create_user(username=name, password='pw'))
+        return SportProfile.objects.create(user_profile=user_profile, sport=self.sport)
+
+    def values(self, **source):
+        return dict(
+            MetricValue.objects.filter(**source).values_list('metric_definition__code', 'canonical_value')
+        )
+
+    def test_values_follow_saves_in_canonical_units(self):
+        profile = PositionProfile.objects.create(
+            sport_profile=self.profiles[0], position=self.wr, metrics={'forty': '4.5', 'vertical': 36, 'notes': 'x'}
+        )
+        values = self.values(position_profile=profile)
+        self.assertEqual(values['forty'], 4.5)
+        self.assertAlmostEqual(values['vertical'], 0.9144)
+        self.assertEqual(set(values), {'forty', 'vertical'})
+
+        profile.metrics = {'forty': '4.4'}
+        profile.save()
+        self.assertEqual(self.values(position_profile=profile), {'forty': 4.4})
+
+        entry = PerformanceEntry.objects.create(
+            sport_profile=self.profiles[0], position_profile=profile, date='2026-09-01', season='Fall',
+            metrics={'vertical': '3 ft'},
+        )
+        self.assertEqual(self.values(performance_entry=entry), {})
+        profile.delete()
+        self.assertFalse(MetricValue.objects.exists())
+
+    def test_backfill_and_ranking_read_the_typed_rows(self):
+        for sport_profile, forty in zip(self.profiles, ('4.6', 4.4, '4.5')):
+            PositionProfile.objects.create(sport_profile=sport_profile, position=self.wr, metrics={'forty': forty})
+        before = sorted(MetricValue.objects.values_list('position_profile_id', 'canonical_value'))
+        MetricValue.objects.all().delete()
+        self.assertEqual(metric_store.backfill('position', batch_size=2), (3, 3))
+        self.assertEqual(sorted(MetricValue.objects.values_list('position_profile_id', 'canonical_value')), before)
+
+        leaders = metric_store.ranking('FOOTBALL', 'forty', position_code='WR', limit=2)
+        self.assertEqual(leaders, [(self.profiles[1].id, 4.4), (self.profiles[2].id, 4.5)])
+        self.assertEqual(metric_store.ranking('FOOTBALL', 'missing'), [])
+
+    def test_definition_changes_resync_their_code(self):
+        profile = PositionProfile.objects.create(
+            sport_profile=self.profiles[0], position=self.wr, metrics={'forty': '4.5', 'shuttle': '4.2'}
+        )
+        self.assertEqual(self.values(position_profile=profile), {'forty': 4.5})
+        with patch('recruiting.tasks.resync_metric_values_task.delay', side_effect=metric_store.resync_code) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                shuttle = MetricDefinition.objects.create(
+                    sport=self.sport, name='Shuttle', code='shuttle', metric_type='TIME', unit='SECONDS'
+                )
+            self.assertEqual(self.values(position_profile=profile), {'forty': 4.5, 'shuttle': 4.2})
+
+            # Relabels leave the store alone; a unit change rewrites it.
+            shuttle = MetricDefinition.objects.get(pk=shuttle.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                shuttle.name = '20-yard shuttle'
+                shuttle.save()
+            self.assertEqual(delay.call_count, 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                shuttle.unit = 'MINUTES'
+                shuttle.save()
+            self.assertAlmostEqual(self.values(position_profile=profile)['shuttle'], 252.0)
+            with self.captureOnCommitCallbacks(execute=True):
+                shuttle.delete()
+            self.assertEqual(self.values(position_profile=profile), {'forty': 4.5})
+
+
+class TextSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        family = FamilyAccount.objects.create(primary_email='family@example.com')
+        self.athlete = User.objects.create_user(username='athlete', password='pw')
+        self.parent = User.objects.create_user(username='parent', password='pw')
+        outsider = User.objects.create_user(username='outsider', password='pw')
+        FamilyMember.objects.create(family_account=family, user=self.athlete, role='athlete')
+        FamilyMember.objects.create(family_account=family, user=self.parent, role='parent')
+        LedgerEntry.objects.create(
+            user=self.athlete, family_account=family, title='Camp schedule',
+            content='Email the coaches before the summer camps fill up.',
+        )
+        LedgerEntry.objects.create(user=self.athlete, title='Private', content='Coaching notes on the camp drills.')
+        LedgerEntry.objects.create(user=outsider, title='Camps', content='Summer camp budget.')
+        Conversation.objects.create(user=self.athlete, prompt_text='Which camps should I attend?', response_text='Go.')
+        Conversation.objects.create(user=self.parent, prompt_text='Camp costs?', response_text='It varies.')
+
+    def search(self, user, **params):
+        self.client.force_login(user)
+        return self.client.get(reverse('search'), params).json()
+
+    def test_results_are_stemmed_ranked_and_scoped(self):
+        data = self.search(self.athlete, q='camp')
+        self.assertEqual([entry['title'] for entry in data['ledger']], ['Camp schedule', 'Private'])
+        self.assertEqual([c['prompt'] for c in data['conversations']], ['Which camps should I attend?'])
+
+        data = self.search(self.parent, q='summer camps', type='ledger')
+        self.assertEqual([entry['title'] for entry in data['ledger']], ['Camp schedule'])
+        self.assertTrue(data['ledger'][0]['is_shared'])
+        self.assertNotIn('conversations', data)
+        self.assertEqual(self.search(self.parent, q='"unbalanced')['conversations'], [])
+
+        self.client.force_login(self.athlete)
+        self.assertEqual(self.client.get(reverse('search'), {'q': '  '}).status_code, 400)
+
+    def test_migrations_leave_the_index_in_place(self):
+        # A migration that rebuilds an indexed table on SQLite silently drops its triggers.
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 triggers are SQLite-only')
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+            objects = {row[0] for row in cursor.fetchall()}
+        for indexed in text_search.INDEXED_TABLES:
+            expected = {indexed.fts_table} | {f'{indexed.fts_table}_{suffix}' for suffix in ('ai', 'ad', 'au')}
+            self.assertEqual(expected - objects, set(), f'recreate the full-text triggers on {indexed.table}')
+
+    def test_index_follows_edits_and_deletes(self):
+        entry = LedgerEntry.objects.get(title='Private')
+        entry.content = 'Recruiting questionnaire answers.'
+        entry.save()
+        self.assertEqual([e['title'] for e in self.search(self.athlete, q='questionnaire')['ledger']], ['Private'])
+        self.assertEqual([e['title'] for e in self.search(self.athlete, q='drills')['ledger']], [])
+
+        entry.is_deleted = True
+        entry.save()
+        self.assertEqual(self.search(self.athlete, q='questionnaire')['ledger'], [])
+        LedgerEntry.all_objects.filter(pk=entry.pk).delete()
+        self.assertFalse(text_search.matching(LedgerEntry.all_objects.all(), 'questionnaire').exists())
+
+    def test_admin_search_uses_the_index(self):
+        admin_user = User.objects.create_superuser(username='admin', password='pw', email='admin@example.com')
+        self.client.force_login(admin_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:recruiting_ledgerentry_changelist'), {'q': 'coaches'})
+        self.assertContains(response, 'Camp schedule')
+        self.assertNotContains(response, 'Summer camp budget')
+        self.assertFalse([q for q in queries if '"recruiting_ledgerentry"."content" LIKE' in q['sql']])
+        self.assertTrue([q for q in queries if 'recruiting_ledgerentry_fts' in q['sql']])
+        response = self.client.get(reverse('admin:recruiting_conversation_changelist'), {'q': 'parent'})
+        self.assertContains(response, 'Camp costs?')
+
+
+class LedgerRetrievalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        family = FamilyAccount.objects.create(primary_email='family@example.com')
+        self.athlete = User.objects.create_user(username='athlete', password='pw')
+        self.parent = User.objects.create_user(username='parent', password='pw')
+        FamilyMember.objects.create(family_account=family, user=self.athlete, role='athlete')
+        FamilyMember.objects.create(family_account=family, user=self.parent, role='parent')
+        self.family = family
+        self.camp = LedgerEntry.objects.create(
+            user=self.athlete, family_account=family, title='Summer camps',
+            content='Pick two summer camps where the position coach from a target school is on staff.',
+        )
+        self.video = LedgerEntry.objects.create(
+            user=self.athlete, title='Highlight video', content='Keep the highlight video under four minutes.',
+        )
+        LedgerEntry.objects.create(user=self.parent, title='NCAA eligibility', content='Register with the eligibility center.')
+
+    def titles(self, matches):
+        entries = LedgerEntry.all_objects.in_bulk([entry_id for entry_id, _ in matches])
+        return [entries[entry_id].title for entry_id, _ in matches]
+
+    def test_top_k_is_scoped_and_follows_saves(self):
+        self.assertEqual(self.titles(ledger_retrieval.top_k(self.athlete, 'which camps should I go to?', 1)),
+                         ['Summer camps'])
+        self.assertEqual(self.titles(ledger_retrieval.top_k(self.parent, 'highlight video length')), [])
+        self.assertEqual(ledger_retrieval.top_k(self.athlete, 'the of and'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.video.content = 'Send the highlight video to every camp coach after the camp.'
+            self.video.save()
+            self.camp.is_deleted = True
+            self.camp.save(update_fields=['is_deleted'])
+        with self.assertNumQueries(2):  # both of the athlete's scopes were expired and are rebuilt
+            matches = ledger_retrieval.top_k(self.athlete, 'camp coach', 5)
+        self.assertEqual(self.titles(matches), ['Highlight video'])
+        with self.assertNumQueries(0):
+            ledger_retrieval.top_k(self.athlete, 'camp coach', 5)
+
+        # A parent's private entry leaves the athlete's scopes cached.
+        with self.captureOnCommitCallbacks(execute=True):
+            LedgerEntry.objects.create(user=self.parent, title='Visits', content='Plan official visits.')
+        with self.assertNumQueries(0):
+            ledger_retrieval.top_k(self.athlete, 'camp coach', 5)
+
+    def test_prompt_context_fits_the_token_budget(self):
+        lines = ledger_retrieval.ledger_context(self.athlete, 'summer camps and coaches', token_budget=20)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith('"Summer camps": Pick two'))
+        self.assertLessEqual(estimate_tokens(lines[0]), 20)
+
+        first, _ = _prepare_agent_call(self.athlete, 'Which summer camps matter?', None)
+        self.assertIn('"Summer camps": Pick two summer camps', first['call_context'])
+        call, _ = _prepare_agent_call(self.athlete, 'How do I negotiate scholarships?', first['chat_session'].id)
+        self.assertNotIn('Ledger earlier', call['call_context'])
+        # The system instruction is the same for every call, so the model instance is shared.
+        self.assertEqual(call['core_prompt'], first['core_prompt'])
+        self.assertNotIn('Summer camps', first['core_prompt'])
+
+    def test_related_insights_endpoint(self):
+        LedgerEntry.objects.create(
+            user=self.athlete, title='Camp follow-up', content='Email the position coach after each summer camp.',
+        )
+        self.client.force_login(self.athlete)
+        related = self.client.get(reverse('related_ledger_entries', args=[self.camp.id])).json()['related']
+        self.assertEqual([entry['title'] for entry in related], ['Camp follow-up'])
+
+        self.client.force_login(self.parent)
+        self.assertEqual(self.client.get(reverse('related_ledger_entries', args=[self.camp.id])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('related_ledger_entries', args=[self.video.id])).status_code, 404)
+
+
+class GenerateActionItemsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='athlete', password='pw')
+        UserProfile.objects.create(user=self.user)
+        self.entry = LedgerEntry.objects.create(user=self.user, title='Camps', content='Go to two summer camps.')
+        items = [{'description': f'Step {n}'} for n in range(5)] + [{'description': 'Step 0'}, {'description': ' '}]
+        self.model = MagicMock()
+        self.model.generate_content.return_value.text = '```json\n' + json.dumps(items) + '\n```'
+
+    def generate(self, content=None):
+        with patch('recruiting.tasks.get_model', return_value=self.model):
+            return generate_action_items_task.apply(
+                args=[self.user.id, self.entry.id, content or self.entry.content]
+            ).get()
+
+    def test_items_are_written_in_one_insert_with_one_analytics_update(self):
+        # Lookup, savepoint, entry lock, INSERT, entry key UPDATE, release,
+        # analytics UPDATE, and the (then cached) family membership for the
+        # board bump.
+        with self.assertNumQueries(8):
+            self.generate()
+        self.assertEqual(
+            list(ActionItem.objects.order_by('description').values_list('description', flat=True)),
+            [f'Step {n}' for n in range(5)],
+        )
+        self.assertEqual(UserAnalytics.objects.get(user=self.user).action_items_created, 5)
+
+    def test_retries_and_repeats_are_no_ops(self):
+        self.generate()
+        ActionItem.objects.filter(description='Step 0').update(is_deleted=True)
+        with self.assertNumQueries(1):
+            self.assertIn('already generated', self.generate())
+        self.assertEqual(self.model.generate_content.call_count, 1)
+        self.assertEqual(ActionItem.all_objects.count(), 5)
+        self.assertEqual(UserAnalytics.objects.get(user=self.user).action_items_created, 5)
+
+        # Edited content is a new generation.
+        self.generate(content='Go to three summer camps.')
+        self.assertEqual(ActionItem.all_objects.count(), 10)
+
+    def test_runs_without_usable_items_are_recorded(self):
+        for text in ('not json', '[{"description": " "}]'):
+            self.model.generate_content.reset_mock()
+            self.model.generate_content.return_value.text = text
+            content = f'Advice answered with {text}'
+            self.generate(content=content)
+            with self.assertNumQueries(1):
+                self.assertIn('already generated', self.generate(content=content))
+            self.assertEqual(self.model.generate_content.call_count, 1)
+        self.assertFalse(ActionItem.all_objects.exists())
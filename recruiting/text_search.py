@@ -0,0 +1,127 @@
+"""
+Full-text search over conversations (prompt and response) and Ledger entries
+(title and content).
+
+On PostgreSQL each table carries a generated `search_vector` tsvector column
+(titles and prompts weighted above bodies), maintained by the database on
+every write and served by a GIN index; queries go through
+websearch_to_tsquery and are ranked with ts_rank_cd. On SQLite, used for local
+development and tests, an external-content FTS5 table per model is kept in
+sync by triggers and ranked with bm25. Migration 0034 creates either; the
+models don't declare the column, so queries are built here.
+
+On SQLite, a later migration that rebuilds either table (most AlterField or
+RemoveField operations do) drops its triggers and must recreate them, as 0034
+does; TextSearchTests fails if they are missing.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from . import family_feed
+from .models import Conversation
+
+SEARCH_CONFIG = 'english'
+SNIPPET_CHARS = 160
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedTable:
+    table: str
+    primary: str    # weighted 'A' on PostgreSQL
+    secondary: str  # weighted 'B'
+
+    @property
+    def fts_table(self):
+        return f'{self.table}_fts'
+
+
+INDEXED_TABLES = (
+    IndexedTable('recruiting_conversation', 'prompt_text', 'response_text'),
+    IndexedTable('recruiting_ledgerentry', 'title', 'content'),
+)
+
+
+def _indexed(model):
+    for indexed in INDEXED_TABLES:
+        if indexed.table == model._meta.db_table:
+            return indexed
+    raise ValueError(f'{model.__name__} has no full-text index')
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def terms(text):
+    return re.findall(r'\w+', text or '')
+
+
+def _fts5_query(text):
+    # Every term quoted, so user input never reaches the FTS5 query syntax; terms are ANDed.
+    return ' '.join(f'"{term}"' for term in terms(text))
+
+
+def match_condition(model, text, using='default'):
+    """A boolean expression selecting model rows that match text."""
+    t = _indexed(model)
+    if connections[using].vendor == 'postgresql':
+        return RawSQL(
+            f""""{t.table}".search_vector @@ websearch_to_tsquery('{SEARCH_CONFIG}', %s)""",
+            [text], output_field=BooleanField(),
+        )
+    return RawSQL(
+        f'"{t.table}"."id" IN (SELECT rowid FROM "{t.fts_table}" WHERE "{t.fts_table}" MATCH %s)',
+        [_fts5_query(text)], output_field=BooleanField(),
+    )
+
+
+def rank_expression(model, text, using='default'):
+    """Relevance of a matching row; higher is better."""
+    t = _indexed(model)
+    if connections[using].vendor == 'postgresql':
+        return RawSQL(
+            f"""ts_rank_cd("{t.table}".search_vector, websearch_to_tsquery('{SEARCH_CONFIG}', %s))""",
+            [text], output_field=FloatField(),
+        )
+    return RawSQL(
+        f'(SELECT -bm25("{t.fts_table}") FROM "{t.fts_table}" '
+        f'WHERE "{t.fts_table}" MATCH %s AND rowid = "{t.table}"."id")',
+        [_fts5_query(text)], output_field=FloatField(),
+    )
+
+
+def matching(queryset, text):
+    """queryset narrowed to rows matching text, annotated with search_rank and ordered by it."""
+    if not terms(text):
+        return queryset.none()
+    using = queryset.db
+    return (
+        queryset.filter(match_condition(queryset.model, text, using))
+        .annotate(search_rank=rank_expression(queryset.model, text, using))
+        .order_by('-search_rank', '-pk')
+    )
+
+
+def user_conversations(user, text):
+    """The user's own conversations matching text; chat history isn't shared with the family."""
+    return matching(Conversation.objects.filter(user_id=user.id), text)
+
+
+def user_ledger_entries(user, text):
+    """Live Ledger entries the user can see (own and family-shared) matching text."""
+    return matching(family_feed.ledger_entries(user), text)
+
+
+def snippet(body, text, width=SNIPPET_CHARS):
+    """About width characters of body around the first query term it contains."""
+    body = body or ''
+    lowered = body.lower()
+    positions = [lowered.find(term.lower()) for term in terms(text)]
+    positions = [position for position in positions if position >= 0]
+    start = max(0, min(positions) - width // 4) if positions else 0
+    excerpt = body[start:start + width].strip()
+    return ('...' if start else '') + excerpt + ('...' if start + width < len(body) else '')
@@ -0,0 +1,122 @@
+"""
+Concurrent execution of the function calls the model requests in one round.
+
+The model can ask for several tool calls at once (e.g. three searches). They
+are independent I/O-bound calls, so they run together on a bounded thread pool
+and the results come back in the order the calls appeared in the model's
+response. Each call gets the full timeout from the moment a worker starts it,
+so calls queued behind a busy pool are not cut short; a call still queued
+after one timeout is dropped, which bounds a round at twice the timeout.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+class _Started:
+    """Set by the worker when it picks a call up."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.at = None
+
+    def mark(self):
+        self.at = time.perf_counter()
+        self.event.set()
+
+
+@dataclass(frozen=True)
+class ToolRoundMetrics:
+    calls: int
+    wall_seconds: float
+    sequential_seconds: float
+
+    @property
+    def saved_seconds(self):
+        """Wall-clock time saved versus running the calls one after another."""
+        return max(0.0, self.sequential_seconds - self.wall_seconds)
+
+
+class ToolExecutor:
+    """
+    Registry of callable tools plus a bounded thread pool to run them.
+    Tools take keyword arguments and return a JSON-serialisable dict.
+    """
+
+    def __init__(self, max_workers=4, timeout=8.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._tools = {}
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def register(self, name, func):
+        self._tools[name] = func
+        return func
+
+    def _get_pool(self):
+        # Created lazily and per process: Celery prefork children must not
+        # inherit a pool (and its threads) from the parent.
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='agent-tool')
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _invoke(self, name, args, started):
+        started.mark()
+        start = started.at
+        try:
+            output = self._tools[name](**args)
+        except Exception as e:
+            logger.error(f"Tool '{name}' raised: {e}")
+            output = {"error": f"The {name} tool failed: {e}"}
+        return output, time.perf_counter() - start
+
+    def run(self, calls):
+        """
+        Run (name, args) calls concurrently. Returns (outputs, metrics) where
+        outputs[i] is the result dict for calls[i]; unknown tools, calls that
+        run longer than the timeout and calls that wait longer than it for a
+        worker get an error dict instead.
+        """
+        start = time.perf_counter()
+        pool = self._get_pool()
+        submitted = []
+        for name, args in calls:
+            if name in self._tools:
+                started = _Started()
+                submitted.append((pool.submit(self._invoke, name, args, started), started))
+            else:
+                submitted.append((None, None))
+
+        outputs = []
+        sequential = 0.0
+        for (name, _), (future, started) in zip(calls, submitted):
+            if future is None:
+                outputs.append({"error": f"Unknown tool '{name}'."})
+                continue
+            started.event.wait(max(0.0, start + self.timeout - time.perf_counter()))
+            if not started.event.is_set() and future.cancel():
+                outputs.append({"error": f"The {name} tool could not start within {self.timeout:g}s."})
+                continue
+            started.event.wait()  # picked up just as it was cancelled
+            try:
+                output, duration = future.result(timeout=max(0.0, started.at + self.timeout - time.perf_counter()))
+            except FutureTimeoutError:
+                output, duration = {"error": f"The {name} tool timed out after {self.timeout:g}s."}, self.timeout
+            outputs.append(output)
+            sequential += duration
+
+        metrics = ToolRoundMetrics(
+            calls=len(calls),
+            wall_seconds=time.perf_counter() - start,
+            sequential_seconds=sequential,
+        )
+        return outputs, metrics
@@ -0,0 +1,218 @@
+"""
+Trend analytics over PerformanceEntry metrics, materialized in MetricTrendSummary.
+
+For each (sport profile, metric code) the summary holds the personal best, the
+latest value, a rolling average over the most recent entries, the variance
+(consistency) and a least-squares improvement rate per season. Creating an
+entry folds its values into the stored running sums in constant time;
+editing or deleting one rebuilds the profile's summaries from its history,
+loaded as dense NumPy arrays. Readers (the agent, dashboards) read one row.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import get_catalog
+from .metric_validation import as_number
+from .models import MetricTrendSummary, PerformanceEntry, SportProfile
+
+ROLLING_WINDOW = 5
+RATE_PERIOD_DAYS = 30
+EPOCH = date(2000, 1, 1)
+
+FOLDED_FIELDS = (
+    'entry_count', 'mean', 'm2', 'best_value', 'best_date', 'latest_value', 'latest_date',
+    'recent_values', 'rolling_average', 'season_sums', 'season_rates', 'updated_at',
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Series:
+    """One metric's entries in (date, pk) order."""
+    dates: np.ndarray    # datetime64[D]
+    seasons: np.ndarray  # str
+    values: np.ndarray   # float64
+
+
+def numeric_metrics(metrics):
+    values = {}
+    for code, value in (metrics or {}).items():
+        number = as_number(value)
+        if number is not None:
+            values[code] = number
+    return values
+
+
+def lower_is_better(sport_id, code):
+    metric = get_catalog().metric_by_code(sport_id, code)
+    return metric is not None and metric.metric_type == 'TIME'
+
+
+def season_rate(sums, lower_better):
+    """Least-squares slope of value over time, per RATE_PERIOD_DAYS, signed so improvement is positive."""
+    n, sum_t, sum_y, sum_tt, sum_ty = sums
+    denominator = n * sum_tt - sum_t * sum_t
+    if n < 2 or denominator == 0:
+        return None
+    slope = (n * sum_ty - sum_t * sum_y) / denominator * RATE_PERIOD_DAYS
+    return -slope if lower_better else slope
+
+
+def _is_better(value, best, lower_better):
+    return best is None or (value < best if lower_better else value > best)
+
+
+def _fold(summary, entry_date, season, value):
+    """Add one entry to summary's running statistics."""
+    summary.entry_count += 1
+    delta = value - summary.mean
+    summary.mean += delta / summary.entry_count
+    summary.m2 += delta * (value - summary.mean)
+
+    if _is_better(value, summary.best_value, summary.lower_is_better) or (
+        value == summary.best_value and entry_date < summary.best_date
+    ):
+        summary.best_value, summary.best_date = value, entry_date
+    if summary.latest_date is None or entry_date >= summary.latest_date:
+        summary.latest_value, summary.latest_date = value, entry_date
+
+    # Stable sort: an entry dated the same day as a stored one sorts after it.
+    recent = sorted(summary.recent_values + [[entry_date.isoformat(), value]], key=lambda item: item[0])
+    summary.recent_values = recent[-ROLLING_WINDOW:]
+    summary.rolling_average = sum(v for _, v in summary.recent_values) / len(summary.recent_values)
+
+    t = (entry_date - EPOCH).days
+    n, sum_t, sum_y, sum_tt, sum_ty = summary.season_sums.get(season, [0, 0.0, 0.0, 0.0, 0.0])
+    sums = [n + 1, sum_t + t, sum_y + value, sum_tt + t * t, sum_ty + t * value]
+    summary.season_sums = {**summary.season_sums, season: sums}
+    summary.season_rates = {**summary.season_rates, season: season_rate(sums, summary.lower_is_better)}
+
+
+def record_entry(entry):
+    """Fold a newly created PerformanceEntry into its summaries: three queries however long the history."""
+    values = numeric_metrics(entry.metrics)
+    if not values:
+        return
+    entry_date = PerformanceEntry._meta.get_field('date').to_python(entry.date)
+    sport_id = entry.sport_profile.sport_id
+    with transaction.atomic():
+        MetricTrendSummary.objects.bulk_create(
+            [
+                MetricTrendSummary(
+                    sport_profile_id=entry.sport_profile_id,
+                    metric_code=code,
+                    lower_is_better=lower_is_better(sport_id, code),
+                )
+                for code in values
+            ],
+            ignore_conflicts=True,
+        )
+        summaries = list(
+            MetricTrendSummary.objects.select_for_update()
+            .filter(sport_profile_id=entry.sport_profile_id, metric_code__in=list(values))
+        )
+        now = timezone.now()
+        for summary in summaries:
+            _fold(summary, entry_date, entry.season, values[summary.metric_code])
+            summary.updated_at = now
+        MetricTrendSummary.objects.bulk_update(summaries, FOLDED_FIELDS)
+
+
+def load_series(sport_profile_id):
+    """Every metric of a sport profile's entries as {code: Series}."""
+    columns = {}
+    entries = (
+        PerformanceEntry.objects.filter(sport_profile_id=sport_profile_id)
+        .order_by('date', 'pk')
+        .values_list('date', 'season', 'metrics')
+    )
+    for entry_date, season, metrics in entries:
+        for code, value in numeric_metrics(metrics).items():
+            column = columns.setdefault(code, ([], [], []))
+            column[0].append(entry_date)
+            column[1].append(season)
+            column[2].append(value)
+    return {
+        code: Series(
+            dates=np.array(dates, dtype='datetime64[D]'),
+            seasons=np.array(seasons, dtype=str),
+            values=np.array(values, dtype=float),
+        )
+        for code, (dates, seasons, values) in columns.items()
+    }
+
+
+def summarize(summary, series):
+    """Set summary's statistics from a full Series (the from-scratch counterpart of _fold)."""
+    values = series.values
+    summary.entry_count = len(values)
+    summary.mean = float(values.mean())
+    summary.m2 = float(((values - summary.mean) ** 2).sum())
+
+    # argmin/argmax return the first occurrence, i.e. the earliest date on ties.
+    best = int(values.argmin() if summary.lower_is_better else values.argmax())
+    summary.best_value, summary.best_date = float(values[best]), series.dates[best].item()
+    summary.latest_value, summary.latest_date = float(values[-1]), series.dates[-1].item()
+
+    summary.recent_values = [
+        [d.item().isoformat(), float(v)] for d, v in zip(series.dates[-ROLLING_WINDOW:], values[-ROLLING_WINDOW:])
+    ]
+    summary.rolling_average = float(values[-ROLLING_WINDOW:].mean())
+
+    t = (series.dates - np.datetime64(EPOCH, 'D')).astype(np.int64).astype(float)
+    seasons, group = np.unique(series.seasons, return_inverse=True)
+    columns = [
+        np.bincount(group, minlength=len(seasons)),
+        np.bincount(group, weights=t),
+        np.bincount(group, weights=values),
+        np.bincount(group, weights=t * t),
+        np.bincount(group, weights=t * values),
+    ]
+    summary.season_sums = {
+        str(season): [int(columns[0][i])] + [float(column[i]) for column in columns[1:]]
+        for i, season in enumerate(seasons)
+    }
+    summary.season_rates = {
+        season: season_rate(sums, summary.lower_is_better) for season, sums in summary.season_sums.items()
+    }
+
+
+def rebuild_summaries(sport_profile_id):
+    """Recompute every summary of a sport profile from its entries. Returns the number kept."""
+    series_by_code = load_series(sport_profile_id)
+    sport_id = SportProfile.objects.filter(pk=sport_profile_id).values_list('sport_id', flat=True).first()
+    summaries = []
+    for code, series in series_by_code.items():
+        summary = MetricTrendSummary(
+            sport_profile_id=sport_profile_id, metric_code=code, lower_is_better=lower_is_better(sport_id, code)
+        )
+        summarize(summary, series)
+        summaries.append(summary)
+    with transaction.atomic():
+        MetricTrendSummary.objects.filter(sport_profile_id=sport_profile_id).delete()
+        MetricTrendSummary.objects.bulk_create(summaries)
+    return len(summaries)
+
+
+def trend_context(sport_profile_id, limit=8):
+    """One line per tracked metric for the agent's player context; a single indexed read."""
+    lines = []
+    summaries = MetricTrendSummary.objects.filter(sport_profile_id=sport_profile_id).order_by('metric_code')[:limit]
+    for summary in summaries:
+        line = (
+            f"{summary.metric_code}: best {summary.best_value:g} ({summary.best_date}), "
+            f"latest {summary.latest_value:g}, recent average {summary.rolling_average:.4g} "
+            f"over {summary.entry_count} entries"
+        )
+        if summary.season_sums:
+            # The current season is the one whose entries are latest on average.
+            sums = summary.season_sums
+            season = max(sums, key=lambda key: sums[key][1] / sums[key][0])
+            rate = summary.season_rates.get(season)
+            if rate is not None:
+                line += f", {season} trend {rate:+.3g} per {RATE_PERIOD_DAYS} days (positive is improvement)"
+        lines.append(line)
+    return lines
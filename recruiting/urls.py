@@ -9,7 +9,9 @@ urlpatterns = [
     path('agent/<uuid:session_id>/', views.index, name='view_session'),
 
     path('agent/ask/', views.ask_agent, name='ask_agent'),
+    path('agent/ask/async/', views.ask_agent_async, name='ask_agent_async'),
     path('agent/task_status/<str:task_id>/', views.get_task_status, name='get_task_status'),
+    path('agent/stream/<str:task_id>/', views.stream_task_response, name='stream_task_response'),
     path('sessions/', views.get_chat_sessions, name='get_chat_sessions'),
     path('agent/session/<uuid:session_id>/delete/', views.delete_session, name='delete_session'),
     path('agent/session/<uuid:session_id>/history/', views.get_session_history, name='get_session_history'),
@@ -20,6 +22,7 @@ urlpatterns = [
     path('ledger/', views.ledger_list, name='ledger_list'),
     path('ledger/save/', views.save_to_ledger, name='save_to_ledger'),
     path('ledger/<int:entry_id>/delete/', views.delete_ledger_entry, name='delete_ledger_entry'),
+    path('ledger/<int:entry_id>/related/', views.related_ledger_entries, name='related_ledger_entries'),
     
     # Action Item Routes (Milestone 3)
     path('action-items/', views.action_items_list, name='action_items_list'),
@@ -27,6 +30,15 @@ urlpatterns = [
     path('action-items/<int:item_id>/toggle/', views.toggle_action_item_complete, name='toggle_action_item_complete'),
     path('action-items/<int:item_id>/delete/', views.delete_action_item, name='delete_action_item'),
 
+    # Athlete search (coach / recruiter views)
+    path('athletes/search/', views.search_athletes, name='search_athletes'),
+
+    # Full-text search over the user's conversations and Ledger
+    path('search/', views.search, name='search'),
+
+    # Bulk performance / competition imports
+    path('performances/import/', views.import_performances, name='import_performances'),
+
     # --- END NEW URLS ---
 
     # ADMIN ROUTES (Milestone 3)
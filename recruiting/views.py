@@ -1,7 +1,9 @@
 import os
 from dotenv import load_dotenv
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.conf import settings
+import io
 import json
 from .models import PromptComponent, Conversation, UserProfile, ChatSession, SportProfile, Sport, LedgerEntry, ActionItem, AdminSettings, FamilyAccount, FamilyMember
 from .forms import CustomUserCreationForm, RoleSelectionForm
@@ -13,12 +15,24 @@ from django.utils.encoding import force_bytes, force_str
 from django.core.mail import send_mail
 from django.urls import reverse
 import logging
+from asgiref.sync import sync_to_async
 from celery.result import AsyncResult
 from .tasks import get_ai_response, generate_title_and_summary, generate_action_items_task # <-- IMPORT NEW TASK
+from . import async_agent, athlete_search, family_feed, ledger_retrieval, streaming, text_search
+from .catalog import sport_name
+from .history import build_history, estimate_tokens
+from .pagination import InvalidCursor, encode_cursor, keyset_page, parse_limit
+from .percentiles import peer_context
+from .performance_import import COMPETITION, FORMATS as IMPORT_FORMATS, PERFORMANCE, PerformanceImporter
+from .prompts import get_compiled_prompt
+from .trends import trend_context
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Row errors returned by the import endpoint; the rest are only counted.
+IMPORT_ERRORS_SHOWN = 200
+
 # --- Vertex AI Initialization ---
 load_dotenv()
 # ------------------------------------
@@ -82,81 +96,170 @@ def index(request, session_id=None):
     return render(request, 'recruiting/index.html')
 
 
+def _prepare_agent_call(user, user_prompt, session_id):
+    """
+    Resolves (or creates) the chat session and builds the core prompt, the
+    per-call context and the history for one agent call. Returns (call, None)
+    or (None, error response); shared by the Celery-backed and the async
+    ask_agent views.
+    """
+    try:
+        if session_id:
+            chat_session = ChatSession.objects.get(id=session_id, user=user)
+        else:
+            CHAT_LIMIT = 3
+            current_session_count = ChatSession.objects.filter(user=user).count()
+            if current_session_count >= CHAT_LIMIT:
+                return None, JsonResponse({'error': 'Chat limit reached.'}, status=403)
+
+            chat_session = ChatSession.objects.create(user=user, title=user_prompt[:100])
+    except ChatSession.DoesNotExist:
+        return None, JsonResponse({'error': 'Invalid session ID'}, status=404)
+
+    player_context = ""
+    try:
+        # The user's own SportProfile, else the athlete profile shared with their family
+        profile = family_feed.sport_profiles(user).first()
+        if profile:
+            player_context = (
+                f"CONTEXT: You are speaking to an athlete. "
+                f"Their profile is: Sport - {sport_name(profile.sport_id)}. "
+                f"Use this information to personalize your advice."
+            )
+            trend_lines = trend_context(profile.id)
+            if trend_lines:
+                player_context += " Their tracked performance trends: " + "; ".join(trend_lines) + "."
+            peer_lines = peer_context(profile)
+            if peer_lines:
+                player_context += " Compared with their recruiting class: " + "; ".join(peer_lines) + "."
+    except Exception as e:
+        logger.info(f"No SportProfile found for user '{user.username}': {e}")
+        pass
+
+    # The saved Ledger insights most relevant to this prompt, within a fixed token budget.
+    try:
+        insight_lines = ledger_retrieval.ledger_context(user, user_prompt)
+        if insight_lines:
+            player_context += (
+                "\n\nRelevant insights the athlete saved to their Ledger earlier "
+                "(build on them rather than repeating them):\n- " + "\n- ".join(insight_lines)
+            )
+    except Exception as e:
+        logger.error(f"Ledger retrieval failed for user '{user.username}': {e}")
+
+    # All active PromptComponents, compiled once per prompt version and
+    # shared across processes. It is the whole system instruction, so every
+    # user shares one model instance per prompt version; the date and player
+    # context vary per call and are sent with the user's message instead.
+    compiled_prompt = get_compiled_prompt()
+
+    # 1. Get the current date and format it.
+    current_date_str = datetime.now().strftime('%B %d, %Y')
+
+    # 2. Create a new instruction that includes the current date.
+    date_instruction = f"IMPORTANT: You must operate as if the current date is always {current_date_str}. Do not refer to this date as being in the future."
+
+    # 3. Combine the instructions into the context sent ahead of the prompt.
+    call_context = f"{date_instruction}\n\n{player_context}".strip()
+    core_prompt = compiled_prompt.text
+
+    # Most recent turns that fit the token budget, oldest first.
+    history = build_history(chat_session)
+    context_tokens = estimate_tokens(core_prompt) + estimate_tokens(call_context)
+    logger.info(
+        f"ask_agent: sending ~{context_tokens + history.tokens + estimate_tokens(user_prompt)} tokens "
+        f"(system and context ~{context_tokens}, history ~{history.tokens} over {history.turns} turn(s), "
+        f"{history.truncated} truncated) for session {chat_session.id}"
+    )
+
+    call = {
+        'chat_session': chat_session,
+        'core_prompt': core_prompt,
+        'call_context': call_context,
+        'history_dicts': history.contents,
+        'prompt_hash': compiled_prompt.content_hash,
+    }
+    return call, None
+
+
 @login_required
 def ask_agent(request):
-# ... (ask_agent view remains unchanged)
     if request.method == 'POST':
         data = json.loads(request.body)
         user_prompt = data.get('prompt')
-        session_id = data.get('session_id')
-        
-        try:
-            if session_id:
-                chat_session = ChatSession.objects.get(id=session_id, user=request.user)
-            else:
-                CHAT_LIMIT = 3
-                current_session_count = ChatSession.objects.filter(user=request.user).count()
-                if current_session_count >= CHAT_LIMIT:
-                    return JsonResponse({'error': 'Chat limit reached.'}, status=403)
-
-                chat_session = ChatSession.objects.create(user=request.user, title=user_prompt[:100])
-                session_id = chat_session.id
-        except ChatSession.DoesNotExist:
-            return JsonResponse({'error': 'Invalid session ID'}, status=404)
-
-        player_context = ""
-        try:
-            # Get user's UserProfile first, then their SportProfile
-            user_profile = UserProfile.objects.filter(user=request.user).first()
-            if user_profile:
-                profile = SportProfile.objects.select_related('sport').filter(user_profile=user_profile).first()
-                if profile:
-                    player_context = (
-                        f"CONTEXT: You are speaking to an athlete. "
-                        f"Their profile is: Sport - {profile.sport.name}. "
-                        f"Use this information to personalize your advice."
-                    )
-        except Exception as e:
-            logger.info(f"No SportProfile found for user '{request.user.username}': {e}")
-            pass
-
-        try:
-            prompt_name = os.getenv('PROMPT_COMPONENT_NAME', 'recruiter_core_prompt')
-            core_prompt_base = PromptComponent.objects.get(name=prompt_name).content
-            
-            # --- MODIFICATION STARTS HERE ---
-            # 1. Get the current date and format it.
-            current_date_str = datetime.now().strftime('%B %d, %Y')
-            
-            # 2. Create a new instruction that includes the current date.
-            date_instruction = f"IMPORTANT: You must operate as if the current date is always {current_date_str}. Do not refer to this date as being in the future."
-            
-            # 3. Combine the instructions to create the final core prompt.
-            core_prompt = f"{date_instruction}\n\n{player_context}\n\n{core_prompt_base}"
-            # --- MODIFICATION ENDS HERE ---
 
-        except PromptComponent.DoesNotExist:
-            logger.warning(f"PromptComponent '{prompt_name}' not found. Using fallback.")
-            core_prompt = "You are a helpful AI assistant."
-
-        history_dicts = []
-        recent_conversations = chat_session.messages.select_related('user').order_by('timestamp')[:10]
-        for conv in recent_conversations:
-            history_dicts.append({"role": "user", "parts": [{"text": conv.prompt_text}]})
-            history_dicts.append({"role": "model", "parts": [{"text": conv.response_text}]})
+        call, error_response = _prepare_agent_call(request.user, user_prompt, data.get('session_id'))
+        if error_response:
+            return error_response
+        session_id = call['chat_session'].id
 
+        stream = settings.AGENT_STREAMING_ENABLED
         task = get_ai_response.delay(
             user_prompt,
-            core_prompt,
-            history_dicts,
+            call['core_prompt'],
+            call['history_dicts'],
             str(session_id),
-            request.user.id
+            request.user.id,
+            stream=stream,
+            prompt_hash=call['prompt_hash'],
+            call_context=call['call_context'],
         )
-        
-        return JsonResponse({'task_id': task.id, 'session_id': session_id})
+
+        response_data = {'task_id': task.id, 'session_id': session_id}
+        if stream and streaming.register_stream(task.id, request.user.id):
+            response_data['stream_url'] = reverse('stream_task_response', args=[task.id])
+        return JsonResponse(response_data)
 
     return JsonResponse({'error': 'Invalid request method.'}, status=405)
 
+
+@login_required
+async def ask_agent_async(request):
+    """
+    Async variant of ask_agent: the reply is generated on the event loop and
+    returned in the response, with no Celery round-trip or status polling.
+    Only worthwhile when served by an ASGI server (see recruitapp_core/asgi.py).
+    """
+    if not settings.AGENT_ASYNC_ENABLED:
+        return JsonResponse({'error': 'Async agent mode is disabled.'}, status=404)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method.'}, status=405)
+
+    data = json.loads(request.body)
+    user_prompt = data.get('prompt')
+    user = await request.auser()
+
+    call, error_response = await sync_to_async(_prepare_agent_call)(user, user_prompt, data.get('session_id'))
+    if error_response:
+        return error_response
+    chat_session = call['chat_session']
+
+    try:
+        conversation = await async_agent.respond(
+            user,
+            chat_session,
+            user_prompt,
+            call['core_prompt'],
+            call['history_dicts'],
+            prompt_hash=call['prompt_hash'],
+            call_context=call['call_context'],
+        )
+    except Exception as e:
+        logger.error(f"Async agent call failed for session {chat_session.id}: {e}")
+        return JsonResponse({'status': 'FAILURE', 'error': 'The agent could not respond. Please try again.'}, status=502)
+
+    # Same trigger as get_task_status: the first message, or a session still without a summary.
+    await chat_session.arefresh_from_db(fields=['message_count', 'summary'])
+    if chat_session.message_count == 1 or not chat_session.summary:
+        await sync_to_async(generate_title_and_summary.delay)(str(chat_session.id))
+
+    return JsonResponse({
+        'status': 'SUCCESS',
+        'response': conversation.response_text,
+        'conversation_id': conversation.id,
+        'session_id': chat_session.id,
+    })
+
 @login_required
 def get_task_status(request, task_id):
 # ... (get_task_status view remains unchanged)
@@ -168,45 +271,120 @@ def get_task_status(request, task_id):
     }
 
     if result['status'] == 'SUCCESS':
-        try:
-            conv = Conversation.objects.filter(response_text=result['result']).latest('timestamp')
+        # The task records its id on the Conversation it creates, so this is a
+        # single unique-index lookup regardless of how large the table grows.
+        conv = Conversation.objects.select_related('session').filter(
+            task_id=task_id, user=request.user
+        ).first()
+        if conv and conv.session:
             session = conv.session
+            result['conversation_id'] = str(conv.id)
+            result['session_id'] = str(session.id)
             # --- CORRECTED TRIGGER LOGIC ---
             # Trigger if it's the first message OR if the summary is currently empty.
-            if session and (session.messages.count() == 1 or not session.summary):
+            if session.message_count == 1 or not session.summary:
                 generate_title_and_summary.delay(str(session.id))
-        except (Conversation.DoesNotExist, AttributeError):
-            pass 
-    
+
     return JsonResponse(result)
 
+@login_required
+def stream_task_response(request, task_id):
+    """
+    Server-Sent Events relay of an agent reply as it is generated.
+    Honors Last-Event-ID so a reconnecting EventSource resumes where it left off;
+    the client falls back to get_task_status polling if the stream fails.
+    """
+    try:
+        owner = streaming.stream_owner(task_id)
+    except streaming.StreamUnavailable:
+        return JsonResponse({'error': 'Streaming is unavailable; poll the task status instead.'}, status=503)
+    if owner != request.user.id:
+        return JsonResponse({'error': 'Stream not found.'}, status=404)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(
+        streaming.sse_stream(task_id, last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # ... (get_chat_sessions, get_session_history, delete_session views remain unchanged)
 @login_required
 def get_chat_sessions(request):
-    sessions = ChatSession.objects.filter(user=request.user).order_by('-updated_at')
+    """
+    Sessions, most recently updated first, one page at a time. Pass the
+    returned next_cursor as ?cursor= for the following page; the first page
+    also carries the user's total session count.
+    """
+    try:
+        sessions, has_more = keyset_page(
+            ChatSession.objects.filter(user=request.user).values(
+                'id', 'title', 'summary', 'updated_at', 'message_count', 'last_message_at'
+            ),
+            'updated_at',
+            cursor=request.GET.get('cursor'),
+            limit=parse_limit(request.GET.get('limit')),
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
     session_list = [
-        {'id': str(session.id), 'title': session.title, 'summary': session.summary} 
+        {
+            'id': str(session['id']),
+            'title': session['title'],
+            'summary': session['summary'],
+            'message_count': session['message_count'],
+            'last_message_at': session['last_message_at'],
+        }
         for session in sessions
     ]
-    return JsonResponse({'sessions': session_list})
+    response_data = {
+        'sessions': session_list,
+        'next_cursor': encode_cursor(sessions[-1]['updated_at'], sessions[-1]['id']) if has_more else None,
+    }
+    if not request.GET.get('cursor'):
+        response_data['count'] = ChatSession.objects.filter(user=request.user).count()
+    return JsonResponse(response_data)
 
 @login_required
 def get_session_history(request, session_id):
+    """
+    Messages of a session in chronological order, paged by (timestamp, id).
+    With no cursor the latest page is returned; ?before=<cursor> pages back
+    through older messages and ?after=<cursor> returns only messages newer than
+    the cursor (the delta after a reply). `cursors.after` always points at the
+    newest message returned, so it can be passed straight back as ?after=.
+    """
     try:
         session = ChatSession.objects.get(id=session_id, user=request.user)
-        # MODIFIED: Include 'id' in the values() call
-        messages = session.messages.order_by('timestamp').values(
-            'id', 'prompt_text', 'response_text', 'timestamp'
-        )
+        messages = session.messages.values('id', 'prompt_text', 'response_text', 'timestamp')
+        limit = parse_limit(request.GET.get('limit'), default=50, maximum=200)
+        after = request.GET.get('after')
+        if after:
+            page, has_more = keyset_page(messages, 'timestamp', cursor=after, limit=limit, descending=False)
+            has_older = False
+        else:
+            page, has_older = keyset_page(messages, 'timestamp', cursor=request.GET.get('before'), limit=limit)
+            page.reverse()
+            has_more = False
+
         history = []
-        for msg in messages:
+        for msg in page:
             # User message has no ID reference needed by the Ledger
             history.append({'type': 'user', 'text': msg['prompt_text'], 'timestamp': msg['timestamp'], 'id': None}) 
             
             # Agent message requires the Conversation ID ('id' field) for Ledger functionality
             history.append({'type': 'model', 'text': msg['response_text'], 'timestamp': msg['timestamp'], 'id': str(msg['id'])}) 
-        
-        return JsonResponse({'history': history})
+
+        cursors = {
+            'before': encode_cursor(page[0]['timestamp'], page[0]['id']) if page and has_older else None,
+            'after': encode_cursor(page[-1]['timestamp'], page[-1]['id']) if page else after,
+        }
+        return JsonResponse({'history': history, 'cursors': cursors, 'has_more': has_more})
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
     except ChatSession.DoesNotExist:
         return JsonResponse({'error': 'Session not found or access denied.'}, status=404)
     except Exception as e:
@@ -232,20 +410,43 @@ def delete_session(request, session_id):
 # --- NEW VIEWS FOR LEDGER (Milestone 2) ---
 # ------------------------------------
 
+def _status_page(request, board, querysets):
+    """
+    One keyset page of the queryset selected by ?status= (first key is the
+    default), newest first, cached as part of the user's family board.
+    Returns (rows, next_cursor) or an error response.
+    """
+    status = request.GET.get('status', next(iter(querysets)))
+    if status not in querysets:
+        return None, None, JsonResponse({'status': 'error', 'message': f'Unknown status "{status}".'}, status=400)
+    cursor = request.GET.get('cursor')
+    limit = parse_limit(request.GET.get('limit'), default=25)
+    try:
+        rows, has_more = family_feed.cached_page(
+            request.user, board, (status, cursor, limit),
+            lambda: keyset_page(querysets[status], 'created_at', cursor=cursor, limit=limit),
+        )
+    except InvalidCursor:
+        return None, None, JsonResponse({'status': 'error', 'message': 'Invalid cursor.'}, status=400)
+    next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+    return rows, next_cursor, None
+
+
 @login_required
 def ledger_list(request):
-    """API endpoint to get a list of all Ledger entries for the user, separated by status."""
-    entries = LedgerEntry.objects.filter(user=request.user).order_by('-created_at').values(
-        'id', 'title', 'content', 'created_at', 'conversation_id', 'is_deleted'
-    )
-    # Split into active and deleted for front-end categorization
-    active_entries = [entry for entry in entries if not entry['is_deleted']]
-    deleted_entries = [entry for entry in entries if entry['is_deleted']]
-
-    return JsonResponse({
-        'ledger_entries': active_entries,
-        'deleted_entries': deleted_entries
+    """
+    API endpoint to page through the Ledger entries of one status:
+    ?status=active (default, own and family-shared) or ?status=deleted (own),
+    with ?cursor= from next_cursor.
+    """
+    fields = ('id', 'user_id', 'title', 'content', 'created_at', 'conversation_id', 'is_deleted')
+    entries, next_cursor, error_response = _status_page(request, 'ledger', {
+        'active': family_feed.ledger_entries(request.user).values(*fields),
+        'deleted': LedgerEntry.all_objects.filter(user=request.user, is_deleted=True).values(*fields),
     })
+    if error_response:
+        return error_response
+    return JsonResponse({'entries': entries, 'next_cursor': next_cursor})
 
 @login_required
 def save_to_ledger(request):
@@ -286,7 +487,7 @@ def save_to_ledger(request):
 @login_required
 def delete_ledger_entry(request, entry_id):
     """API endpoint to soft delete a Ledger entry (moves to deleted section)."""
-    entry = get_object_or_404(LedgerEntry, pk=entry_id, user=request.user)
+    entry = get_object_or_404(LedgerEntry.all_objects, pk=entry_id, user=request.user)
     if request.method == 'POST':
         entry.is_deleted = True
         entry.save(update_fields=['is_deleted'])
@@ -294,26 +495,47 @@ def delete_ledger_entry(request, entry_id):
     return JsonResponse({'status': 'error', 'message': 'Only POST requests allowed.'}, status=405)
 
 
+@login_required
+def related_ledger_entries(request, entry_id):
+    """API endpoint listing the user's visible Ledger entries most similar to one entry (?limit=, default 5)."""
+    entry = get_object_or_404(family_feed.ledger_entries(request.user), pk=entry_id)
+    matches = ledger_retrieval.related_entries(request.user, entry, parse_limit(request.GET.get('limit'), 5, 20))
+    entries = LedgerEntry.objects.in_bulk([entry_id for entry_id, _ in matches])
+    return JsonResponse({'related': [
+        {
+            'id': entries[entry_id].id,
+            'title': entries[entry_id].title,
+            'content': entries[entry_id].content,
+            'created_at': entries[entry_id].created_at.isoformat(),
+            'score': round(score, 3),
+        }
+        for entry_id, score in matches if entry_id in entries
+    ]})
+
+
 # ------------------------------------
 # --- NEW VIEWS FOR ACTION ITEMS (Milestone 3) ---
 # ------------------------------------
 
 @login_required
 def action_items_list(request):
-    """API endpoint to get the list of active, completed, and deleted Action Items."""
-    items = ActionItem.objects.filter(user=request.user).order_by('-created_at').values(
-        'id', 'description', 'is_complete', 'is_deleted', 'priority', 'due_date', 'created_at', 'source_ledger_entry_id'
+    """
+    API endpoint to page through the Action Items of one status: ?status=active
+    (default) or completed, own and family-shared, or deleted (own), with
+    ?cursor= from next_cursor.
+    """
+    fields = (
+        'id', 'user_id', 'description', 'is_complete', 'is_deleted', 'priority', 'due_date', 'created_at',
+        'source_ledger_entry_id',
     )
-    # Split into active, completed, and deleted for front-end categorization
-    active_items = [item for item in items if not item['is_complete'] and not item['is_deleted']]
-    completed_items = [item for item in items if item['is_complete'] and not item['is_deleted']]
-    deleted_items = [item for item in items if item['is_deleted']]
-
-    return JsonResponse({
-        'active_items': active_items,
-        'completed_items': completed_items,
-        'deleted_items': deleted_items
+    items, next_cursor, error_response = _status_page(request, 'actions', {
+        'active': family_feed.action_items(request.user).filter(is_complete=False).values(*fields),
+        'completed': family_feed.action_items(request.user).filter(is_complete=True).values(*fields),
+        'deleted': ActionItem.all_objects.filter(user=request.user, is_deleted=True).values(*fields),
     })
+    if error_response:
+        return error_response
+    return JsonResponse({'items': items, 'next_cursor': next_cursor})
 
 
 @login_required
@@ -351,8 +573,8 @@ def generate_action_items(request):
 
 @login_required
 def toggle_action_item_complete(request, item_id):
-    """API endpoint to toggle completion status of an action item."""
-    item = get_object_or_404(ActionItem, pk=item_id, user=request.user)
+    """API endpoint to toggle completion status of an action item (own or family-shared)."""
+    item = get_object_or_404(family_feed.action_items(request.user), pk=item_id)
     if request.method == 'POST':
         item.is_complete = not item.is_complete
         item.save(update_fields=['is_complete'])
@@ -362,13 +584,158 @@ def toggle_action_item_complete(request, item_id):
 @login_required
 def delete_action_item(request, item_id):
     """API endpoint to soft delete an action item (moves to deleted section)."""
-    item = get_object_or_404(ActionItem, pk=item_id, user=request.user)
+    item = get_object_or_404(ActionItem.all_objects, pk=item_id, user=request.user)
     if request.method == 'POST':
         item.is_deleted = True
         item.save(update_fields=['is_deleted'])
         return JsonResponse({'status': 'success', 'message': 'Action item moved to deleted.'})
     return JsonResponse({'status': 'error', 'message': 'Only POST requests allowed.'}, status=405)
 
+
+# ------------------------------------
+# --- ATHLETE SEARCH ---
+# ------------------------------------
+
+@login_required
+def search_athletes(request):
+    """
+    API endpoint for coach and recruiter views: athletes matching sport,
+    position, grad_year, gpa_min/gpa_max, state and metric=code:gte|lte:value
+    filters, a keyset page at a time. The first page also carries facet counts.
+    """
+    if not athlete_search.can_search_athletes(request.user):
+        return JsonResponse({'status': 'error', 'message': 'Athlete search is not available for this account.'},
+                            status=403)
+    cursor = request.GET.get('cursor')
+    try:
+        filters = athlete_search.SearchFilters.from_query(request.GET)
+        results, next_cursor = athlete_search.search(filters, cursor, parse_limit(request.GET.get('limit')))
+    except InvalidCursor:
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor.'}, status=400)
+    except athlete_search.InvalidSearch as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    data = {'results': results, 'next_cursor': next_cursor}
+    if not cursor:
+        data['facets'] = athlete_search.facet_counts(filters)
+    return JsonResponse(data)
+
+# ------------------------------------
+# --- PERFORMANCE IMPORT ---
+# ------------------------------------
+
+@login_required
+def import_performances(request):
+    """
+    API endpoint to bulk import performance entries or competition results
+    from an uploaded CSV/JSONL file into the sport profiles the user may edit
+    (their own, and the family's with can_edit_profile). Form fields: file,
+    model, format, sport_profile (default for rows without one; needed when
+    more than one profile is editable), dry_run, start_line.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Only POST requests allowed.'}, status=405)
+    upload = request.FILES.get('file')
+    model = request.POST.get('model', PERFORMANCE)
+    fmt = request.POST.get('format') or ('jsonl' if upload and upload.name.endswith(('.jsonl', '.ndjson')) else 'csv')
+    if upload is None:
+        return JsonResponse({'status': 'error', 'message': 'A file is required.'}, status=400)
+    if model not in (PERFORMANCE, COMPETITION) or fmt not in IMPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'message': 'Unsupported model or format.'}, status=400)
+    try:
+        default_profile = request.POST.get('sport_profile') or None
+        start_line = int(request.POST.get('start_line') or 0)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'start_line must be a number.'}, status=400)
+
+    profiles = family_feed.editable_sport_profiles(request.user)
+    if default_profile is None:
+        # Only an unambiguous default: with several editable profiles, rows must name theirs.
+        editable = list(profiles.values_list('pk', flat=True)[:2])
+        default_profile = editable[0] if len(editable) == 1 else None
+    importer = PerformanceImporter(
+        model=model,
+        sport_profiles=profiles,
+        default_sport_profile_id=default_profile,
+        batch_size=settings.PERFORMANCE_IMPORT_BATCH_SIZE,
+        dry_run=request.POST.get('dry_run') in ('1', 'true', 'True'),
+    )
+    # Uploads above the in-memory limit are spooled to disk; either way rows are read incrementally.
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        result = importer.run(stream, fmt, start_line=start_line)
+    except UnicodeDecodeError:
+        return JsonResponse({
+            'status': 'error', 'message': 'The file must be UTF-8 text.', 'last_line': importer.last_committed_line,
+        }, status=400)
+    except Exception as e:
+        logger.error(f"Error importing performances for user {request.user.id}: {e}")
+        return JsonResponse({
+            'status': 'error', 'message': 'An internal error occurred.', 'last_line': importer.last_committed_line,
+        }, status=500)
+
+    return JsonResponse({
+        'status': 'success',
+        'dry_run': importer.dry_run,
+        'created': result.created,
+        'skipped': result.skipped,
+        'last_line': result.last_line,
+        'rows_per_second': round(result.rows_per_second),
+        'errors': [
+            {'line': error.line, 'field': error.field, 'message': error.message}
+            for error in result.errors[:IMPORT_ERRORS_SHOWN]
+        ],
+        'errors_truncated': len(result.errors) > IMPORT_ERRORS_SHOWN,
+    })
+
+# ------------------------------------
+# --- TEXT SEARCH ---
+# ------------------------------------
+
+SEARCH_TYPES = ('all', 'conversations', 'ledger')
+
+
+@login_required
+def search(request):
+    """
+    API endpoint to search the user's conversations and their own and
+    family-shared Ledger entries. Params: q, type (all, conversations or
+    ledger) and limit (per type). Results are best match first.
+    """
+    query = (request.GET.get('q') or '').strip()
+    search_type = request.GET.get('type', 'all')
+    if not text_search.terms(query):
+        return JsonResponse({'status': 'error', 'message': 'A search query is required.'}, status=400)
+    if search_type not in SEARCH_TYPES:
+        return JsonResponse({'status': 'error', 'message': 'type must be all, conversations or ledger.'}, status=400)
+    limit = parse_limit(request.GET.get('limit'), default=10, maximum=50)
+
+    data = {'status': 'success', 'query': query}
+    if search_type in ('all', 'conversations'):
+        rows = text_search.user_conversations(request.user, query).values(
+            'pk', 'session_id', 'prompt_text', 'response_text', 'timestamp', 'search_rank'
+        )[:limit]
+        data['conversations'] = [{
+            'id': row['pk'],
+            'session_id': row['session_id'],
+            'prompt': text_search.snippet(row['prompt_text'], query),
+            'response': text_search.snippet(row['response_text'], query),
+            'timestamp': row['timestamp'].isoformat(),
+            'rank': row['search_rank'],
+        } for row in rows]
+    if search_type in ('all', 'ledger'):
+        rows = text_search.user_ledger_entries(request.user, query).values(
+            'pk', 'title', 'content', 'family_account_id', 'created_at', 'search_rank'
+        )[:limit]
+        data['ledger'] = [{
+            'id': row['pk'],
+            'title': row['title'],
+            'content': text_search.snippet(row['content'], query),
+            'is_shared': row['family_account_id'] is not None,
+            'created_at': row['created_at'].isoformat(),
+            'rank': row['search_rank'],
+        } for row in rows]
+    return JsonResponse(data)
+
 def register(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
@@ -436,8 +803,8 @@ def reset_my_data(request):
             ChatSession.objects.filter(user=request.user).delete()
             # Conversations are cascade-deleted via ChatSession foreign key
 
-            LedgerEntry.objects.filter(user=request.user).delete()
-            ActionItem.objects.filter(user=request.user).delete()
+            LedgerEntry.all_objects.filter(user=request.user).delete()
+            ActionItem.all_objects.filter(user=request.user).delete()
             # SportProfile is now linked via user_profile, not user directly
             try:
                 user_profile = request.user.userprofile